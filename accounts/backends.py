@@ -1,49 +1,27 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-import re
 
 User = get_user_model()
 
 class SlashFriendlyModelBackend(ModelBackend):
-    """Backend that handles usernames with slashes"""
+    """Backend that handles usernames with slashes, any case, '/' or '_'"""
     
     def authenticate(self, request, username=None, password=None, **kwargs):
         if username is None:
             username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
         
-        # Try exact match first
-        try:
-            user = User.objects.get(username=username)
-            if user.check_password(password):
-                return user
-        except User.DoesNotExist:
-            pass
+        # Query moja kwa login_key (indexed); jina lililoandikwa sawasawa linatangulia
+        candidates = list(User.objects.filter(login_key=User.make_login_key(username)).order_by('pk')[:5])
+        if not candidates:
+            # Hash moja hata kama user hayupo, ili muda usionyeshe kama username ipo
+            User().set_password(password)
+            return None
+        user = next((u for u in candidates if u.username == username), None) \
+            or next((u for u in candidates if u.username.lower() == username.lower()), None) \
+            or candidates[0]
         
-        # Try case-insensitive match
-        try:
-            user = User.objects.get(username__iexact=username)
-            if user.check_password(password):
-                return user
-        except User.DoesNotExist:
-            pass
-        
-        # Try with underscores replaced (for legacy)
-        try:
-            username_with_underscores = username.replace('/', '_')
-            user = User.objects.get(username__iexact=username_with_underscores)
-            if user.check_password(password):
-                return user
-        except User.DoesNotExist:
-            pass
-        
-        # Try with underscores replaced the other way
-        try:
-            username_with_slashes = username.replace('_', '/')
-            user = User.objects.get(username__iexact=username_with_slashes)
-            if user.check_password(password):
-                return user
-        except User.DoesNotExist:
-            pass
-        
-        return None
\ No newline at end of file
+        if user.check_password(password):
+            return user
+        return None
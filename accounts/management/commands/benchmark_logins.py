@@ -0,0 +1,94 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts.backends import SlashFriendlyModelBackend
+
+User = get_user_model()
+PASSWORD = 'Bench-pass-2025'
+
+
+def legacy_authenticate(username, password):
+    """Backend ya zamani: hadi lookups nne, hash check baada ya kila hit, kisha ModelBackend."""
+    for lookup in (
+        {'username': username},
+        {'username__iexact': username},
+        {'username__iexact': username.replace('/', '_')},
+        {'username__iexact': username.replace('_', '/')},
+    ):
+        try:
+            user = User.objects.get(**lookup)
+            if user.check_password(password):
+                return user
+        except User.DoesNotExist:
+            pass
+    # AUTHENTICATION_BACKENDS ilikuwa na ModelBackend ya pili
+    try:
+        User.objects.get(username=username).check_password(password)
+    except User.DoesNotExist:
+        User().set_password(password)
+    return None
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare login time and queries: old four-lookup backend vs login_key backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Temporary users to create (default 2000)')
+        parser.add_argument('--logins', type=int, default=20, help='Logins per scenario (default 20)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("\n✅ Temporary users rolled back"))
+
+    def run(self, options):
+        encoded = make_password(PASSWORD)
+        users = []
+        for i in range(options['users']):
+            username = f'BENCH/CS1/2025/{i:05d}'
+            users.append(User(username=username, login_key=User.make_login_key(username),
+                              password=encoded, role='STUDENT'))
+        User.objects.bulk_create(users, batch_size=500)
+        target = users[len(users) // 2].username
+
+        scenarios = [
+            ('exact', target, PASSWORD),
+            ('lower case', target.lower(), PASSWORD),
+            ('underscores', target.lower().replace('/', '_'), PASSWORD),
+            ('wrong password', target, 'wrong'),
+            ('unknown user', 'BENCH/NOPE/0000', PASSWORD),
+        ]
+        backend = SlashFriendlyModelBackend()
+        implementations = [
+            ('old', legacy_authenticate),
+            ('login_key', lambda username, password: backend.authenticate(None, username, password)),
+        ]
+
+        self.stdout.write(f"\n🔐 {options['users']} users, {options['logins']} logins per scenario\n")
+        self.stdout.write(f"  {'scenario':<16}{'backend':<11}{'ok':>4}{'queries':>9}{'p50 ms':>10}{'max ms':>10}")
+        for name, username, password in scenarios:
+            for label, authenticate in implementations:
+                timings = []
+                for _ in range(options['logins']):
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        user = authenticate(username, password)
+                        timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(
+                    f"  {name:<16}{label:<11}{'✓' if user else '✗':>4}{len(queries):>9}"
+                    f"{statistics.median(timings):>10.1f}{max(timings):>10.1f}"
+                )
@@ -0,0 +1,67 @@
+# accounts/middleware.py
+"""
+Profile ya mtumiaji (Student / Parent / Teacher) mara moja kwa kila request.
+
+ProfileMiddleware adds request.student, request.parent and request.teacher.
+Each is lazy: nothing is queried until a view, context processor or template
+touches it, and the result (or None) is memoized on the request, so a request
+resolves each profile at most once.
+
+    student = request.student
+    if not student:
+        ...
+
+A profile that does not exist is a lazy None, so test it with ``not`` /
+truthiness rather than ``is None``.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+
+def _student(user):
+    from students.models import Student
+    return Student.objects.select_related('classroom').filter(user=user).first()
+
+
+def _parent(user):
+    from parents.models import Parent
+    return Parent.objects.filter(user=user).first()
+
+
+def _teacher(user):
+    # Teacher haina FK kwa User; tunaunganisha kwa email
+    from teachers.models import Teacher
+    if not user.email:
+        return None
+    return Teacher.objects.filter(email__iexact=user.email).first()
+
+
+RESOLVERS = {'student': _student, 'parent': _parent, 'teacher': _teacher}
+
+
+def get_profile(request, kind):
+    """The logged-in user's Student/Parent/Teacher row, or None; cached on the request."""
+    cache = request.__dict__.setdefault('_cached_profiles', {})
+    if kind not in cache:
+        user = request.user
+        cache[kind] = RESOLVERS[kind](user) if user.is_authenticated else None
+    return cache[kind]
+
+
+class ProfileMiddleware:
+    """Attach lazy request.student / request.parent / request.teacher (after AuthenticationMiddleware)."""
+
+    # Haifanyi I/O yenyewe, hivyo inafaa pia kwa async views (ASGI) bila thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        for kind in RESOLVERS:
+            setattr(request, kind, SimpleLazyObject(lambda kind=kind: get_profile(request, kind)))
+        # Kwa ASGI hii ni coroutine ya view inayofuata; Django itaisubiri
+        return self.get_response(request)
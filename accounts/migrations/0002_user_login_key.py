@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 16:50
+
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Lower, Replace, Trim
+
+
+def fill_login_keys(apps, schema_editor):
+    """Same as User.make_login_key, in one UPDATE"""
+    User = apps.get_model('accounts', 'User')
+    User.objects.update(login_key=Replace(Lower(Trim('username')), Value('/'), Value('_')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='login_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_login_keys, migrations.RunPython.noop),
+    ]
@@ -11,10 +11,24 @@ class User(AbstractUser):
         ('ACCOUNTANT', 'Accountant'),
     )
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
+    # username bila herufi kubwa/ndogo wala tofauti ya '/' na '_'
+    login_key = models.CharField(max_length=150, db_index=True, editable=False, blank=True)
 
     def __str__(self):
         return f"{self.username} ({self.role})"
 
+    @staticmethod
+    def make_login_key(username):
+        """Canonical lookup key: CA/CS1/2024/0001, ca_cs1_2024_0001 -> ca_cs1_2024_0001."""
+        return (username or '').strip().lower().replace('/', '_')
+
+    def save(self, *args, **kwargs):
+        self.login_key = self.make_login_key(self.username)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'username' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'login_key'}
+        super().save(*args, **kwargs)
+
 
 class DummyModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -1,3 +1,81 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase, override_settings
 
-# Create your tests here.
+from classes.models import ClassRoom
+from students.context_processors import student_context
+from students.models import Student
+from teachers.models import Teacher
+from .backends import SlashFriendlyModelBackend
+from .middleware import ProfileMiddleware
+
+User = get_user_model()
+
+
+class ProfileMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('s1', 'S1@example.com', 'pass', role='STUDENT')
+        cls.student = Student.objects.create(
+            full_name='Student One', email='s1@example.com', user=cls.user,
+            classroom=ClassRoom.objects.create(name='Form One', code='F1'),
+            registration_number='CA/F1/2025/0001',
+        )
+        cls.teacher = Teacher.objects.create(first_name='T', last_name='One', email='s1@example.com')
+
+    def _request(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        ProfileMiddleware(lambda r: None)(request)
+        return request
+
+    def test_profile_resolved_once_with_classroom(self):
+        with self.assertNumQueries(0):
+            request = self._request(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(request.student, self.student)
+            self.assertEqual(request.student.classroom.code, 'F1')
+            self.assertEqual(student_context(request)['student'], self.student)
+
+    def test_missing_profile_is_falsy_and_memoized(self):
+        request = self._request(self.user)
+        with self.assertNumQueries(1):
+            self.assertFalse(request.parent)
+            self.assertFalse(request.parent)
+        self.assertEqual(request.teacher, self.teacher)
+
+    def test_anonymous_user_has_no_profiles(self):
+        request = self._request(AnonymousUser())
+        with self.assertNumQueries(0):
+            self.assertFalse(request.student or request.parent or request.teacher)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginKeyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('CA/CS1/2024/0001', password='pass', role='STUDENT')
+
+    def test_login_key_follows_username(self):
+        self.assertEqual(self.user.login_key, 'ca_cs1_2024_0001')
+        self.user.username = 'CA/CS2/2024/0001'
+        self.user.save(update_fields=['username'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.login_key, 'ca_cs2_2024_0001')
+
+    def test_any_spelling_is_one_query(self):
+        backend = SlashFriendlyModelBackend()
+        for username in ('CA/CS1/2024/0001', 'ca/cs1/2024/0001', 'CA_CS1_2024_0001'):
+            with self.assertNumQueries(1):
+                self.assertEqual(backend.authenticate(None, username, 'pass'), self.user)
+        with self.assertNumQueries(1):
+            self.assertIsNone(backend.authenticate(None, 'ca_cs1_2024_0001', 'wrong'))
+        self.assertIsNone(backend.authenticate(None, 'nobody', 'pass'))
+
+    def test_exact_username_wins_over_variant(self):
+        other = User.objects.create_user('ca_cs1_2024_0001', password='other', role='STUDENT')
+        backend = SlashFriendlyModelBackend()
+        self.assertEqual(backend.authenticate(None, 'ca_cs1_2024_0001', 'other'), other)
+        self.assertEqual(backend.authenticate(None, 'CA/CS1/2024/0001', 'pass'), self.user)
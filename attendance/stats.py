@@ -0,0 +1,134 @@
+# attendance/stats.py
+"""
+Attendance statistics engine.
+
+Counts per student, per calendar month and per status come from a single
+grouped query (TruncMonth + Count with filter=Q). Totals and chart series
+are derived from that result in memory, so any date range costs one query.
+"""
+import datetime
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import ATTENDANCE_STATUS, StudentAttendance
+
+STATUSES = [code for code, _ in ATTENDANCE_STATUS]
+DEFAULT_MONTHS = 6
+
+
+def add_months(day, months):
+    """First day of the month `months` away from `day`'s month."""
+    index = day.year * 12 + day.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def months_between(start, end):
+    """First day of every calendar month from start to end, inclusive."""
+    month, last = start.replace(day=1), end.replace(day=1)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def last_months(months=DEFAULT_MONTHS, today=None):
+    """(start, end) covering the current month and the months-1 before it."""
+    today = today or timezone.localdate()
+    return add_months(today, -(max(months, 1) - 1)), today
+
+
+def range_from_params(params, default_months=DEFAULT_MONTHS):
+    """
+    Read ?start=YYYY-MM-DD&end=YYYY-MM-DD (or ?months=N) from a request.
+    Falls back to the last `default_months` calendar months.
+    """
+    try:
+        months = int(params.get('months', default_months))
+    except (TypeError, ValueError):
+        months = default_months
+    start, end = last_months(months)
+    start = parse_date(params.get('start') or '') or start
+    end = parse_date(params.get('end') or '') or end
+    return start, end
+
+
+def empty_counts():
+    counts = {status.lower(): 0 for status in STATUSES}
+    counts.update({'total': 0, 'percentage': 0})
+    return counts
+
+
+def _add(into, row):
+    for key in [status.lower() for status in STATUSES] + ['total']:
+        into[key] += row[key]
+
+
+def _finish(counts):
+    counts['percentage'] = round(counts['present'] / counts['total'] * 100, 1) if counts['total'] else 0
+    return counts
+
+
+def attendance_stats(students=None, start=None, end=None):
+    """
+    Per-student attendance counts, in one query.
+
+    `students` is a queryset or list of ids (None = every student).
+    Returns {student_id: {'totals': counts, 'months': {month_date: counts}}}
+    where counts has one key per status ('present', 'absent', 'late'),
+    'total' and 'percentage' (present / total). Students with no records
+    in the range are absent from the result.
+    """
+    qs = StudentAttendance.objects.all()
+    if students is not None:
+        qs = qs.filter(student__in=students)
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+
+    rows = (
+        qs.annotate(month=TruncMonth('date'))
+        .values('student_id', 'month')
+        .annotate(
+            total=Count('id'),
+            **{status.lower(): Count('id', filter=Q(status=status)) for status in STATUSES},
+        )
+        .order_by()
+    )
+
+    stats = {}
+    for row in rows:
+        entry = stats.setdefault(row['student_id'], {'totals': empty_counts(), 'months': {}})
+        month = row['month']
+        if isinstance(month, datetime.datetime):
+            month = month.date()
+        counts = empty_counts()
+        _add(counts, row)
+        entry['months'][month] = _finish(counts)
+        _add(entry['totals'], row)
+    for entry in stats.values():
+        _finish(entry['totals'])
+    return stats
+
+
+def monthly_series(entry, start, end, label='%b %Y'):
+    """Chart-ready list with one item per calendar month in range, gaps filled with zeros."""
+    months = entry['months'] if entry else {}
+    series = []
+    for month in months_between(start, end):
+        counts = dict(months.get(month) or empty_counts())
+        counts['month'] = month.strftime(label)
+        series.append(counts)
+    return series
+
+
+def combined_totals(stats):
+    """Sum the totals of every student in an attendance_stats() result."""
+    totals = empty_counts()
+    for entry in stats.values():
+        _add(totals, entry['totals'])
+    return _finish(totals)
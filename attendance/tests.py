@@ -1,3 +1,168 @@
+import datetime
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from classes.models import ClassRoom, Subject
+from parents.models import Parent
+from students.models import Student
+from teachers.models import Teacher
+from .models import StudentAttendance
+from .stats import attendance_stats, combined_totals, last_months, monthly_series
+from .utils import save_class_attendance
+
+
+class BulkAttendanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.classroom = ClassRoom.objects.create(name='Form One', code='F1')
+        cls.subject = Subject.objects.create(name='Maths', classroom=cls.classroom)
+        cls.students = [
+            Student.objects.create(
+                full_name=f'Pupil {i}',
+                email=f'pupil{i}@example.com',
+                classroom=cls.classroom,
+                registration_number=f'CA/F1/2025/{i:04d}',
+            )
+            for i in range(60)
+        ]
+        cls.date = datetime.date(2025, 3, 3)
+
+    def test_counts_and_statuses(self):
+        first = {s.id: 'PRESENT' for s in self.students[:3]}
+        self.assertEqual(
+            save_class_attendance(first, self.date, self.subject),
+            {'created': 3, 'updated': 0, 'unchanged': 0},
+        )
+
+        second = dict(first)
+        second[self.students[0].id] = 'ABSENT'
+        second[self.students[3].id] = 'LATE'
+        second[self.students[4].id] = 'BOGUS'
+        self.assertEqual(
+            save_class_attendance(second, self.date, self.subject),
+            {'created': 1, 'updated': 1, 'unchanged': 2},
+        )
+        self.assertEqual(
+            StudentAttendance.objects.get(student=self.students[0], date=self.date).status,
+            'ABSENT',
+        )
+
+    def test_general_attendance_without_subject_is_not_duplicated(self):
+        statuses = {s.id: 'PRESENT' for s in self.students[:5]}
+        save_class_attendance(statuses, self.date)
+        save_class_attendance(statuses, self.date)
+        self.assertEqual(StudentAttendance.objects.filter(subject__isnull=True).count(), 5)
+
+    def test_whole_class_is_written_in_constant_queries(self):
+        statuses = {s.id: 'PRESENT' for s in self.students}
+        # SAVEPOINT, SELECT existing, INSERT, RELEASE
+        with self.assertNumQueries(4):
+            save_class_attendance(statuses, self.date, self.subject)
+
+        statuses = {s.id: 'ABSENT' for s in self.students}
+        # SAVEPOINT, SELECT existing, UPDATE, RELEASE
+        with self.assertNumQueries(4):
+            save_class_attendance(statuses, self.date, self.subject)
+
+
+class AttendanceStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        classroom = ClassRoom.objects.create(name='Form Four', code='F4')
+        cls.students = [
+            Student.objects.create(
+                full_name=f'Mwanafunzi {i}',
+                email=f'mwanafunzi{i}@example.com',
+                classroom=classroom,
+                registration_number=f'CA/F4/2025/{i:04d}',
+            )
+            for i in range(3)
+        ]
+        first, second, _ = cls.students
+        # 31 Jan na 1 Feb: mipaka ya mwezi ambayo makadirio ya siku 30 yalikosea
+        for day, status in [
+            (datetime.date(2025, 1, 31), 'PRESENT'),
+            (datetime.date(2025, 2, 1), 'ABSENT'),
+            (datetime.date(2025, 2, 3), 'PRESENT'),
+            (datetime.date(2025, 4, 30), 'LATE'),
+        ]:
+            StudentAttendance.objects.create(student=first, date=day, status=status)
+        StudentAttendance.objects.create(student=second, date=datetime.date(2025, 2, 3), status='PRESENT')
+
+    def test_calendar_months_and_statuses_in_one_query(self):
+        with self.assertNumQueries(1):
+            stats = attendance_stats(self.students)
+        first = stats[self.students[0].id]
+        self.assertEqual(
+            {month.isoformat(): (c['present'], c['absent'], c['late']) for month, c in first['months'].items()},
+            {'2025-01-01': (1, 0, 0), '2025-02-01': (1, 1, 0), '2025-04-01': (0, 0, 1)},
+        )
+        self.assertEqual((first['totals']['total'], first['totals']['percentage']), (4, 50.0))
+        self.assertNotIn(self.students[2].id, stats)
+        self.assertEqual(combined_totals(stats)['present'], 3)
+
+    def test_date_range_and_series_fill_empty_months(self):
+        start, end = last_months(4, today=datetime.date(2025, 4, 15))
+        self.assertEqual(start, datetime.date(2025, 1, 1))
+        stats = attendance_stats(self.students, start=datetime.date(2025, 2, 1), end=end)
+        series = monthly_series(stats[self.students[0].id], start, end)
+        self.assertEqual(
+            [(m['month'], m['total']) for m in series],
+            [('Jan 2025', 0), ('Feb 2025', 2), ('Mar 2025', 0), ('Apr 2025', 0)],
+        )
+
+
+class AttendanceStatsApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.form_one = ClassRoom.objects.create(name='Form One', code='F1')
+        cls.form_two = ClassRoom.objects.create(name='Form Two', code='F2')
+        cls.asha, cls.juma = [
+            Student.objects.create(
+                full_name=name, email=f'{name.lower()}@example.com', classroom=classroom,
+                registration_number=f'CA/API/2025/{i:04d}', user=User.objects.create_user(name.lower(), password='x'),
+            )
+            for i, (name, classroom) in enumerate([('Asha', cls.form_one), ('Juma', cls.form_two)])
+        ]
+        cls.teacher_user = User.objects.create_user('mwalimu', password='x', email='mwalimu@example.com')
+        Teacher.objects.create(first_name='Mwalimu', last_name='One', email='mwalimu@example.com').classes.add(cls.form_one)
+        cls.parent_user = User.objects.create_user('mzazi', password='x')
+        Parent.objects.create(
+            user=cls.parent_user, full_name='Mzazi', phone='+255700000000', email='', address='Dodoma'
+        ).students.add(cls.juma)
+
+    def ids(self, user, **params):
+        self.client.force_login(user)
+        response = self.client.get(reverse('attendance:attendance_stats_api'), params)
+        self.assertEqual(response.status_code, 200)
+        return {s['student_id'] for s in response.json()['students']}
+
+    def setUp(self):
+        for student in (self.asha, self.juma):
+            StudentAttendance.objects.create(student=student, date=timezone.localdate(), status='PRESENT')
+
+    def test_each_role_sees_only_its_students(self):
+        self.assertEqual(self.ids(self.asha.user, student=self.juma.id), set())
+        self.assertEqual(self.ids(self.asha.user), {self.asha.id})
+        self.assertEqual(self.ids(self.parent_user, classroom=self.form_one.id), set())
+        self.assertEqual(self.ids(self.parent_user), {self.juma.id})
+        self.assertEqual(self.ids(self.teacher_user), {self.asha.id})
+        staff = get_user_model().objects.create_user('staff', password='x', is_staff=True)
+        self.assertEqual(self.ids(staff), {self.asha.id, self.juma.id})
+
+        self.client.force_login(get_user_model().objects.create_user('mgeni', password='x'))
+        self.assertEqual(self.client.get(reverse('attendance:attendance_stats_api')).status_code, 403)
 
-# Create your tests here.
+    def test_invalid_parameters_are_rejected(self):
+        self.client.force_login(self.asha.user)
+        url = reverse('attendance:attendance_stats_api')
+        for params in ({'student': 'abc'}, {'classroom': '1;drop'}, {'months': 'x'},
+                       {'months': '999999'}, {'start': '2025-02-30'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
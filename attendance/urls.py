@@ -11,4 +11,5 @@ urlpatterns = [
     path('teacher/mark/',   views.teacher_mark_attendance,  name='teacher_mark_attendance'),
     path('my/',             views.my_attendance,            name='my_attendance'),
     path('students/monthly/', views.monthly_student_report, name='monthly_student_report'),
+    path('students/stats/',   views.attendance_stats_api,   name='attendance_stats_api'),
 ]
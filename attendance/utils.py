@@ -0,0 +1,86 @@
+# attendance/utils.py
+from django.db import transaction
+
+from parents.snapshot import bump_students
+from students.models import Student
+from .models import ATTENDANCE_STATUS, StudentAttendance
+
+VALID_STATUSES = {code for code, _ in ATTENDANCE_STATUS}
+
+
+def statuses_from_post(post, students):
+    """Pick `student_<id>` values from a submitted attendance form"""
+    statuses = {}
+    for student in students:
+        status = post.get(f'student_{student.id}')
+        if status in VALID_STATUSES:
+            statuses[student.id] = status
+    return statuses
+
+
+def save_class_attendance(statuses, date, subject=None):
+    """
+    Bulk upsert of attendance for one (date, subject) sheet.
+
+    `statuses` maps student_id -> status. Existing rows are loaded in one
+    query, then new rows go through a single bulk_create and changed rows
+    through a single bulk_update, all in one transaction.
+
+    Subject sheets rely on the (student, date, subject) unique constraint
+    for concurrent inserts. Whole-day sheets (subject=None) cannot: NULLs
+    never conflict on Postgres, so they lock the students' rows first and
+    two saves of the same sheet run one after the other.
+
+    Returns {'created': n, 'updated': n, 'unchanged': n}.
+    """
+    statuses = {sid: status for sid, status in statuses.items() if status in VALID_STATUSES}
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+    if not statuses:
+        return counts
+
+    with transaction.atomic():
+        if subject is None:
+            list(Student.objects.select_for_update().filter(pk__in=statuses.keys()).values_list('pk', flat=True))
+        existing = {
+            row.student_id: row
+            for row in StudentAttendance.objects.select_for_update().filter(
+                date=date,
+                subject=subject,
+                student_id__in=statuses.keys(),
+            )
+        }
+
+        to_create = []
+        to_update = []
+        for student_id, status in statuses.items():
+            row = existing.get(student_id)
+            if row is None:
+                to_create.append(StudentAttendance(
+                    student_id=student_id, date=date, subject=subject, status=status
+                ))
+            elif row.status != status:
+                row.status = status
+                to_update.append(row)
+            else:
+                counts['unchanged'] += 1
+
+        if to_create and subject is None:
+            # Wanafunzi wamefungwa juu, hakuna request nyingine iliyoingiza row hizi
+            StudentAttendance.objects.bulk_create(to_create)
+        elif to_create:
+            # update_conflicts covers a row inserted by a concurrent request
+            # between the read above and this write (subject is never NULL here).
+            StudentAttendance.objects.bulk_create(
+                to_create,
+                update_conflicts=True,
+                unique_fields=['student', 'date', 'subject'],
+                update_fields=['status'],
+            )
+        if to_update:
+            StudentAttendance.objects.bulk_update(to_update, ['status'])
+        # bulk_create/bulk_update hazitumi signals
+        bump_students(row.student_id for row in to_create + to_update)
+
+    counts['created'] = len(to_create)
+    counts['updated'] = len(to_update)
+    return counts
@@ -7,12 +7,14 @@ from django.utils import timezone
 from django.contrib import messages
 from django.db.models import Q
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 
-from dashboard.models import SchoolSettings
 from students.models import Student
 from teachers.models import Teacher
 from classes.models import ClassRoom, Subject
 from .models import StudentAttendance, TeacherAttendance
+from .stats import add_months, attendance_stats, combined_totals, monthly_series, range_from_params
+from .utils import save_class_attendance, statuses_from_post
 
 
 # ──────────────────────────────────────────────────────────────────
@@ -79,19 +81,15 @@ def mark_student_attendance(request):
                 Q(registration_number__icontains=saved_search)
             )
 
-        count = 0
-        for student in save_students:
-            status = request.POST.get(f'student_{student.id}')
-            if status in ('PRESENT', 'ABSENT', 'LATE'):
-                StudentAttendance.objects.update_or_create(
-                    student=student,
-                    date=save_date,
-                    subject=save_subject_obj,
-                    defaults={'status': status}
-                )
-                count += 1
+        statuses = statuses_from_post(request.POST, save_students.only('id'))
+        result = save_class_attendance(statuses, save_date, save_subject_obj)
+        count = len(statuses)
 
-        messages.success(request, f"Attendance saved for {save_date.strftime('%B %d, %Y')} — {count} record(s) ✓")
+        messages.success(
+            request,
+            f"Attendance saved for {save_date.strftime('%B %d, %Y')} — {count} record(s) ✓ "
+            f"({result['created']} new, {result['updated']} updated, {result['unchanged']} unchanged)"
+        )
         return redirect(
             f"{request.path}?class_id={saved_class}&subject_id={saved_subject}&date={saved_date}&search={saved_search}"
         )
@@ -205,19 +203,15 @@ def teacher_mark_attendance(request):
                 Q(registration_number__icontains=saved_search)
             )
 
-        count = 0
-        for student in save_students:
-            status = request.POST.get(f'student_{student.id}')
-            if status in ('PRESENT', 'ABSENT', 'LATE'):
-                StudentAttendance.objects.update_or_create(
-                    student=student,
-                    date=save_date,
-                    subject=save_subject_obj,
-                    defaults={'status': status}
-                )
-                count += 1
+        statuses = statuses_from_post(request.POST, save_students.only('id'))
+        result = save_class_attendance(statuses, save_date, save_subject_obj)
+        count = len(statuses)
 
-        messages.success(request, f"Attendance saved — {count} record(s) ✓")
+        messages.success(
+            request,
+            f"Attendance saved — {count} record(s) ✓ "
+            f"({result['created']} new, {result['updated']} updated, {result['unchanged']} unchanged)"
+        )
         return redirect(
             f"{request.path}?class_id={saved_class}&subject_id={saved_subject}&date={saved_date}&search={saved_search}"
         )
@@ -321,21 +315,96 @@ def teacher_attendance_list(request):
 @login_required
 def monthly_student_report(request):
     month = request.GET.get('month')
-    records = StudentAttendance.objects.select_related('student', 'subject').all()
-    if month:
-        records = records.filter(date__month=month)
+    today = timezone.localdate()
+    try:
+        year = int(request.GET.get('year') or today.year)
+    except ValueError:
+        year = today.year
+
+    # Mwezi kamili wa kalenda wa mwaka husika (si kila mwezi huo wa miaka yote)
+    if month and month.isdigit() and 1 <= int(month) <= 12:
+        start = datetime.date(year, int(month), 1)
+        end = add_months(start, 1) - datetime.timedelta(days=1)
+    else:
+        month = None
+        start, end = datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+
+    records = StudentAttendance.objects.select_related(
+        'student', 'student__classroom', 'subject'
+    ).filter(date__range=(start, end)).order_by('-date')
     return render(request, 'attendance/monthly_report.html', {
-        'records': records, 'month': month
+        'records': records, 'month': month,
+        'current_year': year, 'today': today,
+        'summary': combined_totals(attendance_stats(start=start, end=end)),
+    })
+
+
+def _stats_students(request):
+    """Students whose attendance this user may read; None when they may read none."""
+    if request.user.is_staff:
+        return Student.objects.all()
+    if request.teacher:
+        return Student.objects.filter(classroom__in=request.teacher.classes.all())
+    if request.parent:
+        return request.parent.students.all()
+    if request.student:
+        return Student.objects.filter(pk=request.student.pk)
+    return None
+
+
+@login_required
+def attendance_stats_api(request):
+    """
+    JSON for the attendance charts.
+    ?student=<id> or ?classroom=<id>, plus ?start/&end (YYYY-MM-DD) or ?months=N.
+    Staff see everyone, teachers their classes, parents their children and
+    a student only themselves.
+    """
+    students = _stats_students(request)
+    if students is None:
+        return JsonResponse({'error': 'Not allowed'}, status=403)
+
+    params = {}
+    for name in ('student', 'classroom', 'months'):
+        value = request.GET.get(name)
+        if value:
+            if not value.isdigit():
+                return JsonResponse({'error': f'{name} must be a positive integer'}, status=400)
+            params[name] = int(value)
+    try:
+        start, end = range_from_params(request.GET)
+    except ValueError:
+        # Tarehe isiyo halali (mf. 2025-02-30) au months kubwa kupita kiasi
+        return JsonResponse({'error': 'Invalid date range'}, status=400)
+
+    if 'student' in params:
+        students = students.filter(id=params['student'])
+    if 'classroom' in params:
+        students = students.filter(classroom_id=params['classroom'])
+
+    stats = attendance_stats(students.values('id'), start, end)
+    names = dict(Student.objects.filter(id__in=stats.keys()).values_list('id', 'full_name'))
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'totals': combined_totals(stats),
+        'students': [
+            {
+                'student_id': student_id,
+                'student_name': names.get(student_id, ''),
+                'totals': entry['totals'],
+                'months': monthly_series(entry, start, end),
+            }
+            for student_id, entry in stats.items()
+        ],
     })
 
 
 @login_required
 def my_attendance(request):
-    try:
-        student = request.user.student_profile
+    records = []
+    if request.student:
         records = StudentAttendance.objects.filter(
-            student=student
+            student=request.student
         ).select_related('subject').order_by('-date')
-    except Exception:
-        records = []
     return render(request, 'attendance/my_attendance.html', {'records': records})
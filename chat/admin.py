@@ -1,5 +1,7 @@
-from django.contrib import admin
-from .models import ChatSession, ChatMessage
+from django.contrib import admin, messages
+from .models import ChatArchive, ChatSession, ChatMessage
+from .retention import restore_session
+from .throttle import stats as throttle_stats
 
 
 class ChatMessageInline(admin.TabularInline):
@@ -38,6 +40,11 @@ class ChatSessionAdmin(admin.ModelAdmin):
 
     inlines = [ChatMessageInline]
 
+    def changelist_view(self, request, extra_context=None):
+        # Counters za throttling (kutoka cache) juu ya orodha ya sessions
+        extra_context = {**(extra_context or {}), 'throttle_stats': throttle_stats()}
+        return super().changelist_view(request, extra_context)
+
 
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
@@ -54,4 +61,44 @@ class ChatMessageAdmin(admin.ModelAdmin):
 
     def short_message(self, obj):
         return obj.message[:50]
-    short_message.short_description = "Message"
\ No newline at end of file
+    short_message.short_description = "Message"
+
+@admin.register(ChatArchive)
+class ChatArchiveAdmin(admin.ModelAdmin):
+    list_display = (
+        'guest_name',
+        'guest_email',
+        'message_count',
+        'created_at',
+        'updated_at',
+        'archived_at'
+    )
+
+    list_filter = ('archived_at',)
+    search_fields = ('session_id', 'guest_name', 'guest_email', 'user__username')
+    exclude = ('payload',)
+    readonly_fields = (
+        'session_id',
+        'user',
+        'guest_name',
+        'guest_email',
+        'created_at',
+        'updated_at',
+        'message_count',
+        'archived_at'
+    )
+    actions = ['restore']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Restore selected chats")
+    def restore(self, request, queryset):
+        restored = 0
+        for archive in queryset:
+            try:
+                restore_session(archive.session_id)
+                restored += 1
+            except ValueError as e:
+                self.message_user(request, str(e), messages.WARNING)
+        self.message_user(request, f"{restored} chat(s) restored.", messages.SUCCESS)
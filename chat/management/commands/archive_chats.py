@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from chat import retention
+from chat.models import ChatArchive, ChatSession
+
+
+class Command(BaseCommand):
+    help = 'Move old closed chat sessions into the compressed ChatArchive table, or restore archived ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=retention.RETENTION_DAYS,
+            help=f'Archive closed sessions idle for at least this many days (default {retention.RETENTION_DAYS})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=retention.BATCH_SIZE,
+            help=f'Sessions archived per transaction (default {retention.BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the sessions that would be archived'
+        )
+        parser.add_argument(
+            '--restore',
+            nargs='+',
+            metavar='SESSION_ID',
+            help='Restore these archived sessions instead of archiving'
+        )
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            for session_id in options['restore']:
+                try:
+                    session = retention.restore_session(session_id)
+                except (ChatArchive.DoesNotExist, ValueError) as e:
+                    raise CommandError(f"Cannot restore {session_id}: {e}")
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ Restored {session.display_name} ({session.session_id}) with {session.messages.count()} messages"
+                ))
+            return
+
+        days = max(options['days'], 0)
+        if options['dry_run']:
+            count = ChatSession.objects.filter(
+                status='closed', updated_at__lt=timezone.now() - timedelta(days=days)
+            ).count()
+            self.stdout.write(f"🔎 {count} closed sessions idle for {days}+ days would be archived")
+            return
+
+        self.stdout.write(f"\n🗄️ Archiving closed chat sessions idle for {days}+ days...\n")
+
+        def progress(sessions, messages):
+            self.stdout.write(f"  📦 {sessions} sessions, {messages} messages")
+
+        sessions, messages = retention.archive_sessions(
+            days, batch_size=max(options['batch_size'], 1), progress=progress
+        )
+        self.stdout.write(self.style.SUCCESS(f"\n✅ Archived {sessions} sessions ({messages} messages)"))
@@ -18,6 +18,8 @@ class ChatSession(models.Model):
 
     class Meta:
         ordering = ['-updated_at']
+        # Retention inatafuta sessions zilizofungwa kwa muda mrefu
+        indexes = [models.Index(fields=['status', 'updated_at'])]
 
     def __str__(self):
         name = self.user.get_full_name() if self.user else self.guest_name
@@ -45,6 +47,31 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        # Polls husoma "ujumbe wa session hii baada ya id X"
+        indexes = [models.Index(fields=['session', 'id'])]
 
     def __str__(self):
         return f"[{self.sender}] {self.message[:50]}"
+
+
+class ChatArchive(models.Model):
+    """
+    A closed chat session moved out of the hot tables by `archive_chats`.
+    The session and its messages are kept as gzip-compressed JSON in payload;
+    chat.retention.restore_session() puts them back.
+    """
+    session_id    = models.UUIDField(unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    guest_name    = models.CharField(max_length=100, blank=True)
+    guest_email   = models.EmailField(blank=True)
+    created_at    = models.DateTimeField()
+    updated_at    = models.DateTimeField()
+    message_count = models.PositiveIntegerField(default=0)
+    payload       = models.BinaryField()
+    archived_at   = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+
+    def __str__(self):
+        return f"Archived chat – {self.guest_name} ({self.session_id})"
@@ -0,0 +1,190 @@
+# chat/notify.py
+"""
+Kuamsha long-polls za chat ujumbe mpya ukiandikwa.
+
+The async wait endpoints subscribe to a channel (one per chat session) and
+sleep on an asyncio.Event; no thread or DB connection is held while they
+wait. Views that write call publish(session_id) and every waiter on that
+session wakes up after the transaction commits.
+
+    CHAT_NOTIFIER = 'postgres'   # pg_notify + one LISTEN thread per process,
+                                 # for several ASGI workers/servers
+    CHAT_NOTIFIER = 'local'      # waiters in this process only
+
+Unset, 'postgres' is used on PostgreSQL and 'local' on anything else. With
+'local' and several workers, a waiter on another worker is not woken and
+simply returns at its timeout; the client then polls again. LISTEN needs a
+session-level connection: a direct one or a session pooler (Supabase on
+port 5432), not a transaction pooler.
+"""
+import asyncio
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+PG_CHANNEL = 'chat_events'
+
+
+def session_channel(session_id):
+    return f'session:{session_id}'
+
+
+class Subscription:
+    """One waiter. Create it inside the event loop, before reading the DB, so no wake-up is missed."""
+
+    def __init__(self, notifier, channel):
+        self.notifier = notifier
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def wake(self):
+        # Inaitwa kutoka thread yoyote (sync view, LISTEN thread)
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout):
+        """True when woken, False on timeout."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def __enter__(self):
+        self.notifier.add(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.notifier.remove(self)
+
+
+class LocalNotifier:
+    """Waiters registered in this process, woken by notify() from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = defaultdict(set)
+
+    def subscribe(self, channel):
+        return Subscription(self, channel)
+
+    def add(self, subscription):
+        with self._lock:
+            self._waiters[subscription.channel].add(subscription)
+
+    def remove(self, subscription):
+        with self._lock:
+            waiters = self._waiters.get(subscription.channel)
+            if waiters is not None:
+                waiters.discard(subscription)
+                if not waiters:
+                    del self._waiters[subscription.channel]
+
+    def waiting(self, channel):
+        with self._lock:
+            return len(self._waiters.get(channel, ()))
+
+    def wake(self, channel):
+        with self._lock:
+            waiters = list(self._waiters.get(channel, ()))
+        for subscription in waiters:
+            subscription.wake()
+
+    def notify(self, channel):
+        self.wake(channel)
+
+    def publish(self, channel):
+        """Wake waiters on `channel` once the current transaction commits."""
+        transaction.on_commit(lambda: self.notify(channel))
+
+
+class PostgresNotifier(LocalNotifier):
+    """
+    LocalNotifier across processes: notify() sends pg_notify, and one
+    LISTEN thread per process wakes the local waiters (including its own).
+    """
+
+    RECONNECT_MAX = 30
+
+    def __init__(self, alias='default'):
+        super().__init__()
+        self.alias = alias
+        self._listener = None
+
+    def add(self, subscription):
+        self._ensure_listener()
+        super().add(subscription)
+
+    def notify(self, channel):
+        try:
+            with connections[self.alias].cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [PG_CHANNEL, channel])
+        except Exception as e:
+            logger.warning(f"pg_notify failed, waking local waiters only: {e}")
+            self.wake(channel)
+
+    def _ensure_listener(self):
+        if self._listener is None or not self._listener.is_alive():
+            with self._lock:
+                if self._listener is None or not self._listener.is_alive():
+                    self._listener = threading.Thread(target=self._listen_forever, name='chat-listen', daemon=True)
+                    self._listener.start()
+
+    def _listen_forever(self):
+        delay = 1
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning(f"Chat LISTEN connection lost, retrying in {delay}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, self.RECONNECT_MAX)
+            else:
+                delay = 1
+
+    def _listen(self):
+        db = connections[self.alias]
+        # Connection yake yenyewe (si ya request), autocommit ili LISTEN ifanye kazi
+        conn = db.get_new_connection(db.get_connection_params())
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {PG_CHANNEL}')
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self.wake(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    global _notifier
+    if _notifier is None:
+        with _notifier_lock:
+            if _notifier is None:
+                default = 'postgres' if connection.vendor == 'postgresql' else 'local'
+                backend = getattr(settings, 'CHAT_NOTIFIER', default)
+                if backend == 'postgres' and connection.vendor == 'postgresql':
+                    _notifier = PostgresNotifier()
+                else:
+                    _notifier = LocalNotifier()
+    return _notifier
+
+
+def publish(session_id):
+    """A chat session changed (new message, closed): wake its long-polls after commit."""
+    get_notifier().publish(session_channel(session_id))
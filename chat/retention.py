@@ -0,0 +1,141 @@
+# chat/retention.py
+"""
+Kuhamisha chat za zamani kutoka kwenye tables zinazotumika kila siku.
+
+    archive_sessions()            # closed sessions idle for CHAT_RETENTION_DAYS (90)
+    restore_session(session_id)   # back into ChatSession / ChatMessage
+
+archive_sessions() works in batches. Each batch is one transaction:
+
+  * lock up to `batch_size` old closed sessions;
+  * read all their messages in one query;
+  * write one ChatArchive row per session, with the session and its
+    messages as gzip-compressed JSON;
+  * delete the sessions (their messages go in the same cascade DELETE)
+    and their poll version stamps.
+
+Messages keep their ids on restore, so a client's `after` cursor stays valid.
+"""
+import gzip
+import json
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import versions
+from .models import ChatArchive, ChatMessage, ChatSession
+
+RETENTION_DAYS = getattr(settings, 'CHAT_RETENTION_DAYS', 90)
+BATCH_SIZE = 200
+
+MESSAGE_FIELDS = ('id', 'sender', 'message', 'timestamp', 'is_read')
+
+
+def _pack(session, messages):
+    data = {
+        'status': session.status,
+        'is_read_by_admin': session.is_read_by_admin,
+        'messages': [
+            {field: m[field] for field in MESSAGE_FIELDS} | {'timestamp': m['timestamp'].isoformat()}
+            for m in messages
+        ],
+    }
+    return gzip.compress(json.dumps(data, separators=(',', ':')).encode())
+
+
+def _unpack(payload):
+    return json.loads(gzip.decompress(bytes(payload)))
+
+
+def archive_batch(cutoff, batch_size=BATCH_SIZE):
+    """Archive up to batch_size sessions closed and idle since before cutoff. Returns (sessions, messages)."""
+    with transaction.atomic():
+        # Lock: ujumbe mpya hauwezi kuingia kwenye session tunayoihamisha
+        sessions = list(
+            ChatSession.objects.select_for_update(skip_locked=True)
+            .filter(status='closed', updated_at__lt=cutoff)
+            .order_by('updated_at', 'pk')[:batch_size]
+        )
+        if not sessions:
+            return 0, 0
+
+        rows = (
+            ChatMessage.objects.filter(session__in=sessions)
+            .order_by('session_id', 'id')
+            .values('session_id', *MESSAGE_FIELDS)
+        )
+        by_session = {pk: list(msgs) for pk, msgs in groupby(rows, key=itemgetter('session_id'))}
+
+        archives = []
+        for session in sessions:
+            messages = by_session.get(session.pk, [])
+            archives.append(ChatArchive(
+                session_id=session.session_id,
+                user_id=session.user_id,
+                guest_name=session.guest_name,
+                guest_email=session.guest_email,
+                created_at=session.created_at,
+                updated_at=session.updated_at,
+                message_count=len(messages),
+                payload=_pack(session, messages),
+            ))
+        ChatArchive.objects.bulk_create(archives)
+        ChatSession.objects.filter(pk__in=[s.pk for s in sessions]).delete()
+        versions.forget([s.session_id for s in sessions])
+
+    return len(sessions), sum(a.message_count for a in archives)
+
+
+def archive_sessions(days=None, batch_size=BATCH_SIZE, progress=None):
+    """Archive every old closed session. progress(sessions, messages) is called after each batch."""
+    cutoff = timezone.now() - timedelta(days=RETENTION_DAYS if days is None else days)
+    total_sessions = total_messages = 0
+    while True:
+        sessions, messages = archive_batch(cutoff, batch_size)
+        if not sessions:
+            break
+        total_sessions += sessions
+        total_messages += messages
+        if progress:
+            progress(total_sessions, total_messages)
+    return total_sessions, total_messages
+
+
+def restore_session(session_id):
+    """Move an archived session back into the chat tables and return it."""
+    with transaction.atomic():
+        archive = ChatArchive.objects.select_for_update().get(session_id=session_id)
+        if ChatSession.objects.filter(session_id=archive.session_id).exists():
+            raise ValueError(f"Chat session {archive.session_id} already exists")
+
+        data = _unpack(archive.payload)
+        session = ChatSession.objects.create(
+            session_id=archive.session_id,
+            user_id=archive.user_id,
+            guest_name=archive.guest_name,
+            guest_email=archive.guest_email,
+            status=data['status'],
+            is_read_by_admin=data['is_read_by_admin'],
+        )
+        # auto_now / auto_now_add zimeweka muda wa sasa; rudisha tarehe halisi
+        ChatSession.objects.filter(pk=session.pk).update(
+            created_at=archive.created_at, updated_at=archive.updated_at
+        )
+        session.created_at, session.updated_at = archive.created_at, archive.updated_at
+
+        messages = [
+            ChatMessage(id=m['id'], session=session, sender=m['sender'], message=m['message'], is_read=m['is_read'])
+            for m in data['messages']
+        ]
+        ChatMessage.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+        for msg, m in zip(messages, data['messages']):
+            msg.timestamp = parse_datetime(m['timestamp'])
+        ChatMessage.objects.bulk_update(messages, ['timestamp'], batch_size=BATCH_SIZE)
+
+        archive.delete()
+    return session
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import ChatMessage, ChatSession
+from .versions import bump
+
+
+@receiver(post_save, sender=ChatSession)
+@receiver(post_delete, sender=ChatSession)
+def refresh_polls_for_session(sender, instance, **kwargs):
+    """Session created, read, closed or deleted - its polls and the admin inbox must refetch"""
+    bump(instance.session_id)
+
+
+@receiver(post_save, sender=ChatMessage)
+def refresh_polls_for_message(sender, instance, **kwargs):
+    bump(instance.session.session_id)
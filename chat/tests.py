@@ -0,0 +1,310 @@
+import asyncio
+import re
+import threading
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import ChatArchive, ChatMessage, ChatSession
+from .notify import LocalNotifier, PostgresNotifier
+from dashboard import stamps
+from dashboard.models import VersionStamp
+from . import notify, retention, throttle, versions, views
+
+# Kwa tests zinazohesabu queries za chat tu, hata REDIS_URL ikiwa imewekwa
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def touched_tables(queries):
+    return {table for q in queries for table in re.findall(r'(?:FROM|INTO|UPDATE) "(\w+)"', q['sql'])}
+
+
+class LongPollTests(TestCase):
+
+    def setUp(self):
+        self.session = ChatSession.objects.create(guest_name='Asha')
+        self.wait_url = reverse('chat:wait_messages', args=[self.session.session_id])
+
+    async def test_notifier_wakes_waiter_from_other_thread(self):
+        notifier = LocalNotifier()
+        with notifier.subscribe('session:x') as waiter:
+            self.assertEqual(notifier.waiting('session:x'), 1)
+            threading.Timer(0.05, notifier.notify, ['session:x']).start()
+            self.assertTrue(await waiter.wait(2))
+        self.assertEqual(notifier.waiting('session:x'), 0)
+
+    def test_postgres_notifier_is_the_default_on_postgresql(self):
+        for vendor, expected in (('postgresql', PostgresNotifier), ('sqlite', LocalNotifier)):
+            with self.settings(), mock.patch.object(notify, '_notifier', None), \
+                    mock.patch.object(connection, 'vendor', vendor):
+                del settings.CHAT_NOTIFIER
+                self.assertIs(type(notify.get_notifier()), expected)
+
+    def test_returns_at_once_when_messages_exist(self):
+        msg = ChatMessage.objects.create(session=self.session, sender='admin', message='Karibu')
+        response = self.client.get(self.wait_url, {'after': 0})
+        self.assertEqual([m['id'] for m in response.json()['messages']], [msg.id])
+        msg.refresh_from_db()
+        self.assertTrue(msg.is_read)
+
+    def test_times_out_with_empty_list(self):
+        started = time.monotonic()
+        response = self.client.get(self.wait_url, {'after': 0, 'timeout': 0.1})
+        self.assertEqual(response.json(), {'messages': [], 'session_status': 'open'})
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_admin_wait_requires_staff(self):
+        response = self.client.get(reverse('chat:admin_wait', args=[self.session.session_id]))
+        self.assertEqual(response.status_code, 302)
+
+
+class LongPollWakeTests(TransactionTestCase):
+    # Bila transaction ya test, publish() (on_commit) inafanya kazi kama production
+
+    async def test_send_message_wakes_waiting_request(self):
+        session = await ChatSession.objects.acreate(guest_name='Asha')
+        started = time.monotonic()
+        waiting = asyncio.create_task(self.async_client.get(
+            reverse('chat:wait_messages', args=[session.session_id]), {'after': 0, 'timeout': 10}
+        ))
+        await asyncio.sleep(0.2)
+        self.assertFalse(waiting.done())
+
+        await self.async_client.post(
+            reverse('chat:send_message'),
+            {'session_id': str(session.session_id), 'message': 'Habari'},
+            content_type='application/json',
+        )
+        response = await asyncio.wait_for(waiting, 5)
+        self.assertEqual([m['message'] for m in response.json()['messages']], ['Habari'])
+        self.assertLess(time.monotonic() - started, 5)
+
+
+class AdminInboxTests(TestCase):
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_user('inbox-admin', password='x', is_staff=True)
+        self.client.force_login(self.admin)
+        self.url = reverse('chat:admin_sessions')
+
+    def make_session(self, name, *messages):
+        session = ChatSession.objects.create(guest_name=name)
+        for sender, text in messages:
+            ChatMessage.objects.create(session=session, sender=sender, message=text)
+        return session
+
+    def inbox(self, **params):
+        return self.client.get(self.url, params).json()
+
+    def test_annotations_and_constant_query_count(self):
+        self.make_session('Asha', ('student', 'Habari'), ('admin', 'Karibu'), ('student', 'Ada?'))
+        self.make_session('Juma')
+        self.client.get(self.url)  # stamp ya inbox inaundwa mara ya kwanza
+        # session + user + stamp + inbox, bila kujali idadi ya sessions
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+        for i in range(5):
+            self.make_session(f'S{i}', ('student', 'x'))
+        with self.assertNumQueries(4):
+            data = self.client.get(self.url).json()
+
+        asha = next(s for s in data['sessions'] if s['name'] == 'Asha')
+        self.assertEqual((asha['last_message'], asha['unread']), ('Ada?', 2))
+        juma = next(s for s in data['sessions'] if s['name'] == 'Juma')
+        self.assertEqual((juma['last_message'], juma['unread']), ('', 0))
+
+    def test_cursor_pages_cover_every_session_once(self):
+        for i in range(5):
+            self.make_session(f'S{i}')
+        # updated_at sawa kwa wote: cursor inategemea pk pia
+        ChatSession.objects.update(updated_at=timezone.now())
+        names, cursor = [], None
+        with mock.patch.object(views, 'INBOX_PAGE_SIZE', 2):
+            while True:
+                data = self.inbox(**({'cursor': cursor} if cursor else {}))
+                names += [s['name'] for s in data['sessions']]
+                cursor = data['next_cursor']
+                if not cursor:
+                    break
+        self.assertEqual(sorted(names), [f'S{i}' for i in range(5)])
+
+    def test_since_returns_only_changed_sessions(self):
+        old = self.make_session('Old')
+        ChatSession.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        first = self.inbox()
+        self.assertEqual(self.inbox(since=first['latest'])['sessions'][0]['name'], 'Old')
+
+        ChatSession.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(hours=2))
+        new = self.make_session('New')
+        data = self.inbox(since=first['latest'])
+        self.assertEqual([s['id'] for s in data['sessions']], [str(new.session_id)])
+        self.assertEqual(data['latest'], new.updated_at.isoformat())
+
+
+class ConditionalPollTests(TestCase):
+
+    def setUp(self):
+        throttle._cache().clear()
+        self.session = ChatSession.objects.create(guest_name='Asha')
+        self.poll_url = reverse('chat:poll_messages', args=[self.session.session_id])
+
+    def poll(self, etag=None, after=0):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(self.poll_url, {'after': after}, headers=headers)
+
+    def test_current_version_is_answered_from_cache(self):
+        first = self.poll()
+        self.assertEqual(first.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.poll(first['ETag']).status_code, 304)
+        # Stamp moja, hakuna table ya chat
+        self.assertEqual((len(queries), touched_tables(queries)), (1, {'dashboard_versionstamp'}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatMessage.objects.create(session=self.session, sender='admin', message='Karibu')
+        second = self.poll(first['ETag'])
+        self.assertEqual([m['message'] for m in second.json()['messages']], ['Karibu'])
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+    def test_bump_from_another_worker_is_seen(self):
+        # Stamp ya pamoja: hata cache ya process hii ikiwa LocMem, bump ya worker mwingine inaonekana
+        first = self.poll()
+        with override_settings(CACHES=LOCMEM_CACHES):
+            stamps.bump([versions._session_key(self.session.session_id)])
+            self.assertEqual(self.poll(first['ETag']).status_code, 200)
+
+    def test_read_receipts_only_written_when_unread(self):
+        msg = ChatMessage.objects.create(session=self.session, sender='admin', message='Karibu')
+        with CaptureQueriesContext(connection) as queries:
+            self.poll()
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in queries), 1)
+        msg.refresh_from_db()
+        self.assertTrue(msg.is_read)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.poll()
+        self.assertFalse(any(q['sql'].startswith('UPDATE') for q in queries))
+
+    def test_admin_reading_changes_inbox_version(self):
+        admin = get_user_model().objects.create_user('poll-admin', password='x', is_staff=True)
+        self.client.force_login(admin)
+        ChatMessage.objects.create(session=self.session, sender='student', message='Habari')
+        inbox = self.client.get(reverse('chat:admin_sessions'))
+        headers = {'If-None-Match': inbox['ETag']}
+        self.assertEqual(self.client.get(reverse('chat:admin_sessions'), headers=headers).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('chat:admin_messages', args=[self.session.session_id]))
+        again = self.client.get(reverse('chat:admin_sessions'), headers=headers)
+        self.assertEqual(again.json()['sessions'][0]['unread'], 0)
+
+
+class RetentionTests(TestCase):
+
+    def make_session(self, status, age_days, *texts):
+        session = ChatSession.objects.create(guest_name=f'{status}-{age_days}', status=status)
+        for text in texts:
+            ChatMessage.objects.create(session=session, sender='student', message=text)
+        ChatSession.objects.filter(pk=session.pk).update(updated_at=timezone.now() - timedelta(days=age_days))
+        return session
+
+    def test_archive_and_restore_round_trip(self):
+        old = self.make_session('closed', 120, 'Habari', 'Asante')
+        self.make_session('closed', 120)
+        self.make_session('open', 120, 'Bado')
+        self.make_session('closed', 5, 'Jana')
+        before = list(old.messages.values_list('id', 'message', 'timestamp'))
+        stamps.bump([versions._session_key(old.session_id)])
+
+        self.assertEqual(retention.archive_sessions(days=90, batch_size=1), (2, 2))
+        self.assertFalse(ChatSession.objects.filter(pk=old.pk).exists())
+        self.assertEqual(ChatMessage.objects.count(), 2)
+        self.assertEqual(ChatArchive.objects.get(session_id=old.session_id).message_count, 2)
+        self.assertFalse(VersionStamp.objects.filter(key__contains=str(old.session_id)).exists())
+
+        restored = retention.restore_session(old.session_id)
+        self.assertEqual(list(restored.messages.values_list('id', 'message', 'timestamp')), before)
+        restored.refresh_from_db()
+        self.assertEqual(restored.status, 'closed')
+        self.assertLess(restored.updated_at, timezone.now() - timedelta(days=119))
+        self.assertFalse(ChatArchive.objects.filter(session_id=old.session_id).exists())
+
+    def test_command_dry_run_and_restore_errors(self):
+        self.make_session('closed', 120, 'Habari')
+        out = StringIO()
+        call_command('archive_chats', '--dry-run', stdout=out)
+        self.assertIn('1 closed sessions', out.getvalue())
+        self.assertEqual(ChatArchive.objects.count(), 0)
+        with self.assertRaises(CommandError):
+            call_command('archive_chats', '--restore', str(uuid.uuid4()), stdout=StringIO())
+
+
+@override_settings(CHAT_THROTTLE_RATES={'send_message': {'session': '2/min', 'ip': '100/min'}})
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        throttle._cache().clear()
+        self.session = ChatSession.objects.create(guest_name='Asha')
+
+    def send(self, text='Habari'):
+        return self.client.post(
+            reverse('chat:send_message'),
+            {'session_id': str(self.session.session_id), 'message': text},
+            content_type='application/json',
+        )
+
+    def test_bucket_rejects_before_any_query(self):
+        self.assertEqual(self.send().status_code, 200)
+        self.assertEqual(self.send().status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.send()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(queries), 0)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(ChatMessage.objects.count(), 2)
+
+        report = throttle.stats()
+        row = next(r for r in report['endpoints'] if r['scope'] == 'send_message')
+        self.assertEqual((row['allowed'], row['throttled']), (2, 1))
+        self.assertEqual(report['recent'][0]['kind'], 'session')
+
+        admin = get_user_model().objects.create_superuser('throttle-admin', password='x')
+        self.client.force_login(admin)
+        self.assertContains(self.client.get(reverse('admin:chat_chatsession_changelist')), 'Chat throttling')
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'django_cache'},
+    })
+    def test_database_cache_alias_is_never_used(self):
+        with CaptureQueriesContext(connection) as queries:
+            throttle.take('send_message', [('session', 'abc')])
+            throttle._count('send_message', 'allowed')
+            throttle.stats()
+        self.assertEqual(len(queries), 0)
+        self.assertIs(throttle._cache(), throttle._local)
+
+    def test_tokens_refill_over_time(self):
+        idents = [('session', 'abc')]
+        self.assertTrue(throttle.take('send_message', idents, now=1000)[0])
+        self.assertTrue(throttle.take('send_message', idents, now=1000)[0])
+        allowed, retry_after, _ = throttle.take('send_message', idents, now=1001)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 29, delta=0.1)
+        self.assertTrue(throttle.take('send_message', idents, now=1030)[0])
+
+    @override_settings(CHAT_THROTTLE_PROXY_COUNT=1)
+    def test_client_ip_is_taken_from_trusted_proxy_entry(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='6.6.6.6, 41.59.1.2', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(throttle.client_ip(request), '41.59.1.2')
+        self.assertEqual(throttle.client_ip(RequestFactory().get('/', REMOTE_ADDR='10.0.0.1')), '10.0.0.1')
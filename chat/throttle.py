@@ -0,0 +1,201 @@
+# chat/throttle.py
+"""
+Kudhibiti kasi ya endpoints za chat zilizo wazi (start_chat, send_message).
+
+    @throttle('send_message')
+    def send_message(request): ...
+
+Each request takes one token from a bucket per identity:
+
+  * ip       - client IP (behind a proxy: CHAT_THROTTLE_PROXY_COUNT)
+  * session  - the chat session_id in the JSON body
+  * user     - the login/browser session cookie (hashed: it is a credential)
+
+A token comes back every period/N, up to N. An empty bucket means a 429
+with Retry-After. The check runs before the view and only talks to the
+cache: no chat or auth query, not even request.user. Concurrent requests
+can both take the "last" token, which is acceptable for flood control.
+
+Buckets live in the cache alias CHAT_THROTTLE_CACHE ('default' unless set).
+It should be Redis/Memcached, shared by all workers. The limiter never runs
+on a DatabaseCache (a token would cost a few queries on every public call):
+such an alias is replaced by a per-process LocMemCache and a warning is
+logged. Per-process buckets and counters mean the real limit becomes
+N x workers and the admin sees one worker's numbers.
+
+    CHAT_THROTTLE_RATES = {
+        'send_message': {'ip': '120/min', 'session': '20/min', 'user': '30/min'},
+    }
+
+Per-day allowed/throttled counters and the latest throttled identities are
+kept in the cache too. They are shown on the Chat sessions page in the admin.
+"""
+import hashlib
+import json
+import logging
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import JsonResponse
+from django.utils import timezone
+
+# Shule nyingi ziko nyuma ya IP moja (NAT), hivyo rate za IP ni kubwa
+DEFAULT_RATES = {
+    'start_chat':   {'ip': '30/min', 'user': '10/min'},
+    'send_message': {'ip': '120/min', 'session': '20/min', 'user': '30/min'},
+}
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+STATS_TIMEOUT = 2 * 24 * 60 * 60
+RECENT_KEY = 'chat:throttle:recent'
+RECENT_LIMIT = 20
+
+logger = logging.getLogger(__name__)
+# Badala ya DatabaseCache: buckets za worker huyu tu, bila query yoyote
+_local = LocMemCache('chat-throttle', {})
+_warned = set()
+
+
+def _cache():
+    alias = getattr(settings, 'CHAT_THROTTLE_CACHE', 'default')
+    cache = caches[alias]
+    if isinstance(cache, DatabaseCache):
+        if alias not in _warned:
+            _warned.add(alias)
+            logger.warning(f"⚠️ CHAT_THROTTLE_CACHE '{alias}' is a DatabaseCache; throttling per process instead")
+        return _local
+    return cache
+
+
+def get_rates(scope):
+    rates = getattr(settings, 'CHAT_THROTTLE_RATES', {})
+    return rates.get(scope, DEFAULT_RATES.get(scope, {}))
+
+
+def parse_rate(rate):
+    """'20/min' -> (20, 60)"""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period.strip()[0].lower()]
+
+
+def client_ip(request):
+    proxies = getattr(settings, 'CHAT_THROTTLE_PROXY_COUNT', 0)
+    if proxies:
+        # Proxy inaongeza IP ya mteja mwishoni; za mwanzo mteja anaweza kuzighushi
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _chat_session_id(request):
+    try:
+        return str(uuid.UUID(str(json.loads(request.body or '{}').get('session_id'))))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def _browser(request):
+    cookie = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return hashlib.sha256(cookie.encode()).hexdigest()[:16] if cookie else None
+
+
+def identities(request):
+    """[(kind, value)] the request is throttled by."""
+    return [
+        ('ip', client_ip(request)),
+        ('session', _chat_session_id(request)),
+        ('user', _browser(request)),
+    ]
+
+
+def take(scope, idents, now=None):
+    """Take a token from every bucket. Returns (allowed, retry_after_seconds, throttled_by)."""
+    now = time.time() if now is None else now
+    rates = get_rates(scope)
+    buckets = {
+        f'chat:throttle:{scope}:{kind}:{value}': (kind, value, *parse_rate(rates[kind]))
+        for kind, value in idents if value and kind in rates
+    }
+    if not buckets:
+        return True, 0, None
+
+    cache = _cache()
+    states = cache.get_many(list(buckets))
+    updated, retry_after, throttled_by = {}, 0, None
+    for key, (kind, value, count, period) in buckets.items():
+        per_second = count / period
+        tokens, stamp = states.get(key, (count, now))
+        tokens = min(count, tokens + (now - stamp) * per_second)
+        if tokens < 1:
+            wait = (1 - tokens) / per_second
+            if wait > retry_after:
+                retry_after, throttled_by = wait, (kind, value)
+        updated[key] = (tokens - 1, now)
+
+    if throttled_by:
+        return False, retry_after, throttled_by
+    # Bucket iliyokaa period nzima imejaa tena, hivyo inaweza kuisha muda wake
+    cache.set_many(updated, timeout=max(period for *_, period in buckets.values()))
+    return True, 0, None
+
+
+def _stats_key(scope, outcome, day=None):
+    return f'chat:throttle:stats:{day or timezone.localdate()}:{scope}:{outcome}'
+
+
+def _count(scope, outcome):
+    key = _stats_key(scope, outcome)
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, STATS_TIMEOUT)
+
+
+def _remember(scope, kind, value):
+    cache = _cache()
+    recent = cache.get(RECENT_KEY, [])
+    recent.insert(0, {'at': timezone.now(), 'scope': scope, 'kind': kind, 'value': value})
+    cache.set(RECENT_KEY, recent[:RECENT_LIMIT], STATS_TIMEOUT)
+
+
+def stats(day=None):
+    """Today's (or day's) counters per throttled endpoint, plus the latest throttled identities."""
+    scopes = sorted(set(DEFAULT_RATES) | set(getattr(settings, 'CHAT_THROTTLE_RATES', {})))
+    keys = {(scope, outcome): _stats_key(scope, outcome, day) for scope in scopes for outcome in ('allowed', 'throttled')}
+    cache = _cache()
+    counts = cache.get_many(list(keys.values()))
+    return {
+        'endpoints': [
+            {
+                'scope': scope,
+                'allowed': counts.get(keys[scope, 'allowed'], 0),
+                'throttled': counts.get(keys[scope, 'throttled'], 0),
+            }
+            for scope in scopes
+        ],
+        'recent': cache.get(RECENT_KEY, []),
+    }
+
+
+def throttle(scope):
+    """Token-bucket throttling for a view; 429 before the view (and the DB) is touched."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            allowed, retry_after, throttled_by = take(scope, identities(request))
+            if not allowed:
+                _count(scope, 'throttled')
+                _remember(scope, *throttled_by)
+                response = JsonResponse({'error': 'Too many requests, please slow down.'}, status=429)
+                response['Retry-After'] = str(max(1, round(retry_after)))
+                return response
+            _count(scope, 'allowed')
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
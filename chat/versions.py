@@ -0,0 +1,64 @@
+# chat/versions.py
+"""
+Version za chat, ili polls zisizo na jipya zijibiwe bila kugusa tables za chat.
+
+Two kinds of version are kept as shared stamps (dashboard/stamps.py):
+
+  * one per session, bumped when its messages or status change;
+  * one for the admin inbox, bumped when any session changes.
+
+The poll endpoints send the version as an ETag. A client that sends it back
+in If-None-Match gets 304 Not Modified after one stamp read (Redis, or one
+primary-key lookup in VersionStamp) and no write. Model signals bump after commit. Bulk .update() calls (read
+receipts) call bump() themselves.
+
+A version is always read BEFORE the database. A write that lands in between
+gets a newer version, so the client simply fetches again.
+
+Stamps are shared by every worker, so a bump on one worker is seen by the
+others on their next poll.
+"""
+from django.db import transaction
+from django.utils.http import parse_etags
+
+from dashboard import stamps
+
+INBOX_KEY = 'chat:inbox:version'
+
+
+def _session_key(session_id):
+    return f'chat:session:{session_id}:version'
+
+
+def bump(session_id=None):
+    """Invalidate the inbox and, with session_id, that session's polls (after commit)."""
+    keys = [INBOX_KEY]
+    if session_id:
+        keys.append(_session_key(session_id))
+    transaction.on_commit(lambda: stamps.bump(keys))
+
+
+def forget(session_ids):
+    """Drop the stamps of sessions that no longer exist (archived)."""
+    stamps.forget([_session_key(session_id) for session_id in session_ids])
+
+
+def _current(key):
+    return stamps.read([key])[key]
+
+
+def session_version(session_id):
+    return _current(_session_key(session_id))
+
+
+def inbox_version():
+    return _current(INBOX_KEY)
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def is_current(request, version):
+    """True when the client's If-None-Match already holds this version."""
+    return version is not None and etag(version) in parse_etags(request.headers.get('If-None-Match', ''))
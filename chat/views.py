@@ -1,10 +1,23 @@
 import json
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import Http404, HttpResponseNotModified, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils import timezone
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.utils.dateparse import parse_datetime
 from .models import ChatSession, ChatMessage
+from asgiref.sync import sync_to_async
+from .notify import get_notifier, publish, session_channel
+from .throttle import throttle
+from .versions import bump, etag, inbox_version, is_current, session_version
+
+# Long-poll: muda wa juu (sekunde) request inasubiri kabla ya kurudisha orodha tupu
+LONG_POLL_TIMEOUT = getattr(settings, 'CHAT_LONG_POLL_TIMEOUT', 25)
+
+# Admin inbox: sessions kwa kila ukurasa
+INBOX_PAGE_SIZE = 50
 
 
 # ─────────────────────────────────────────
@@ -21,11 +34,97 @@ def _message_to_dict(msg):
     }
 
 
+def _after_id(request):
+    try:
+        return int(request.GET.get('after', 0))
+    except (ValueError, TypeError):
+        return 0
+
+
+def _wait_timeout(request):
+    try:
+        return max(0.0, min(float(request.GET.get('timeout', LONG_POLL_TIMEOUT)), LONG_POLL_TIMEOUT))
+    except (ValueError, TypeError):
+        return LONG_POLL_TIMEOUT
+
+
+def _unread_ids(msgs, sender):
+    return [m.id for m in msgs if m.sender == sender and not m.is_read]
+
+
+def _mark_read(msgs, sender):
+    """Read receipts in one UPDATE, and only when some of `msgs` are still unread."""
+    unread = _unread_ids(msgs, sender)
+    if unread:
+        ChatMessage.objects.filter(id__in=unread).update(is_read=True)
+    return bool(unread)
+
+
+def _with_etag(response, version):
+    response['ETag'] = etag(version)
+    return response
+
+
+def _inbox_sessions():
+    """
+    Sessions with last message text/time and unread count annotated, newest
+    activity first: the whole inbox page is one query.
+    """
+    last = ChatMessage.objects.filter(session=OuterRef('pk')).order_by('-timestamp', '-id')
+    return (
+        ChatSession.objects.select_related('user')
+        .annotate(
+            last_text=Subquery(last.values('message')[:1]),
+            last_at=Subquery(last.values('timestamp')[:1]),
+            unread=Count('messages', filter=Q(messages__sender='student', messages__is_read=False)),
+        )
+        .order_by('-updated_at', '-pk')
+    )
+
+
+def _inbox_cursor(session):
+    return f"{session.updated_at.isoformat()}_{session.pk}"
+
+
+def _parse_inbox_cursor(value):
+    """(updated_at, pk) from a cursor, or None when missing/invalid."""
+    stamp, _, pk = (value or '').rpartition('_')
+    try:
+        updated_at = parse_datetime(stamp)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        return None
+    return (updated_at, pk) if updated_at else None
+
+
+async def _wait_for_messages(request, session_id):
+    """
+    (session, new messages) for a long-poll. Returns at once when there is
+    something new or the session is closed, otherwise sleeps until
+    publish(session_id) or the timeout. No thread or DB connection is held
+    while sleeping.
+    """
+    after_id = _after_id(request)
+    # Jiandikishe KABLA ya kusoma DB, ili ujumbe unaofika katikati usipotee
+    with get_notifier().subscribe(session_channel(session_id)) as waiter:
+        session = await ChatSession.objects.select_related('user').filter(session_id=session_id).afirst()
+        if session is None:
+            raise Http404
+        msgs = [m async for m in session.messages.filter(id__gt=after_id)]
+        if not msgs and session.status == 'open' and await waiter.wait(_wait_timeout(request)):
+            session = await ChatSession.objects.select_related('user').filter(pk=session.pk).afirst()
+            if session is None:
+                raise Http404
+            msgs = [m async for m in session.messages.filter(id__gt=after_id)]
+    return session, msgs
+
+
 # ─────────────────────────────────────────
 #  STUDENT / GUEST ENDPOINTS
 # ─────────────────────────────────────────
 
 @csrf_exempt
+@throttle('start_chat')
 def start_chat(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'POST required'}, status=405)
@@ -67,6 +166,7 @@ def start_chat(request):
 
 
 @csrf_exempt
+@throttle('send_message')
 def send_message(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'POST required'}, status=405)
@@ -83,19 +183,33 @@ def send_message(request):
 
     session.is_read_by_admin = False
     session.save(update_fields=['updated_at', 'is_read_by_admin'])
+    publish(session.session_id)
 
     return JsonResponse({'ok': True, 'message': _message_to_dict(msg)})
 
 
 def poll_messages(request, session_id):
+    # Hakuna jipya tangu version ya mteja: jibu kutoka cache, bila DB
+    version = session_version(session_id)
+    if is_current(request, version):
+        return HttpResponseNotModified()
+
     session  = get_object_or_404(ChatSession, session_id=session_id)
-    try:
-        after_id = int(request.GET.get('after', 0))
-    except (ValueError, TypeError):
-        after_id = 0
+    msgs = list(session.messages.filter(id__gt=_after_id(request)))
+    _mark_read(msgs, 'admin')
+
+    return _with_etag(JsonResponse({
+        'messages':       [_message_to_dict(m) for m in msgs],
+        'session_status': session.status,
+    }), version)
 
-    msgs = session.messages.filter(id__gt=after_id)
-    msgs.filter(sender='admin').update(is_read=True)
+
+async def wait_messages(request, session_id):
+    """Long-poll version of poll_messages (same response); poll_messages stays as the fallback."""
+    session, msgs = await _wait_for_messages(request, session_id)
+    unread = _unread_ids(msgs, 'admin')
+    if unread:
+        await ChatMessage.objects.filter(id__in=unread).aupdate(is_read=True)
 
     return JsonResponse({
         'messages':       [_message_to_dict(m) for m in msgs],
@@ -125,8 +239,7 @@ def delete_session(request):
             if str(session.session_id) != sid:
                 return JsonResponse({'error': 'Forbidden'}, status=403)
 
-        session.messages.all().delete()
-        session.delete()
+        session.delete()   # ujumbe unafutwa pamoja (cascade, DELETE moja)
         # Clear from browser session too
         if 'chat_session_id' in request.session:
             del request.session['chat_session_id']
@@ -146,33 +259,96 @@ def admin_chat_panel(request):
 
 @staff_member_required
 def admin_get_sessions(request):
-    sessions = ChatSession.objects.all().order_by('-updated_at')
+    """
+    Admin inbox, one query per call.
+
+    ?cursor=<next_cursor>  next (older) page
+    ?since=<latest>        only sessions changed since the client's last poll
+
+    Without a cursor the inbox version is the ETag: an unchanged inbox is a
+    304 from the cache alone.
+    """
+    version = None
+    if not request.GET.get('cursor'):
+        version = inbox_version()
+        if is_current(request, version):
+            return HttpResponseNotModified()
+
+    sessions = _inbox_sessions()
+
+    since = request.GET.get('since')
+    if since:
+        try:
+            since = parse_datetime(since)
+        except ValueError:
+            since = None
+        if since:
+            # gte: session iliyobadilika microsecond hiyo hiyo isipotee
+            sessions = sessions.filter(updated_at__gte=since)
+
+    cursor = _parse_inbox_cursor(request.GET.get('cursor'))
+    if cursor:
+        updated_at, pk = cursor
+        sessions = sessions.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, pk__lt=pk))
+
+    page = list(sessions[:INBOX_PAGE_SIZE + 1])
+    has_more = len(page) > INBOX_PAGE_SIZE
+    page = page[:INBOX_PAGE_SIZE]
+
     data = []
-    for s in sessions:
-        last_msg = s.messages.last()
+    for s in page:
         data.append({
             'id':           str(s.session_id),
             'name':         s.display_name,
-            'last_message': last_msg.message[:60] if last_msg else '',
-            'last_time':    last_msg.timestamp.strftime('%H:%M') if last_msg else '',
-            'unread':       s.unread_for_admin,
+            'last_message': s.last_text[:60] if s.last_text else '',
+            'last_time':    s.last_at.strftime('%H:%M') if s.last_at else '',
+            'unread':       s.unread,
             'status':       s.status,
+            'updated_at':   s.updated_at.isoformat(),
         })
-    return JsonResponse({'sessions': data})
+    latest = page[0].updated_at.isoformat() if page and not cursor else request.GET.get('since', '')
+    response = JsonResponse({
+        'sessions':    data,
+        'next_cursor': _inbox_cursor(page[-1]) if has_more else None,
+        'latest':      latest,
+    })
+    return _with_etag(response, version) if version is not None else response
 
 
 @staff_member_required
 def admin_get_messages(request, session_id):
-    session  = get_object_or_404(ChatSession, session_id=session_id)
-    try:
-        after_id = int(request.GET.get('after', 0))
-    except (ValueError, TypeError):
-        after_id = 0
+    version = session_version(session_id)
+    if is_current(request, version):
+        return HttpResponseNotModified()
+
+    session  = get_object_or_404(ChatSession.objects.select_related('user'), session_id=session_id)
+    msgs = list(session.messages.filter(id__gt=_after_id(request)))
+    changed = _mark_read(msgs, 'student')
+    if not session.is_read_by_admin:
+        ChatSession.objects.filter(pk=session.pk).update(is_read_by_admin=True)
+        changed = True
+    if changed:
+        # Unread counts za inbox zimebadilika; polls za session hii hazijaathirika
+        bump()
+
+    return _with_etag(JsonResponse({
+        'messages': [_message_to_dict(m) for m in msgs],
+        'name':     session.display_name,
+        'status':   session.status,
+    }), version)
 
-    msgs = session.messages.filter(id__gt=after_id)
-    msgs.filter(sender='student').update(is_read=True)
-    session.is_read_by_admin = True
-    session.save(update_fields=['is_read_by_admin'])
+
+@staff_member_required
+async def admin_wait_messages(request, session_id):
+    """Long-poll version of admin_get_messages (same response)."""
+    session, msgs = await _wait_for_messages(request, session_id)
+    unread = _unread_ids(msgs, 'student')
+    if unread:
+        await ChatMessage.objects.filter(id__in=unread).aupdate(is_read=True)
+    if not session.is_read_by_admin:
+        await ChatSession.objects.filter(pk=session.pk).aupdate(is_read_by_admin=True)
+    if unread or not session.is_read_by_admin:
+        await sync_to_async(bump)()
 
     return JsonResponse({
         'messages': [_message_to_dict(m) for m in msgs],
@@ -197,6 +373,7 @@ def admin_send_message(request):
     session = get_object_or_404(ChatSession, session_id=session_id)
     msg = ChatMessage.objects.create(session=session, sender='admin', message=text)
     session.save(update_fields=['updated_at'])
+    publish(session.session_id)
 
     return JsonResponse({'ok': True, 'message': _message_to_dict(msg)})
 
@@ -209,7 +386,8 @@ def admin_close_session(request):
     data    = json.loads(request.body or '{}')
     session = get_object_or_404(ChatSession, session_id=data.get('session_id'))
     session.status = 'closed'
-    session.save(update_fields=['status'])
+    session.save(update_fields=['status', 'updated_at'])
+    publish(session.session_id)
     return JsonResponse({'ok': True})
 
 
@@ -222,6 +400,5 @@ def admin_delete_session(request):
     data    = json.loads(request.body or '{}')
     session = ChatSession.objects.filter(session_id=data.get('session_id')).first()
     if session:
-        session.messages.all().delete()
         session.delete()
     return JsonResponse({'ok': True})
\ No newline at end of file
@@ -1,15 +1,48 @@
+from django.contrib import admin, messages
+from django.urls import reverse
+from django.utils.html import format_html
 
-from django.contrib import admin
+from dashboard.jobs import enqueue
 
 # Register your models here.
 from .models import ClassRoom, Subject
 
 
+def _start_document_batch(modeladmin, request, queryset, kind):
+    """Queue a class_documents job; the worker renders it and staff download it from the job page."""
+    pks = sorted(queryset.values_list('pk', flat=True))
+    job, created = enqueue(
+        'class_documents',
+        {'kind': kind, 'classrooms': pks, 'format': 'zip'},
+        user=request.user,
+        unique_key=f"class_documents:{kind}:{','.join(map(str, pks))}",
+    )
+    url = reverse('admin:dashboard_backgroundjob_change', args=[job.pk])
+    action = 'Queued' if created else 'Already queued:'
+    modeladmin.message_user(
+        request,
+        format_html(
+            '{} {} for {} class(es). <a href="{}">Download from the job page</a> when it is done.',
+            action, kind.replace('_', ' '), len(pks), url,
+        ),
+        messages.INFO,
+    )
+
+
 @admin.register(ClassRoom)
 class ClassRoomAdmin(admin.ModelAdmin):
     list_display = ('name', 'code', 'fee')
     search_fields = ('name', 'code')
     list_filter = ('fee',)
+    actions = ['generate_report_cards', 'generate_id_cards']
+
+    @admin.action(description='Generate report cards (ZIP)')
+    def generate_report_cards(self, request, queryset):
+        _start_document_batch(self, request, queryset, 'report_cards')
+
+    @admin.action(description='Generate ID cards (ZIP)')
+    def generate_id_cards(self, request, queryset):
+        _start_document_batch(self, request, queryset, 'id_cards')
 
 
 @admin.register(Subject)
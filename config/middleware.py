@@ -0,0 +1,80 @@
+# config/middleware.py
+"""
+Middleware za kuendesha site chini ya ASGI bila kupoteza streaming.
+
+WhiteNoiseMiddleware:
+whitenoise.middleware.WhiteNoiseMiddleware is sync-only. Under ASGI Django
+then runs every request below it in a thread and holds that thread while an
+async view (the chat long-poll) waits. This subclass is async-capable: a
+static file is still served by WhiteNoise in a short-lived thread, anything
+else is passed straight to the async handler.
+
+AsyncStreamingMiddleware:
+Under ASGI Django reads a StreamingHttpResponse with a sync iterator into a
+list before sending the first byte. The CSV/XLSX fee exports, Uploadcare
+downloads and FileResponses would then sit whole in worker memory. This
+middleware hands such responses an async iterator that pulls one chunk at a
+time in the request's sync thread (where their DB cursor lives). Under WSGI
+it does nothing.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+_END = object()
+
+
+async def _one_at_a_time(iterator):
+    pull = sync_to_async(next)
+    while True:
+        chunk = await pull(iterator, _END)
+        if chunk is _END:
+            break
+        yield chunk
+
+
+class AsyncStreamingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if response.streaming and not response.is_async:
+            # Closers za iterator ya awali (file, upstream) zinabaki kwenye response
+            response.streaming_content = _one_at_a_time(iter(response.streaming_content))
+        return response
@@ -83,12 +83,14 @@ JAMIITEK_API_KEY = "aUCcifkWO6gs_g4JwLVV7KjtC2Y3ppILL4YqTB3MFyongLcIEEEH5AImNYHG
 JAMIITEK_API_URL = "https://jamiitek.com/api/site-status/"
 
 MIDDLEWARE = [
+    'config.middleware.AsyncStreamingMiddleware',  # ya kwanza: inaona kila streaming response
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'config.middleware.WhiteNoiseMiddleware',  # whitenoise, async-capable kwa ASGI
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'jamiitek_middleware.JamiiTekStatusMiddleware',  # This one here
@@ -110,6 +112,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'config.context_processors.uploadcare_key',   # ← ONGEZA HAPA
+                'dashboard.context_processors.school_settings',
                 'students.context_processors.student_context',  # ← ongeza hii
 
 
@@ -149,6 +152,25 @@ DATABASES = {
 
 
 
+# Redis ikiwepo (REDIS_URL) ni cache moja kwa workers wote; bila hiyo kila process ina LocMem yake.
+# Si DatabaseCache: kila get/set ingekuwa query kwenye database ya Supabase iliyo mbali.
+# Versions za SchoolSettings, chat polls na parent snapshots ziko kwenye dashboard.stamps
+# (Redis, au table ndogo ya VersionStamp), hivyo zinaonekana kwa workers wote kwa vyovyote vile.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 ##NyumbaChap@123
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -196,8 +218,20 @@ EMAIL_HOST_PASSWORD = 'fxxh twid rtgt sdkv'  # App password (not your regular pa
 DEFAULT_FROM_EMAIL = 'info.charlesacademy@gmail.com'
 
 
+# Chat: throttling ya start_chat/send_message (chat/throttle.py). Router ya hosting
+# inaongeza IP ya mteja mwishoni mwa X-Forwarded-For; bila header, REMOTE_ADDR inatumika
+CHAT_THROTTLE_PROXY_COUNT = 1
+# Buckets na counters ziwe kwenye Redis/Memcached ya pamoja ili limit iwe moja kwa workers wote.
+# Alias ya DatabaseCache haitumiki: throttle inatumia LocMem ya kila process badala yake
+CHAT_THROTTLE_CACHE = 'default'
+# Procfile ina uvicorn workers kadhaa: LISTEN/NOTIFY inaamsha long-polls kwa workers wote.
+# Session pooler ya Supabase (port 5432) inaruhusu LISTEN; transaction pooler (6543) hairuhusu
+CHAT_NOTIFIER = 'postgres'
+
+
 # Authentication backends
 AUTHENTICATION_BACKENDS = [
+    # Inarithi ModelBackend (permissions), na inashughulikia username zote;
+    # ModelBackend ya pili ingefanya lookup na hash check nyingine kila login iliyoshindwa
     'accounts.backends.SlashFriendlyModelBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
\ No newline at end of file
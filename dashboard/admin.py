@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import Announcement
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from . import jobs
+from .models import Announcement, BackgroundJob, OutboxEmail
 
 
 @admin.register(Announcement)
@@ -8,3 +15,64 @@ class AnnouncementAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
     search_fields = ('title', 'message')
     ordering = ('-created_at',)
+
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'last_error')
+    # context ina passwords; haionyeshwi
+    fields = ('to', 'subject', 'template', 'status', 'attempts', 'next_attempt_at', 'last_error', 'created_at', 'sent_at')
+    readonly_fields = fields
+    actions = ['retry_now']
+
+    @admin.action(description="Retry selected emails now")
+    def retry_now(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.exclude(status='SENT').update(status='PENDING', next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} email(s) queued again.")
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'requested_by', 'status', 'progress', 'attempts', 'created_at', 'finished_at',
+                    'download')
+    list_filter = ('kind', 'status', 'created_at')
+    fields = ('kind', 'params', 'status', 'progress', 'requested_by', 'attempts', 'next_attempt_at', 'message',
+              'download', 'created_at', 'finished_at')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Progress')
+    def progress(self, obj):
+        return f"{obj.progress_done}/{obj.progress_total}" if obj.progress_total else '-'
+
+    @admin.display(description='File')
+    def download(self, obj):
+        if obj.status != 'DONE' or not obj.result_name:
+            return '-'
+        url = reverse('admin:dashboard_backgroundjob_download', args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, obj.result_name)
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view),
+                 name='dashboard_backgroundjob_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        """The job's file, for staff who may view jobs; never served from MEDIA."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        job = get_object_or_404(BackgroundJob, pk=pk, status='DONE')
+        if not job.result_path:
+            raise Http404("This job produced no file")
+        try:
+            fh = jobs.result_storage().open(job.result_path, 'rb')
+        except FileNotFoundError:
+            raise Http404("The job's file is no longer stored")
+        return FileResponse(fh, as_attachment=True, filename=job.result_name)
@@ -0,0 +1,6 @@
+from .school_settings import get_school_settings
+
+
+def school_settings(request):
+    """Weka school_settings kwenye templates zote (kutoka cache, bila query)."""
+    return {'school_settings': get_school_settings()}
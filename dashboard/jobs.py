@@ -0,0 +1,163 @@
+# dashboard/jobs.py
+"""
+Kazi za nyuma (background jobs): admin anaomba, worker anafanya.
+
+    job, created = enqueue('class_documents', {'kind': 'id_cards', 'classrooms': [3]},
+                           user=request.user, unique_key='class_documents:id_cards:3')
+
+enqueue() only inserts a BackgroundJob. `manage.py run_jobs --loop` (the
+`jobs` process in the Procfile) claims due rows one at a time and calls the
+handler named for the job's kind in HANDLERS:
+
+  * a job is claimed (status RUNNING, next_attempt_at pushed ahead by
+    LEASE_SECONDS) in a short transaction with skip_locked, so two workers
+    never run the same job; a job whose worker died is claimed again once
+    its lease runs out;
+  * a handler takes the job and returns a short summary. It may hand back
+    a file with save_result(): the file goes to the job result storage and
+    the row keeps only its path. progress_callback(job) gives it a
+    progress(done, total) that writes to the row every few seconds;
+  * a failed job is retried with backoff and marked FAILED after
+    MAX_ATTEMPTS.
+
+With unique_key, a second enqueue() while the first job is still PENDING or
+RUNNING returns that job instead of adding another (two clicks, one run).
+
+Settings (optional):
+
+    JOB_RESULTS_STORAGE = {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': BASE_DIR / 'job_results'},
+    }
+
+The web and jobs processes must both reach it: use object storage when they
+do not share a disk.
+"""
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {
+    'class_documents': 'students.batch.run_job',
+    'provision_student_users': 'students.provisioning.run_job',
+}
+MAX_ATTEMPTS = 3
+LEASE_SECONDS = 60 * 60      # kazi ndefu zaidi ya hapa inaweza kuchukuliwa tena
+RETRY_SECONDS = 5 * 60
+PROGRESS_SECONDS = 2         # progress haiandikwi kwenye row mara nyingi kuliko hapa
+
+
+def enqueue(kind, params=None, user=None, unique_key=''):
+    """Add a job (in the caller's transaction). Returns (job, created)."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    while True:
+        try:
+            with transaction.atomic():
+                job = BackgroundJob.objects.create(
+                    kind=kind,
+                    params=params or {},
+                    requested_by=user if user and user.is_authenticated else None,
+                    unique_key=unique_key,
+                )
+            return job, True
+        except IntegrityError:
+            if not unique_key:
+                raise
+        job = BackgroundJob.objects.filter(unique_key=unique_key, status__in=['PENDING', 'RUNNING']).first()
+        if job:
+            return job, False
+        # Job iliyozuia imeisha kati ya insert na select: jaribu kuongeza tena
+
+
+def result_storage():
+    """The storage job files are saved in (JOB_RESULTS_STORAGE); never MEDIA, which is public."""
+    config = getattr(settings, 'JOB_RESULTS_STORAGE', {})
+    backend = import_string(config.get('BACKEND', 'django.core.files.storage.FileSystemStorage'))
+    return backend(**config.get('OPTIONS', {'location': os.path.join(settings.BASE_DIR, 'job_results')}))
+
+
+def save_result(job, path, name):
+    """Move a finished local file into the result storage; the job keeps its path and download name."""
+    with open(path, 'rb') as fh:
+        job.result_path = result_storage().save(f'job-{job.pk}/{name}', File(fh))
+    os.remove(path)
+    job.result_name = name
+
+
+def progress_callback(job, every=PROGRESS_SECONDS):
+    """progress(done, total, *extra) for a handler: saves done/total on the job row, at most every `every` seconds."""
+    last = [None]
+
+    def progress(done, total, *extra):
+        now = time.monotonic()
+        if done < total and last[0] is not None and now - last[0] < every:
+            return
+        last[0] = now
+        job.progress_done, job.progress_total = done, total
+        BackgroundJob.objects.filter(pk=job.pk).update(progress_done=done, progress_total=total)
+
+    return progress
+
+
+def claim():
+    """The next due job, marked RUNNING and leased to this worker; None when there is none."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            BackgroundJob.objects.select_for_update(skip_locked=True)
+            .filter(status__in=['PENDING', 'RUNNING'], next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')
+            .first()
+        )
+        if job:
+            job.status = 'RUNNING'
+            job.attempts += 1
+            job.next_attempt_at = now + timedelta(seconds=LEASE_SECONDS)
+            job.save(update_fields=['status', 'attempts', 'next_attempt_at'])
+    return job
+
+
+def run(job):
+    """Run one claimed job and record the outcome."""
+    try:
+        job.message = import_string(HANDLERS[job.kind])(job) or ''
+        job.status = 'DONE'
+        job.finished_at = timezone.now()
+    except Exception as e:
+        logger.exception(f"✗ Job {job} failed")
+        job.message = f"{type(e).__name__}: {e}"
+        if job.attempts >= MAX_ATTEMPTS or job.kind not in HANDLERS:
+            job.status = 'FAILED'
+            job.finished_at = timezone.now()
+        else:
+            job.status = 'PENDING'
+            job.next_attempt_at = timezone.now() + timedelta(seconds=RETRY_SECONDS * job.attempts)
+    job.save(update_fields=['status', 'message', 'result_path', 'result_name', 'progress_done', 'progress_total',
+                            'next_attempt_at', 'finished_at'])
+    return job
+
+
+def run_pending(limit=None, progress=None):
+    """Run due jobs until there are none (or `limit` ran). Returns how many ran."""
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim()
+        if job is None:
+            break
+        run(job)
+        ran += 1
+        if progress:
+            progress(job)
+    return ran
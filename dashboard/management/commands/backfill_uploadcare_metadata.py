@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from dashboard.uploadcare import fetch_file_info, file_uuid
+
+MODELS = ('exams.Assignment', 'exams.Submission', 'students.Certificate')
+META_FIELDS = ['file_uuid', 'file_name', 'file_size', 'file_mime_type', 'file_cdn_url']
+
+
+class Command(BaseCommand):
+    help = 'Copy Uploadcare file metadata (name, size, mime type, CDN URL) into local columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Rows fetched and updated per batch (default 100)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Parallel Uploadcare API requests (default 8)'
+        )
+        parser.add_argument(
+            '--model',
+            choices=MODELS,
+            action='append',
+            help='Only this model (repeatable); default all'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Refetch rows that already have metadata'
+        )
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            for label in options['model'] or MODELS:
+                self.backfill(apps.get_model(label), pool, options)
+
+    def backfill(self, model, pool, options):
+        rows = model.objects.exclude(Q(file__isnull=True) | Q(file=''))
+        if not options['force']:
+            rows = rows.filter(file_name='')
+        total = rows.count()
+        self.stdout.write(f"\n🔍 {model.__name__}: {total} rows to backfill...")
+
+        done = failed = 0
+        last_pk = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk).order_by('pk')[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            uuids = [file_uuid(obj.file) for obj in batch]
+            infos = pool.map(lambda uuid: fetch_file_info(uuid) if uuid else None, uuids)
+            for obj, info in zip(batch, infos):
+                obj.set_file_meta(info)
+                failed += info is None
+            model.objects.bulk_update(batch, META_FIELDS)
+            done += len(batch)
+            self.stdout.write(f"  {done}/{total}")
+
+        if failed:
+            self.stdout.write(self.style.WARNING(f"  ⚠️ {failed} files could not be fetched; run again later"))
+        self.stdout.write(self.style.SUCCESS(f"✅ {model.__name__}: {done - failed} rows updated"))
@@ -0,0 +1,103 @@
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from dashboard import uploadcare
+
+UUID = '0b0b0b0b-1111-2222-3333-444444444444'
+
+
+def _stub_handler(body, latency, kbps):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _headers(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+
+        def do_HEAD(self):
+            self._headers()
+
+        def do_GET(self):
+            self._headers()
+            step = 16 * 1024
+            for i in range(0, len(body), step):
+                self.wfile.write(body[i:i + step])
+                if kbps:
+                    time.sleep(step / (kbps * 1024))
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = 'Compare Uploadcare download modes: view latency and how long a worker stays busy per download'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Downloads per mode (default 20)')
+        parser.add_argument('--size-kb', type=int, default=512, help='File size in KB (default 512)')
+        parser.add_argument('--latency-ms', type=int, default=80, help='Simulated CDN latency (default 80ms)')
+        parser.add_argument('--cdn-kbps', type=int, default=20000, help='Simulated CDN bandwidth, 0 = unlimited')
+        parser.add_argument(
+            '--client-kbps', type=int, default=2000,
+            help='Simulated client bandwidth: the worker waits on slow clients while it streams (default 2000)'
+        )
+        parser.add_argument('--modes', nargs='+', default=list(uploadcare.MODES), choices=uploadcare.MODES)
+
+    def handle(self, *args, **options):
+        body = b'x' * (options['size_kb'] * 1024)
+        server = ThreadingHTTPServer(
+            ('127.0.0.1', 0),
+            _stub_handler(body, options['latency_ms'] / 1000, options['cdn_kbps']),
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}'
+        factory = RequestFactory()
+
+        self.stdout.write(
+            f"\n📥 {options['requests']} downloads per mode, {options['size_kb']}KB file, "
+            f"CDN {options['latency_ms']}ms, client {options['client_kbps'] or '∞'} KB/s\n"
+        )
+        self.stdout.write(f"  {'mode':<10}{'first ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'bytes/worker':>14}")
+
+        try:
+            for mode in options['modes']:
+                with tempfile.TemporaryDirectory() as cache_dir, override_settings(UPLOADCARE_GATEWAY={
+                    'MODE': mode, 'CDN_BASE': base, 'API_BASE': base, 'CACHE_DIR': cache_dir,
+                }):
+                    uploadcare.reset_session()
+                    caches['default'].delete(uploadcare._meta_key(UUID))
+                    timings, sent = [], 0
+                    for _ in range(options['requests']):
+                        start = time.perf_counter()
+                        response = uploadcare.serve_file(factory.get('/'), UUID, 'Handout.pdf')
+                        # Worker inabaki na request mpaka byte ya mwisho imemfikia client
+                        chunks = response.streaming_content if response.streaming else [response.content]
+                        for chunk in chunks:
+                            sent += len(chunk)
+                            if options['client_kbps']:
+                                time.sleep(len(chunk) / (options['client_kbps'] * 1024))
+                        timings.append((time.perf_counter() - start) * 1000)
+                p95 = sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)]
+                self.stdout.write(
+                    f"  {mode:<10}{timings[0]:>10.1f}{statistics.median(timings):>10.1f}"
+                    f"{p95:>10.1f}{sent // len(timings):>14}"
+                )
+        finally:
+            uploadcare.reset_session()
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(self.style.SUCCESS(
+            "\n✅ Times are how long one worker is occupied per download. "
+            "redirect/accel/sendfile hand the bytes to the CDN or front proxy."
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (class document batches, bulk account creation)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll for new jobs (worker mode)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds between polls with --loop (default 5)'
+        )
+
+    def handle(self, *args, **options):
+        def progress(job):
+            style = self.style.SUCCESS if job.status == 'DONE' else self.style.WARNING
+            self.stdout.write(style(f"  ⚙️ {job}: {job.message}"))
+
+        if not options['loop']:
+            ran = jobs.run_pending(progress=progress)
+            self.stdout.write(self.style.SUCCESS(f"✅ {ran} job(s) run"))
+            return
+
+        self.stdout.write(f"\n⚙️ Job worker running (every {options['interval']}s)...")
+        try:
+            while True:
+                jobs.run_pending(progress=progress)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("\n✅ Job worker stopped"))
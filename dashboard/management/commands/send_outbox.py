@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard import outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails in batches over one SMTP connection, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=outbox.BATCH_SIZE,
+            help=f'Emails per batch / SMTP connection (default {outbox.BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll for new emails (worker mode)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds between polls with --loop (default 5)'
+        )
+
+    def handle(self, *args, **options):
+        def progress(sent, failed):
+            self.stdout.write(f"  📧 {sent} sent, {failed} failed")
+
+        if not options['loop']:
+            sent, failed = outbox.send_pending(max(options['batch_size'], 1), progress=progress)
+            self.stdout.write(self.style.SUCCESS(f"✅ Outbox drained: {sent} sent, {failed} failed"))
+            return
+
+        self.stdout.write(f"\n📬 Outbox worker running (every {options['interval']}s)...")
+        try:
+            while True:
+                outbox.send_pending(max(options['batch_size'], 1), progress=progress)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("\n✅ Outbox worker stopped"))
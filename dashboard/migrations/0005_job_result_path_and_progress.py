@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_version_stamp'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='backgroundjob',
+            name='result',
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='progress_done',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='progress_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='result_path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
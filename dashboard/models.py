@@ -1,5 +1,9 @@
+from urllib.parse import quote
+
+from django.conf import settings
 from django.db import models
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
 
 class Announcement(models.Model):
     title = models.CharField(max_length=200)
@@ -60,4 +64,161 @@ class SchoolSettings(models.Model):
             existing.theme_color = self.theme_color
             existing.save()
             return existing
-        return super().save(*args, **kwargs)
\ No newline at end of file
+        return super().save(*args, **kwargs)
+
+class UploadcareFileMeta(models.Model):
+    """
+    Nakala ya metadata ya Uploadcare `file` kwenye columns za kawaida.
+
+    Reading file.filename/size on a pyuploadcare File is a REST call, so list
+    pages used to do one per row. The info is fetched once when the file
+    changes on save (and by the backfill_uploadcare_metadata command for old
+    rows); templates and admin columns read these columns only.
+    """
+    file_uuid      = models.CharField(max_length=36, blank=True, editable=False)
+    file_name      = models.CharField(max_length=255, blank=True, editable=False)
+    file_size      = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    file_mime_type = models.CharField(max_length=100, blank=True, editable=False)
+    file_cdn_url   = models.URLField(max_length=500, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def set_file_meta(self, info=None):
+        """Copy metadata from `info` (fetch_file_info() result) or clear it when there is no file."""
+        from dashboard.uploadcare import cdn_url_for, file_uuid
+        uuid = file_uuid(self.file)
+        self.file_uuid = uuid or ''
+        self.file_cdn_url = cdn_url_for(self.file) if uuid else ''
+        info = info or {}
+        self.file_name = (info.get('filename') or '')[:255]
+        self.file_size = info.get('size')
+        self.file_mime_type = (info.get('mime_type') or '')[:100]
+
+    def save(self, *args, **kwargs):
+        from dashboard.uploadcare import fetch_file_info, file_uuid
+        uuid = file_uuid(self.file) or ''
+        if uuid != self.file_uuid:
+            # Mara moja tu, faili likibadilika; likishindikana backfill italijaza baadaye
+            self.set_file_meta(fetch_file_info(uuid) if uuid else None)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    'file_uuid', 'file_name', 'file_size', 'file_mime_type', 'file_cdn_url'
+                }
+        super().save(*args, **kwargs)
+
+    def get_file_url(self):
+        """CDN URL with the original filename appended, without a network call; None when there is no file."""
+        if not self.file_uuid:
+            # Row ya zamani ambayo backfill bado haijaijaza: URL inajengwa bila REST call
+            from dashboard.uploadcare import cdn_url_for
+            return cdn_url_for(self.file) or None
+        url = self.file_cdn_url
+        # Ongeza filename mwishoni ili browser ijue ni file gani
+        if self.file_name:
+            url = url.rstrip('/') + '/' + quote(self.file_name)
+        return url
+
+
+class VersionStamp(models.Model):
+    """
+    Version ya kitu kilichohifadhiwa kwenye cache ya process (SchoolSettings,
+    chat polls, parent dashboards). Used by dashboard/stamps.py when no shared
+    cache (Redis) is configured: one row per key, read by primary key.
+    """
+    key = models.CharField(max_length=200, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.key} = {self.version}"
+
+
+class OutboxEmail(models.Model):
+    """
+    Barua pepe inayosubiri kutumwa.
+
+    Rows are written in the same transaction as the change that triggers them
+    (a new student, a password reset) and sent later by the send_outbox
+    command, so requests never wait on SMTP. See dashboard/outbox.py.
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    )
+
+    to = models.JSONField(default=list)
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=254, blank=True)
+    template = models.CharField(max_length=200, blank=True, help_text="HTML template rendered with `context`")
+    context = models.JSONField(default=dict, blank=True)
+    body = models.TextField(blank=True, help_text="Plain text; defaults to the rendered template without tags")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+        verbose_name = 'Outbox Email'
+        verbose_name_plural = 'Outbox Emails'
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)} ({self.status})"
+
+
+class BackgroundJob(models.Model):
+    """
+    Kazi ndefu inayoombwa kutoka admin na kufanywa na worker.
+
+    Admin actions create a row and return at once; `manage.py run_jobs`
+    claims it and calls the handler registered for `kind` in
+    dashboard/jobs.py. A file the job produces (a ZIP of report cards) is
+    saved in the job result storage (JOB_RESULTS_STORAGE, never MEDIA) and
+    the row keeps only its path; a staff-only admin view serves it.
+    progress_done/progress_total are written by the handler while it runs.
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    unique_key = models.CharField(
+        max_length=100, blank=True,
+        help_text="Only one PENDING/RUNNING job may hold a given key"
+    )
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    message = models.TextField(blank=True)
+    result_path = models.CharField(max_length=255, blank=True, editable=False)
+    result_name = models.CharField(max_length=255, blank=True)
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['unique_key'],
+                condition=models.Q(status__in=['PENDING', 'RUNNING']) & ~models.Q(unique_key=''),
+                name='dashboard_job_one_active_per_key',
+            ),
+        ]
+        verbose_name = 'Background Job'
+        verbose_name_plural = 'Background Jobs'
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -0,0 +1,166 @@
+# dashboard/outbox.py
+"""
+Barua pepe kupitia outbox: request inaandika row, worker anatuma.
+
+    queue_email([teacher.email], subject, template='teachers/emails/credentials_email.html',
+                context={'first_name': teacher.first_name, ...})
+
+queue_email() only inserts an OutboxEmail, inside whatever transaction the
+caller is in, so the email exists exactly when the student/teacher/parent it
+is about exists. `manage.py send_outbox` drains due rows in batches:
+
+  * a batch is claimed (next_attempt_at pushed ahead) in a short
+    transaction, so two workers never send the same row;
+  * every message in a batch goes over one SMTP connection;
+  * each template is loaded and compiled once per batch;
+  * a failed message is retried with exponential backoff and marked FAILED
+    after MAX_ATTEMPTS (or at once when its template does not exist).
+
+Context values must be JSON-serializable. Credentials are in the context, so
+context and body are cleared once a message is sent.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 60            # sekunde; 1, 2, 4, 8, 16 dakika
+BACKOFF_MAX = 60 * 60
+CLAIM_SECONDS = 10 * 60      # row iliyochukuliwa na worker aliyekufa inarudi baada ya hapa
+
+
+def queue_email(to, subject, template='', context=None, body='', from_email=None):
+    """Add an email to the outbox (in the caller's transaction) and return the row."""
+    if isinstance(to, str):
+        to = [to]
+    return OutboxEmail.objects.create(
+        to=list(to),
+        subject=subject[:255],
+        from_email=from_email or '',
+        template=template,
+        context=context or {},
+        body=body,
+    )
+
+
+def backoff(attempts):
+    return min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """Due PENDING rows, leased to this worker for CLAIM_SECONDS."""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        if rows:
+            OutboxEmail.objects.filter(pk__in=[r.pk for r in rows]).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS)
+            )
+    return rows
+
+
+def _build(row, templates):
+    if row.template not in templates:
+        templates[row.template] = get_template(row.template) if row.template else None
+    template = templates[row.template]
+    html = template.render(row.context) if template else None
+    body = row.body or (strip_tags(html).strip() if html else '')
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=body,
+        from_email=row.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=row.to,
+    )
+    if html:
+        message.attach_alternative(html, 'text/html')
+    return message
+
+
+def _failed(row, error, permanent=False):
+    row.attempts += 1
+    row.last_error = str(error)[:2000]
+    if permanent or row.attempts >= MAX_ATTEMPTS:
+        row.status = 'FAILED'
+    else:
+        row.next_attempt_at = timezone.now() + timedelta(seconds=backoff(row.attempts))
+    row.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def send_batch(rows, connection=None):
+    """Send claimed rows over one connection. Returns (sent, failed)."""
+    connection = connection or get_connection()
+    templates = {}
+    handled = set()
+    sent = failed = 0
+    try:
+        connection.open()
+        for row in rows:
+            handled.add(row.pk)
+            try:
+                message = _build(row, templates)
+            except TemplateDoesNotExist as e:
+                _failed(row, f"Template not found: {e}", permanent=True)
+                failed += 1
+                continue
+            except Exception as e:
+                _failed(row, e)
+                failed += 1
+                continue
+            try:
+                message.connection = connection
+                message.send()
+            except Exception as e:
+                logger.warning(f"✗ Outbox email {row.pk} to {row.to} failed: {e}")
+                _failed(row, e)
+                failed += 1
+                # Connection inaweza kuwa imekufa; fungua upya kwa inayofuata
+                connection.close()
+                connection.open()
+                continue
+            OutboxEmail.objects.filter(pk=row.pk).update(
+                status='SENT', sent_at=timezone.now(), attempts=row.attempts + 1,
+                last_error='', context={}, body='',
+            )
+            sent += 1
+    except Exception as e:
+        # SMTP haipatikani kabisa: batch iliyobaki ijaribiwe baadaye
+        logger.error(f"✗ Outbox SMTP connection failed: {e}")
+        for row in rows:
+            if row.pk not in handled:
+                _failed(row, e)
+                failed += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def send_pending(batch_size=BATCH_SIZE, max_batches=None, connection=None, progress=None):
+    """Drain due emails batch by batch. progress(sent, failed) is called after each batch."""
+    total_sent = total_failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = claim_batch(batch_size)
+        if not rows:
+            break
+        sent, failed = send_batch(rows, connection)
+        total_sent += sent
+        total_failed += failed
+        batches += 1
+        if progress:
+            progress(total_sent, total_failed)
+    return total_sent, total_failed
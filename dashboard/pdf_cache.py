@@ -0,0 +1,246 @@
+# dashboard/pdf_cache.py
+"""
+Cache ya PDF zilizokwisha tengenezwa (report cards, fee statements, ID cards).
+
+A view describes what its PDF is built from (student row, results, payments)
+and gets a fingerprint. The fingerprint is a hash of those inputs, the
+SchoolSettings.updated_at stamp and the layout version of that PDF kind, so
+any change to the inputs produces a new key and old artifacts simply age
+out of the store.
+
+Usage inside a view, after the permission checks:
+
+    key = pdf_key('fee_statement', student_inputs(student), payment_inputs(student))
+    hit = serve_cached_pdf(request, key)
+    if hit:
+        return hit
+    ... build response with ReportLab ...
+    return remember_pdf(key, response)
+
+Hits are served with an ETag; a matching If-None-Match gets a 304.
+
+Settings (all optional):
+
+    PDF_CACHE = {
+        'BACKEND': 'disk',          # or 'cache' to use a Django cache alias
+        'DIR': '/tmp/pdf_cache',    # disk backend
+        'MAX_BYTES': 200 * 1024 * 1024,
+        'CACHE_ALIAS': 'default',   # cache backend
+        'TIMEOUT': 7 * 24 * 3600,
+    }
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+from dashboard.school_settings import get_school_settings
+
+logger = logging.getLogger(__name__)
+
+# Ongeza namba ya aina husika kila unapobadilisha muonekano wa PDF yake
+PDF_LAYOUT_VERSIONS = {
+    'student_results': 1,
+    'id_card': 1,
+    'fee_statement': 1,
+    'parent_results': 1,
+    'parent_fee_statement': 1,
+}
+
+DEFAULTS = {
+    'BACKEND': 'disk',
+    'DIR': os.path.join(tempfile.gettempdir(), 'charles_pdf_cache'),
+    'MAX_BYTES': 200 * 1024 * 1024,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 7 * 24 * 3600,
+}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'PDF_CACHE', {})}
+
+
+# ─────────────────────────────────────────────────────────────────
+#  INPUTS
+# ─────────────────────────────────────────────────────────────────
+
+def student_inputs(student):
+    return (
+        student.pk, student.full_name, student.registration_number, student.status,
+        student.classroom_id, str(student.classroom) if student.classroom_id else None,
+        student.admission_year, student.photo.name if student.photo else None,
+    )
+
+
+def result_inputs(student):
+    from exams.models import Result
+    return tuple(
+        Result.objects.filter(student=student).order_by('pk').values_list(
+            'pk', 'marks', 'subject__name', 'exam__name', 'exam__date', 'exam__exam_type'
+        )
+    )
+
+
+def payment_inputs(student):
+    from fees.models import FeeStructure, Payment
+    total_fee = (
+        FeeStructure.objects.filter(classroom_id=student.classroom_id)
+        .values_list('total_fee', flat=True).first()
+    )
+    payments = tuple(
+        Payment.objects.filter(student=student).order_by('pk').values_list(
+            'pk', 'amount_paid', 'date', 'receipt_no'
+        )
+    )
+    return (total_fee, payments)
+
+
+def settings_stamp(school_settings):
+    """Same stamp pdf_key() looks up, taken from an already loaded SchoolSettings."""
+    return (school_settings.pk, school_settings.updated_at) if school_settings else None
+
+
+_LOOKUP = object()
+
+
+def pdf_key(kind, *inputs, stamp=_LOOKUP):
+    """
+    Fingerprint for one PDF kind built from `inputs`. Batch callers pass
+    stamp=settings_stamp(...) they already computed.
+    """
+    if stamp is _LOOKUP:
+        stamp = settings_stamp(get_school_settings())
+    raw = repr((kind, PDF_LAYOUT_VERSIONS.get(kind, 0), stamp, inputs))
+    return f'{kind}-{hashlib.sha256(raw.encode()).hexdigest()[:40]}'
+
+
+# ─────────────────────────────────────────────────────────────────
+#  STORES
+# ─────────────────────────────────────────────────────────────────
+
+class DiskStore:
+    """Files under DIR; least recently used files go first once MAX_BYTES is exceeded."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fh:
+                disposition = fh.readline().decode().rstrip('\n')
+                content = fh.read()
+            os.utime(path)  # mtime = last use, kwa LRU
+        except OSError:
+            return None
+        return disposition, content
+
+    def set(self, key, disposition, content):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as fh:
+            fh.write(disposition.replace('\n', ' ').encode() + b'\n')
+            fh.write(content)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith('.pdf')]
+        except OSError:
+            return
+        stats = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            stats.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class CacheStore:
+    """Django cache alias; eviction is left to the backend (LocMem and Redis allkeys-lru are LRU)."""
+
+    def __init__(self, alias, timeout):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get(f'pdf:{key}')
+
+    def set(self, key, disposition, content):
+        self.cache.set(f'pdf:{key}', (disposition, content), self.timeout)
+
+
+def get_store():
+    config = _config()
+    if config['BACKEND'] == 'cache':
+        return CacheStore(config['CACHE_ALIAS'], config['TIMEOUT'])
+    return DiskStore(config['DIR'], config['MAX_BYTES'])
+
+
+# ─────────────────────────────────────────────────────────────────
+#  RESPONSES
+# ─────────────────────────────────────────────────────────────────
+
+def _etag(key):
+    return f'"{key}"'
+
+
+def _finish(response, key):
+    response['ETag'] = _etag(key)
+    # Browser ihakiki kila mara; ikilingana inapata 304 bila kupakua tena
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def serve_cached_pdf(request, key):
+    """304 or the cached PDF for `key`, or None when it has to be rendered."""
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if _etag(key) in etags or '*' in etags:
+        return _finish(HttpResponseNotModified(), key)
+
+    try:
+        cached = get_store().get(key)
+    except Exception as e:
+        logger.warning("PDF cache read failed for %s: %s", key, e)
+        cached = None
+    if cached is None:
+        return None
+
+    disposition, content = cached
+    response = HttpResponse(content, content_type='application/pdf')
+    if disposition:
+        response['Content-Disposition'] = disposition
+    return _finish(response, key)
+
+
+def remember_pdf(key, response):
+    """Store a freshly rendered PDF response and tag it with its ETag."""
+    if response.status_code == 200 and response.get('Content-Type', '').startswith('application/pdf'):
+        try:
+            get_store().set(key, response.get('Content-Disposition', ''), response.content)
+        except Exception as e:
+            logger.warning("PDF cache write failed for %s: %s", key, e)
+        _finish(response, key)
+    return response
@@ -0,0 +1,125 @@
+# dashboard/school_settings.py
+"""
+SchoolSettings ya shule, bila query kila request.
+
+The single SchoolSettings row is kept in process memory together with a
+version stamp shared by all workers (dashboard/stamps.py). Any
+post_save/post_delete on SchoolSettings writes a new version (after commit).
+The saving process reloads on its next call; other workers look at the
+version at most every VERSION_TTL seconds, so they follow within that time.
+A steady-state call touches neither the stamps nor the database.
+
+The logos used by the PDF builders are read from disk once per version:
+
+    logo = school_logo()        # SchoolSettings.logo, or None
+    logo = static_logo()        # static/images/logo.jpeg, or None
+    canvas.drawImage(logo.reader, ...)
+    elements.append(logo.flowable(width=80, height=80))
+"""
+import copy
+import logging
+import threading
+import time
+from io import BytesIO
+
+from django.db import transaction
+
+from . import stamps
+from .models import SchoolSettings
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'dashboard:school_settings:version'
+VERSION_TTL = 5      # sekunde; workers wengine wanaona mabadiliko ndani ya muda huu
+
+_lock = threading.Lock()
+_state = {'version': None, 'settings': None, 'logo': None, 'checked_at': None}
+_static_logo = {}
+
+
+class LogoImage:
+    """Logo bytes plus a decoded ImageReader, ready for ReportLab."""
+
+    def __init__(self, data):
+        from reportlab.lib.utils import ImageReader
+        self.data = data
+        self.reader = ImageReader(BytesIO(data))
+        self.size = self.reader.getSize()
+
+    def flowable(self, width=None, height=None):
+        from reportlab.platypus import Image
+        return Image(BytesIO(self.data), width=width, height=height)
+
+
+def _read_logo(path):
+    try:
+        with open(path, 'rb') as fh:
+            return LogoImage(fh.read())
+    except Exception as e:
+        logger.warning("Could not load logo %s: %s", path, e)
+        return None
+
+
+def _current_version():
+    now = time.monotonic()
+    checked_at = _state['checked_at']
+    if _state['version'] is not None and checked_at is not None and now - checked_at < VERSION_TTL:
+        return _state['version']
+    _state['checked_at'] = now
+    return stamps.read([VERSION_KEY])[VERSION_KEY]
+
+
+def _load():
+    version = _current_version()
+    if _state['version'] != version or version is None:
+        settings_obj = SchoolSettings.objects.first()
+        with _lock:
+            _state.update({'version': version, 'settings': settings_obj, 'logo': None})
+    return _state
+
+
+def get_school_settings():
+    """The SchoolSettings row (or None). A copy, so callers may change it without affecting others."""
+    settings_obj = _load()['settings']
+    return copy.copy(settings_obj) if settings_obj is not None else None
+
+
+def school_logo():
+    """Decoded SchoolSettings.logo, or None when there is no logo."""
+    state = _load()
+    settings_obj = state['settings']
+    if settings_obj is None or not settings_obj.logo:
+        return None
+    if state['logo'] is None:
+        try:
+            path = settings_obj.logo.path
+        except Exception:
+            return None
+        logo = _read_logo(path)
+        with _lock:
+            if state['version'] == _state['version']:
+                _state['logo'] = logo
+        return logo
+    return state['logo']
+
+
+def static_logo(name='images/logo.jpeg'):
+    """Decoded static logo; static files only change on deploy, so it is kept for the process lifetime."""
+    if name not in _static_logo:
+        from django.contrib.staticfiles import finders
+        path = finders.find(name)
+        _static_logo[name] = _read_logo(path) if path else None
+    return _static_logo[name]
+
+
+def _bump():
+    stamps.bump([VERSION_KEY])
+    _state['checked_at'] = None
+
+
+def invalidate_school_settings(**kwargs):
+    """Signal receiver: every process reloads SchoolSettings on its next call."""
+    # Sasa (kwa transaction hii) na tena baada ya commit, ili worker
+    # aliyesoma kabla ya commit asibaki na nakala ya zamani
+    _bump()
+    transaction.on_commit(_bump)
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import SchoolSettings
+from .school_settings import invalidate_school_settings
+
+
+@receiver(post_save, sender=SchoolSettings)
+@receiver(post_delete, sender=SchoolSettings)
+def school_settings_changed(sender, instance, **kwargs):
+    invalidate_school_settings()
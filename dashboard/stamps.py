@@ -0,0 +1,77 @@
+# dashboard/stamps.py
+"""
+Version stamps zinazoonekana na workers wote.
+
+    stamps.read(['chat:inbox'])      # {key: version}; a key never seen gets one now
+    stamps.bump(['chat:inbox'])      # a new version for each key
+
+The SchoolSettings copy, the chat poll ETags and the parent dashboard
+snapshots are cached per process or per key and only need to know whether
+their data changed. The stamps that tell them must be shared by every worker.
+
+With a shared in-memory cache configured (Redis through REDIS_URL, or
+Memcached) the stamps live there and cost no database query. Otherwise they
+live in the VersionStamp table: a read is one primary-key lookup and a bump
+one upsert. They are never put on DatabaseCache, whose every write also
+counts and culls the cache table.
+
+Callers bump after commit (transaction.on_commit), so nobody rebuilds from
+data older than the version it is filed under.
+"""
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+
+from .models import VersionStamp
+
+
+def shared_cache():
+    """The default cache when it is shared and in memory (Redis/Memcached), else None."""
+    cache = caches['default']
+    return cache if isinstance(cache, (RedisCache, BaseMemcachedCache)) else None
+
+
+def read(keys):
+    keys = list(keys)
+    cache = shared_cache()
+    if cache is not None:
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # Cache tupu (restart/eviction): version mpya, sawa kwa workers wote
+                cache.add(key, time.time_ns(), None)
+                versions[key] = cache.get(key)
+        return versions
+
+    versions = dict(VersionStamp.objects.filter(key__in=keys).values_list('key', 'version'))
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time_ns()
+        VersionStamp.objects.bulk_create(
+            [VersionStamp(key=key, version=now) for key in missing], ignore_conflicts=True
+        )
+        versions.update(VersionStamp.objects.filter(key__in=missing).values_list('key', 'version'))
+    return versions
+
+
+def bump(keys):
+    stamp = time.time_ns()
+    cache = shared_cache()
+    if cache is not None:
+        cache.set_many({key: stamp for key in keys}, timeout=None)
+        return
+    VersionStamp.objects.bulk_create(
+        [VersionStamp(key=key, version=stamp) for key in keys],
+        update_conflicts=True, unique_fields=['key'], update_fields=['version'],
+    )
+
+
+def forget(keys):
+    """Drop stamps that will never be read again (e.g. archived chat sessions)."""
+    cache = shared_cache()
+    if cache is not None:
+        cache.delete_many(list(keys))
+    else:
+        VersionStamp.objects.filter(key__in=list(keys)).delete()
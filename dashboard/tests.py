@@ -1,3 +1,537 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import StreamRequestHandler, ThreadingTCPServer
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from classes.models import ClassRoom
+from exams.models import Assignment
+from jamiitek_middleware import JamiiTekStatusMiddleware
+from fees.models import FeeStructure, Payment
+from students.models import Student
+from .models import BackgroundJob, OutboxEmail, SchoolSettings
+from .context_processors import school_settings as school_settings_context
+from .outbox import queue_email, send_pending
+from .pdf_cache import DiskStore, pdf_key, payment_inputs, student_inputs
+from . import jobs, school_settings, stamps
+from .school_settings import get_school_settings, invalidate_school_settings, static_logo
+from .uploadcare import reset_session, serve_file, signed_url
+
+
+class PdfCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        classroom = ClassRoom.objects.create(name='Form One', code='F1')
+        FeeStructure.objects.create(classroom=classroom, total_fee=300000)
+        cls.student = Student.objects.create(
+            full_name='Asha Juma',
+            email='asha@example.com',
+            classroom=classroom,
+            registration_number='CA/F1/2025/0001',
+        )
+        Payment.objects.create(student=cls.student, amount_paid=100000, receipt_no='R-1')
+        cls.staff = get_user_model().objects.create_user(
+            username='bursar', password='x', role='ADMIN', is_staff=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(PDF_CACHE={'DIR': self.tmp.name})
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def fee_key(self):
+        return pdf_key('fee_statement', student_inputs(self.student), payment_inputs(self.student))
+
+    def test_key_follows_inputs_and_school_settings(self):
+        key = self.fee_key()
+        self.assertEqual(key, self.fee_key())
+
+        Payment.objects.create(student=self.student, amount_paid=50000, receipt_no='R-2')
+        after_payment = self.fee_key()
+        self.assertNotEqual(key, after_payment)
+
+        SchoolSettings.objects.create(name='Charles Academy')
+        self.assertNotEqual(after_payment, self.fee_key())
+
+    def test_second_download_is_served_from_cache_with_etag(self):
+        self.client.force_login(self.staff)
+        url = reverse('fees:download_pdf', args=[self.student.id])
+
+        first = self.client.get(url)
+        self.assertEqual(first['Content-Type'], 'application/pdf')
+        etag = first['ETag']
+        self.assertEqual(len(os.listdir(self.tmp.name)), 1)
+
+        second = self.client.get(url)
+        self.assertEqual((second['ETag'], second.content), (etag, first.content))
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+
+        Payment.objects.create(student=self.student, amount_paid=50000, receipt_no='R-3')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_disk_store_evicts_least_recently_used(self):
+        store = DiskStore(self.tmp.name, max_bytes=3100)  # nafasi ya faili tatu
+        for i, key in enumerate(['a', 'b', 'c']):
+            store.set(key, 'attachment', b'x' * 1000)
+            os.utime(os.path.join(self.tmp.name, f'{key}.pdf'), (time.time() - 100 + i,) * 2)
+        self.assertIsNotNone(store.get('a'))  # 'a' sasa ndiyo iliyotumika karibuni
+        store.set('d', 'attachment', b'x' * 1000)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['a.pdf', 'c.pdf', 'd.pdf'])
+
+
+CDN_UUID = '11111111-2222-3333-4444-555555555555'
+API_UUID = '66666666-7777-8888-9999-000000000000'
+FILE_BODY = bytes(range(256)) * 40
+# Bila database wala Redis: SimpleTestCase inatumia cache ya process hii tu
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class _StubUploadcare(BaseHTTPRequestHandler):
+    """CDN inajua CDN_UUID tu; API inaelekeza API_UUID kwenye /direct/."""
+    hits = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send_file(self, body):
+        status, headers = 200, {}
+        header = self.headers.get('Range')
+        if header:
+            start, end = header.split('=')[1].split('-')
+            start, end = int(start), int(end or len(FILE_BODY) - 1)
+            body = FILE_BODY[start:end + 1]
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(FILE_BODY)}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        return body
+
+    def do_HEAD(self):
+        self.hits.append(('HEAD', self.path))
+        if self.path == f'/{CDN_UUID}/':
+            self._send_file(FILE_BODY)
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        self.hits.append(('GET', self.path))
+        if self.path in (f'/{CDN_UUID}/', '/direct/'):
+            self.wfile.write(self._send_file(FILE_BODY))
+        elif self.path == f'/files/{API_UUID}/':
+            body = (
+                f'{{"original_file_url": "http://127.0.0.1:{self.server.server_port}/direct/",'
+                f' "original_filename": "handout.pdf", "mime_type": "application/pdf", "size": {len(FILE_BODY)}}}'
+            ).encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+
+def _start_stub(cls):
+    cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubUploadcare)
+    threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+    cls.addClassCleanup(cls.server.server_close)
+    cls.addClassCleanup(cls.server.shutdown)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UploadcareGatewayTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _start_stub(cls)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        base = f'http://127.0.0.1:{self.server.server_port}'
+        override = override_settings(UPLOADCARE_GATEWAY={
+            'CDN_BASE': base, 'API_BASE': base, 'CACHE_DIR': self.tmp.name,
+            'CACHE_FILE_MAX_BYTES': len(FILE_BODY),
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(reset_session)
+        cache.clear()
+        _StubUploadcare.hits.clear()
+        self.factory = RequestFactory()
+
+    def download(self, value, **headers):
+        response = serve_file(self.factory.get('/', headers=headers), value, 'Handout.pdf', disposition='inline')
+        if response.streaming:
+            return response, b''.join(response.streaming_content)
+        return response, response.content
+
+    def test_hot_file_is_fetched_once_then_served_from_disk(self):
+        response, body = self.download(f'https://ucarecdn.com/{CDN_UUID}/handout.pdf')
+        self.assertEqual((response.status_code, body), (200, FILE_BODY))
+        self.assertEqual(response['Content-Disposition'], 'inline; filename="Handout.pdf"')
+
+        response, body = self.download(CDN_UUID)
+        self.assertEqual(body, FILE_BODY)
+        self.assertEqual(_StubUploadcare.hits, [('HEAD', f'/{CDN_UUID}/'), ('GET', f'/{CDN_UUID}/')])
+
+    def test_range_and_conditional_get(self):
+        response, body = self.download(CDN_UUID, Range='bytes=10-19')
+        self.assertEqual((response.status_code, body), (206, FILE_BODY[10:20]))
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(FILE_BODY)}')
+
+        response, _ = self.download(CDN_UUID, If_None_Match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response, _ = self.download(CDN_UUID, Range=f'bytes={len(FILE_BODY)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_falls_back_to_rest_api_and_proxies_large_files(self):
+        with override_settings(UPLOADCARE_GATEWAY={
+            'CDN_BASE': f'http://127.0.0.1:{self.server.server_port}',
+            'API_BASE': f'http://127.0.0.1:{self.server.server_port}',
+            'CACHE_DIR': self.tmp.name, 'CACHE_FILE_MAX_BYTES': 100,
+        }):
+            response, body = self.download(API_UUID, Range='bytes=0-9')
+        self.assertEqual((response.status_code, body), (206, FILE_BODY[:10]))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+        self.assertIn(('GET', f'/files/{API_UUID}/'), _StubUploadcare.hits)
+
+    def test_offload_modes_never_move_bytes_through_the_worker(self):
+        request = self.factory.get('/')
+        response = serve_file(request, CDN_UUID, 'My Handout.pdf', mode='redirect')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].endswith(f'/{CDN_UUID}/-/inline/no/My%20Handout.pdf'))
+        self.assertIn('no-store', response['Cache-Control'])
+
+        response = serve_file(request, CDN_UUID, 'Handout.pdf', disposition='inline', mode='accel')
+        self.assertEqual(response['X-Accel-Redirect'], f'/_uploadcare/{CDN_UUID}/-/inline/yes/Handout.pdf')
+        self.assertEqual(_StubUploadcare.hits, [])
+
+        response = serve_file(request, CDN_UUID, 'Handout.pdf', mode='sendfile')
+        self.assertEqual(response.content, b'')
+        with open(response['X-Sendfile'], 'rb') as fh:
+            self.assertEqual(fh.read(), FILE_BODY)
+
+    def test_signed_redirect_with_secure_delivery(self):
+        with override_settings(UPLOADCARE_GATEWAY={
+            'SECURE_DELIVERY': {'CDN': 'files.example.com', 'SECRET': 'ab' * 16}, 'SIGNED_URL_TTL': 60,
+        }):
+            location = signed_url(CDN_UUID, 'Handout.pdf')
+        self.assertTrue(location.startswith(f'https://files.example.com/{CDN_UUID}/-/inline/no/Handout.pdf?token=exp='))
+        self.assertIn(f'acl=/{CDN_UUID}/-/inline/no/*', location)
+
+
+class UploadcareMetadataTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _start_stub(cls)
+
+    def setUp(self):
+        base = f'http://127.0.0.1:{self.server.server_port}'
+        override = override_settings(UPLOADCARE_GATEWAY={'CDN_BASE': base, 'API_BASE': base})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(reset_session)
+        _StubUploadcare.hits.clear()
+        self.classroom = ClassRoom.objects.create(name='Form One', code='F1')
+
+    def assignment(self, **kwargs):
+        return Assignment.objects.create(
+            title='Handout', classroom=self.classroom, due_date=timezone.now(), **kwargs
+        )
+
+    def test_metadata_is_fetched_once_on_save(self):
+        assignment = self.assignment(file=API_UUID)
+        self.assertEqual(
+            (assignment.file_uuid, assignment.file_name, assignment.file_size, assignment.file_mime_type),
+            (API_UUID, 'handout.pdf', len(FILE_BODY), 'application/pdf'),
+        )
+        assignment.title = 'Handout v2'
+        assignment.save()
+        self.assertEqual(_StubUploadcare.hits, [('GET', f'/files/{API_UUID}/')])
+
+        _StubUploadcare.hits.clear()
+        listed = list(Assignment.objects.all())
+        self.assertTrue(listed[0].get_file_url().endswith(f'{API_UUID}/handout.pdf'))
+        self.assertEqual(_StubUploadcare.hits, [])
+
+    def test_backfill_command_fills_old_rows(self):
+        self.assignment(file=API_UUID)
+        # kama row ya kabla ya columns hizi
+        Assignment.objects.update(file_uuid='', file_name='', file_size=None, file_mime_type='')
+        _StubUploadcare.hits.clear()
+        self.assertIn(API_UUID, Assignment.objects.get().get_file_url())
+        self.assertEqual(_StubUploadcare.hits, [])
+        self.assertIsNone(self.assignment().get_file_url())
+        call_command('backfill_uploadcare_metadata', model=['exams.Assignment'], workers=2, stdout=StringIO())
+        self.assertEqual(Assignment.objects.get(file_uuid=API_UUID).file_name, 'handout.pdf')
+
+
+class JamiiTekStatusMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(
+            JAMIITEK_API_KEY='key', JAMIITEK_STATUS_FILE=os.path.join(self.tmp.name, 'status.json')
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.middleware = JamiiTekStatusMiddleware(lambda request: HttpResponse('ok'))
+        self.calls = []
+        self.reply = {'status': 'active'}
+        self.middleware.session.get = self.fake_get
+
+    def fake_get(self, url, timeout):
+        self.calls.append(url)
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return mock.Mock(status_code=200, json=lambda: self.reply)
+
+    def get(self):
+        return self.middleware(RequestFactory().get('/'))
+
+    def wait_for_refresh(self):
+        with self.middleware._refresh_lock:
+            pass
+
+    def test_suspension_page_is_rendered_once(self):
+        self.reply = {'status': 'suspended', 'suspension_message': 'Lipa'}
+        first = self.get()
+        self.assertEqual(first.status_code, 503)
+        self.assertIn(b'Lipa', first.content)
+        page = self.middleware._page
+        self.get()
+        self.assertIs(self.middleware._page, page)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_failures_back_off_and_stale_status_is_served(self):
+        self.get()
+        record = self.middleware.store.read()
+        record['fetched_at'] -= JamiiTekStatusMiddleware.FRESH + 1
+        self.middleware.store.write(record)
+
+        self.reply = ConnectionError('down')
+        self.assertEqual(self.get().status_code, 200)  # stale 'active', refresh iko nyuma
+        self.wait_for_refresh()
+        self.get()
+        self.wait_for_refresh()
+        record = self.middleware.store.read()
+        self.assertEqual((len(self.calls), record['failures']), (2, 1))
+        self.assertEqual(record['data'], {'status': 'active'})
+
+        record['retry_at'] = 0
+        self.middleware.store.write(record)
+        self.get()
+        self.wait_for_refresh()
+        record = self.middleware.store.read()
+        self.assertEqual(record['failures'], 2)
+        self.assertAlmostEqual(record['retry_at'] - time.time(), 2 * JamiiTekStatusMiddleware.BACKOFF_BASE, delta=5)
+
+
+class SchoolSettingsCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        invalidate_school_settings()
+
+    def test_cached_until_saved_or_deleted(self):
+        self.assertIsNone(get_school_settings())
+        with self.captureOnCommitCallbacks(execute=True):
+            SchoolSettings.objects.create(name='Charles Academy')
+        # version stamp + row
+        with self.assertNumQueries(2):
+            get_school_settings()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_school_settings().name, 'Charles Academy')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SchoolSettings.objects.update(name='ignored')  # update() haitumi signal
+            settings_obj = SchoolSettings.objects.get()
+            settings_obj.name = 'Charles Academy Dodoma'
+            settings_obj.save()
+        self.assertEqual(get_school_settings().name, 'Charles Academy Dodoma')
+
+        copy = get_school_settings()
+        copy.name = 'changed'
+        self.assertEqual(get_school_settings().name, 'Charles Academy Dodoma')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SchoolSettings.objects.all().delete()
+        self.assertIsNone(get_school_settings())
+
+    def test_other_workers_follow_within_version_ttl(self):
+        SchoolSettings.objects.create(name='Charles Academy')
+        self.assertEqual(get_school_settings().name, 'Charles Academy')
+        # Worker mwingine amehifadhi: version mpya kwenye cache ya pamoja tu
+        SchoolSettings.objects.update(name='Charles Academy Dodoma')
+        stamps.bump([school_settings.VERSION_KEY])
+        self.assertEqual(get_school_settings().name, 'Charles Academy')
+        with mock.patch.object(school_settings, 'VERSION_TTL', 0):
+            self.assertEqual(get_school_settings().name, 'Charles Academy Dodoma')
+
+    def test_stamps_cost_one_query_and_never_touch_the_cache_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = stamps.read(['a', 'b'])
+            self.assertEqual(stamps.read(['a', 'b']), first)
+            stamps.bump(['a'])
+            second = stamps.read(['a', 'b'])
+        self.assertNotEqual(second['a'], first['a'])
+        self.assertEqual(second['b'], first['b'])
+        # read mpya (3), read (1), bump (1), read (1)
+        self.assertEqual(len(queries), 6)
+        self.assertFalse(any('django_cache' in q['sql'] for q in queries))
+
+    def test_context_processor_and_static_logo(self):
+        self.assertIn('school_settings', school_settings_context(RequestFactory().get('/')))
+        logo = static_logo()
+        self.assertIs(static_logo(), logo)
+        if logo:
+            self.assertEqual(len(logo.size), 2)
+
+
+class _StubSMTP(StreamRequestHandler):
+    """SMTP ya kutosha kwa smtplib; inakataa bounce@example.com."""
+    connections = 0
+    messages = []
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        type(self).connections += 1
+        self.reply('220 stub')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'EHLO':
+                self.reply('250 stub')
+            elif command == 'RCPT' and 'bounce@' in line:
+                self.reply('550 no such user')
+            elif command == 'DATA':
+                self.reply('354 go on')
+                data = []
+                while (chunk := self.rfile.readline()) not in (b'.\r\n', b''):
+                    data.append(chunk)
+                self.messages.append(b''.join(data).decode())
+                self.reply('250 queued')
+            else:
+                self.reply('250 ok')
+
+
+class OutboxTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        ThreadingTCPServer.allow_reuse_address = True
+        cls.server = ThreadingTCPServer(('127.0.0.1', 0), _StubSMTP)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        _StubSMTP.connections = 0
+        _StubSMTP.messages = []
+        smtp = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+        smtp.enable()
+        self.addCleanup(smtp.disable)
+
+    def test_batch_shares_one_connection_and_template(self):
+        from teachers.models import Teacher
+        from teachers.utils import send_teacher_credentials
+        for i in range(3):
+            teacher = Teacher.objects.create(first_name=f'Neema{i}', last_name='Ali', email=f't{i}@example.com')
+            self.assertTrue(send_teacher_credentials(teacher, 'Secret@123'))
+
+        with mock.patch('dashboard.outbox.get_template', wraps=get_template) as loader:
+            self.assertEqual(send_pending(), (3, 0))
+        self.assertEqual(loader.call_count, 1)
+        self.assertEqual(_StubSMTP.connections, 1)
+        self.assertEqual(len(_StubSMTP.messages), 3)
+        self.assertIn('Neema0', _StubSMTP.messages[0])
+        row = OutboxEmail.objects.first()
+        self.assertEqual((row.status, row.context, row.attempts), ('SENT', {}, 1))
+
+    def test_failures_back_off_and_missing_template_is_final(self):
+        bounce = queue_email('bounce@example.com', 'Hi', body='Hello')
+        missing = queue_email('a@example.com', 'Hi', template='no/such/template.html')
+        queue_email('b@example.com', 'Hi', body='Hello')
+
+        self.assertEqual(send_pending(), (1, 2))
+        bounce.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual((bounce.status, bounce.attempts), ('PENDING', 1))
+        self.assertGreater(bounce.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(missing.status, 'FAILED')
+        # Haijafika muda wa kujaribu tena
+        self.assertEqual(send_pending(), (0, 0))
+
+
+class BackgroundJobTests(TestCase):
+
+    def test_enqueue_retries_when_the_blocking_job_finishes_meanwhile(self):
+        first, _ = jobs.enqueue('class_documents', unique_key='k')
+        create = BackgroundJob.objects.create
+        calls = []
+
+        def racing_create(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                # Insert iligongana na job ya kwanza, ambayo iliisha kabla ya select
+                raise jobs.IntegrityError('dashboard_job_one_active_per_key')
+            return create(**kwargs)
+
+        BackgroundJob.objects.filter(pk=first.pk).update(status='DONE')
+        with mock.patch.object(BackgroundJob.objects, 'create', side_effect=racing_create):
+            job, created = jobs.enqueue('class_documents', unique_key='k')
+        self.assertTrue(created)
+        self.assertEqual(len(calls), 2)
+        self.assertNotEqual(job.pk, first.pk)
+        self.assertEqual(jobs.enqueue('class_documents', unique_key='k'), (job, False))
+
+    def test_progress_is_written_at_most_every_few_seconds(self):
+        job, _ = jobs.enqueue('class_documents')
+        progress = jobs.progress_callback(job, every=60)
+        with self.assertNumQueries(2):
+            for done in range(1, 11):
+                progress(done, 10)
+        job.refresh_from_db()
+        self.assertEqual((job.progress_done, job.progress_total), (10, 10))
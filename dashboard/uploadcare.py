@@ -0,0 +1,484 @@
+# dashboard/uploadcare.py
+"""
+Gateway moja ya kupakua files za Uploadcare (certificates, assignments, submissions).
+
+- One keep-alive requests.Session per process, with a bounded connection
+  pool and short connect timeouts, instead of a fresh connection per try.
+- UUID -> resolved URL / content type / size is cached in the Django cache,
+  so a download costs at most one lookup the first time and none afterwards.
+- Small files (hot handouts, certificates) are kept in a bounded local disk
+  cache, least recently used first out. Uploadcare files never change under
+  the same UUID, so cached bytes never go stale.
+- Responses carry an ETag and honour If-None-Match (304) and single
+  `Range: bytes=a-b` requests (206), both from disk and when proxying.
+- MODE decides who moves the bytes. 'proxy' (default) keeps a worker busy
+  for the whole transfer; 'redirect', 'accel' and 'sendfile' only authorize
+  and hand the transfer to the CDN, nginx or Apache. See serve_file().
+  `python manage.py benchmark_downloads` compares the modes.
+
+nginx kwa MODE='accel':
+
+    location /_uploadcare/ {
+        internal;
+        proxy_pass https://ucarecdn.com/;
+        proxy_set_header Host ucarecdn.com;
+        proxy_ssl_server_name on;
+    }
+
+Usage inside a view, after the permission checks:
+
+    return serve_file(request, assignment.file, 'Assignment.pdf', disposition='inline')
+
+Settings (all optional):
+
+    UPLOADCARE_GATEWAY = {
+        'MODE': 'proxy',            # redirect | accel | sendfile
+        'CDN_BASE': 'https://ucarecdn.com',
+        'API_BASE': 'https://api.uploadcare.com',
+        'CONNECT_TIMEOUT': 3.05,
+        'READ_TIMEOUT': 20,
+        'POOL_SIZE': 20,
+        'CACHE_DIR': '/tmp/uploadcare_cache',
+        'CACHE_MAX_BYTES': 500 * 1024 * 1024,
+        'CACHE_FILE_MAX_BYTES': 20 * 1024 * 1024,   # kubwa zaidi ya hii zinapitishwa tu
+        'META_TIMEOUT': 24 * 3600,
+        'CACHE_ALIAS': 'default',
+        'SIGNED_URL_TTL': 300,      # sekunde, kwa redirect
+        'SECURE_DELIVERY': None,    # {'CDN': 'cdn.example.com', 'SECRET': '<hex>'} kusaini URLs
+        'ACCEL_PREFIX': '/_uploadcare/',
+    }
+"""
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+logger = logging.getLogger(__name__)
+
+MODES = ('proxy', 'redirect', 'accel', 'sendfile')
+
+DEFAULTS = {
+    'MODE': 'proxy',
+    'CDN_BASE': 'https://ucarecdn.com',
+    'API_BASE': 'https://api.uploadcare.com',
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 20,
+    'POOL_SIZE': 20,
+    'CACHE_DIR': os.path.join(tempfile.gettempdir(), 'charles_uploadcare_cache'),
+    'CACHE_MAX_BYTES': 500 * 1024 * 1024,
+    'CACHE_FILE_MAX_BYTES': 20 * 1024 * 1024,
+    'META_TIMEOUT': 24 * 3600,
+    'CACHE_ALIAS': 'default',
+    'SIGNED_URL_TTL': 300,
+    'SECURE_DELIVERY': None,
+    'ACCEL_PREFIX': '/_uploadcare/',
+}
+
+CHUNK_SIZE = 64 * 1024
+UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.I)
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'UPLOADCARE_GATEWAY', {})}
+
+
+def _timeout(config):
+    return (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+
+
+def get_session():
+    """Session ya process hii; connections zinabaki wazi kati ya downloads."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool = _config()['POOL_SIZE']
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool, max_retries=1)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def reset_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def file_uuid(value):
+    """UUID from an Uploadcare File, a bare UUID or a CDN URL; None if there is none."""
+    if not value:
+        return None
+    raw = getattr(value, 'uuid', None) or getattr(value, 'cdn_url', None) or value
+    match = UUID_RE.search(str(raw))
+    return match.group(0).lower() if match else None
+
+
+def cdn_url_for(value):
+    """CDN URL of a file without any network call (pyuploadcare builds it locally)."""
+    cdn_url = getattr(value, 'cdn_url', None)
+    if cdn_url:
+        return str(cdn_url)
+    uuid = file_uuid(value)
+    return f"{_config()['CDN_BASE']}/{uuid}/" if uuid else ''
+
+
+# ─────────────────────────────────────────────────────────────────
+#  METADATA
+# ─────────────────────────────────────────────────────────────────
+
+def _meta_key(uuid):
+    return f'uploadcare:meta:{uuid}'
+
+
+def _lookup(uuid, config):
+    session = get_session()
+    cdn_url = f"{config['CDN_BASE']}/{uuid}/"
+    try:
+        head = session.head(cdn_url, timeout=_timeout(config), allow_redirects=True)
+        if head.status_code == 200:
+            size = head.headers.get('Content-Length')
+            return {
+                'url': cdn_url,
+                'content_type': head.headers.get('Content-Type', 'application/octet-stream'),
+                'size': int(size) if size and size.isdigit() else None,
+            }
+    except requests.RequestException as e:
+        logger.warning("Uploadcare CDN lookup failed for %s: %s", uuid, e)
+
+    # CDN haikujibu vizuri — uliza REST API mahali file lilipo
+    info = fetch_file_info(uuid)
+    if info and info['url']:
+        return {
+            'url': info['url'],
+            'content_type': info['mime_type'] or 'application/octet-stream',
+            'size': info['size'],
+        }
+    return None
+
+
+def fetch_file_info(uuid, retries=2):
+    """
+    REST API info for one file: {'uuid', 'filename', 'size', 'mime_type', 'url'},
+    or None when it cannot be fetched. Waits out 429 rate limiting (Retry-After).
+    """
+    config = _config()
+    uploadcare_config = getattr(settings, 'UPLOADCARE', {})
+    for attempt in range(retries + 1):
+        try:
+            api = get_session().get(
+                f"{config['API_BASE']}/files/{uuid}/",
+                headers={
+                    'Authorization': f"Uploadcare.Simple {uploadcare_config.get('pub_key', '')}:"
+                                     f"{uploadcare_config.get('secret', '')}",
+                    'Accept': 'application/vnd.uploadcare-v0.7+json',
+                },
+                timeout=_timeout(config),
+            )
+            if api.status_code == 429 and attempt < retries:
+                retry_after = api.headers.get('Retry-After', '1')
+                time.sleep(min(float(retry_after) if retry_after.isdigit() else 1, 10))
+                continue
+            if api.status_code != 200:
+                return None
+            info = api.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Uploadcare API lookup failed for %s: %s", uuid, e)
+            return None
+        return {
+            'uuid': uuid,
+            'filename': info.get('original_filename') or '',
+            'size': info.get('size'),
+            'mime_type': info.get('mime_type') or '',
+            'url': info.get('original_file_url') or info.get('url'),
+        }
+    return None
+
+
+def resolve(uuid):
+    """{'url', 'content_type', 'size'} for a UUID, cached. Raises Http404 when it cannot be found."""
+    config = _config()
+    cache = caches[config['CACHE_ALIAS']]
+    meta = cache.get(_meta_key(uuid))
+    if meta is None:
+        meta = _lookup(uuid, config)
+        if meta is None:
+            raise Http404("File not found on Uploadcare.")
+        cache.set(_meta_key(uuid), meta, config['META_TIMEOUT'])
+    return meta
+
+
+# ─────────────────────────────────────────────────────────────────
+#  LOCAL DISK CACHE
+# ─────────────────────────────────────────────────────────────────
+
+class FileCache:
+    """Bytes za files kwa UUID; zinazotumika kidogo zinaondolewa kwanza zaidi ya max_bytes."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, uuid):
+        return os.path.join(self.directory, uuid)
+
+    def get(self, uuid):
+        path = self.path(uuid)
+        try:
+            os.utime(path)  # mtime = last use, kwa LRU
+        except OSError:
+            return None
+        return path
+
+    def fill(self, uuid, chunks):
+        """Write chunks to the cache atomically and return the path."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(uuid)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'wb') as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+        return path
+
+    def evict(self):
+        try:
+            entries = [e for e in os.scandir(self.directory) if not e.name.endswith('.tmp')]
+        except OSError:
+            return
+        stats = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            stats.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def get_file_cache():
+    config = _config()
+    return FileCache(config['CACHE_DIR'], config['CACHE_MAX_BYTES'])
+
+
+# ─────────────────────────────────────────────────────────────────
+#  RESPONSES
+# ─────────────────────────────────────────────────────────────────
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single `bytes=` range, None to send everything, or 'invalid'."""
+    match = RANGE_RE.match((header or '').strip())
+    if not match or size is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return 'invalid'
+    return start, end
+
+
+def _iter_file(fh, start, length):
+    with fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _from_disk(request, path, content_type):
+    # Fungua sasa: eviction ikifuta file baadaye, handle hii bado inasomeka
+    fh = open(path, 'rb')
+    size = os.fstat(fh.fileno()).st_size
+    span = parse_range(request.META.get('HTTP_RANGE'), size)
+    if span == 'invalid':
+        fh.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    start, end = span or (0, size - 1)
+    length = end - start + 1 if size else 0
+    response = StreamingHttpResponse(_iter_file(fh, start, length), content_type=content_type)
+    response['Content-Length'] = str(length)
+    if span:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def _proxy(request, meta, config):
+    headers = {}
+    if request.META.get('HTTP_RANGE'):
+        headers['Range'] = request.META['HTTP_RANGE']
+    try:
+        upstream = get_session().get(meta['url'], headers=headers, stream=True, timeout=_timeout(config))
+    except requests.RequestException as e:
+        raise Http404(f"File fetch failed: {e}")
+    if upstream.status_code not in (200, 206, 416):
+        upstream.close()
+        raise Http404("File not found on Uploadcare.")
+
+    def chunks():
+        try:
+            yield from upstream.iter_content(chunk_size=CHUNK_SIZE)
+        finally:
+            upstream.close()
+
+    response = StreamingHttpResponse(
+        chunks(), status=upstream.status_code,
+        content_type=upstream.headers.get('Content-Type', meta['content_type']),
+    )
+    for header in ('Content-Length', 'Content-Range'):
+        if upstream.headers.get(header):
+            response[header] = upstream.headers[header]
+    return response
+
+
+def _cached_path(uuid, meta, config):
+    """Local path of the file, downloading it into the disk cache if it is small enough."""
+    store = get_file_cache()
+    path = store.get(uuid)
+    size = meta.get('size')
+    if path is None and size is not None and size <= config['CACHE_FILE_MAX_BYTES']:
+        try:
+            upstream = get_session().get(meta['url'], stream=True, timeout=_timeout(config))
+            if upstream.status_code == 200:
+                with upstream:
+                    path = store.fill(uuid, upstream.iter_content(chunk_size=CHUNK_SIZE))
+            else:
+                upstream.close()
+        except (requests.RequestException, OSError) as e:
+            logger.warning("Uploadcare cache fill failed for %s: %s", uuid, e)
+            path = None
+    return path
+
+
+def cdn_path(uuid, filename, disposition):
+    # /-/inline/no/ inalazimisha download; jina la file linakaa mwisho wa path
+    inline = 'yes' if disposition == 'inline' else 'no'
+    return f"{uuid}/-/inline/{inline}/", quote(filename.replace('/', '_'))
+
+
+def signed_url(uuid, filename, disposition='attachment'):
+    """
+    Short-lived CDN URL for a redirect. Signed with Uploadcare secure delivery
+    when SECURE_DELIVERY is configured, otherwise the plain CDN URL.
+    """
+    config = _config()
+    path, name = cdn_path(uuid, filename, disposition)
+    secure = config['SECURE_DELIVERY']
+    if secure:
+        from pyuploadcare.secure_url import AkamaiSecureUrlBuilderWithAclToken
+        builder = AkamaiSecureUrlBuilderWithAclToken(
+            secure['CDN'], secure['SECRET'], window=config['SIGNED_URL_TTL']
+        )
+        # ACL ya wildcard ili jina la file liweze kufuata path iliyosainiwa
+        token = builder.get_token(path, wildcard=True)
+        return f"https://{secure['CDN']}/{path}{name}?token={token}"
+    return f"{config['CDN_BASE']}/{path}{name}"
+
+
+def serve_file(request, value, filename, disposition='attachment', mode=None):
+    """
+    Response ya file la Uploadcare, kulingana na MODE (au `mode`):
+
+    proxy     bytes from the disk cache or streamed from the CDN by this worker
+    redirect  302 to a short-lived (signed) CDN URL; no upstream call at all
+    accel     X-Accel-Redirect to ACCEL_PREFIX, nginx fetches and streams it
+    sendfile  X-Sendfile with the disk cache path (falls back to proxy when
+              the file is too big to cache)
+
+    Call it only after the view's permission checks. Raises Http404 when the
+    file has no UUID or cannot be fetched.
+    """
+    uuid = file_uuid(value)
+    if not uuid:
+        raise Http404("No file UUID.")
+
+    config = _config()
+    mode = mode or config['MODE']
+    if mode not in MODES:
+        raise ValueError(f"Unknown Uploadcare download mode: {mode}")
+
+    if mode == 'redirect':
+        response = HttpResponseRedirect(signed_url(uuid, filename, disposition))
+        # URL inaisha muda wake; isihifadhiwe popote
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+    # UUID ni ya kudumu, hivyo ETag haihitaji kujua chochote kuhusu bytes zenyewe
+    etag = f'"uc-{uuid}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _finish(not_modified, etag, filename, disposition)
+
+    if mode == 'accel':
+        response = HttpResponse()
+        del response['Content-Type']  # nginx inaweka ya upstream
+        path, name = cdn_path(uuid, filename, disposition)
+        response['X-Accel-Redirect'] = f"{config['ACCEL_PREFIX'].rstrip('/')}/{path}{name}"
+        return _finish(response, etag, filename, disposition)
+
+    meta = resolve(uuid)
+    path = _cached_path(uuid, meta, config)
+
+    response = None
+    if path is not None and mode == 'sendfile':
+        response = HttpResponse(content_type=meta['content_type'])
+        response['X-Sendfile'] = path
+    elif path is not None:
+        try:
+            response = _from_disk(request, path, meta['content_type'])
+        except OSError:
+            response = None
+    if response is None:
+        response = _proxy(request, meta, config)
+    return _finish(response, etag, filename, disposition)
+
+
+def _finish(response, etag, filename, disposition):
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    safe_filename = filename.replace('"', '_')
+    response['Content-Disposition'] = f'{disposition}; filename="{safe_filename}"'
+    patch_cache_control(response, private=True, max_age=3600)
+    return response
@@ -60,7 +60,7 @@ def dashboard(request):
     total_students = Student.objects.count()
     total_teachers = Teacher.objects.count()
     total_classes  = ClassRoom.objects.count()
-    settings_obj   = SchoolSettings.objects.first()
+    settings_obj   = get_school_settings()
 
     fees_collected = FeePayment.objects.aggregate(
         total=Sum('amount_paid')
@@ -107,13 +107,14 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .models import Announcement, SchoolSettings
+from .school_settings import get_school_settings
 from .forms import AnnouncementForm, SchoolSettingsForm
 
 # Announcements Views
 def announcement_list(request):
     """List all announcements"""
     announcements = Announcement.objects.all().order_by('-created_at')
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     
     context = {
@@ -126,8 +127,6 @@ def announcement_list(request):
 
 @login_required
 def announcement_create(request):
-    settings_obj = SchoolSettings.objects.first()
-
     """Create new announcement"""
     if request.method == 'POST':
         form = AnnouncementForm(request.POST)
@@ -148,7 +147,7 @@ def announcement_create(request):
 def announcement_edit(request, pk):
 
     """Edit existing announcement"""
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     announcement = get_object_or_404(Announcement, pk=pk)
     
@@ -172,7 +171,7 @@ def announcement_edit(request, pk):
 
 @login_required
 def announcement_delete(request, pk):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     """Delete announcement"""
     announcement = get_object_or_404(Announcement, pk=pk)
@@ -191,7 +190,7 @@ def announcement_delete(request, pk):
     return render(request, 'dashboard/announcements/delete.html', context)
 
 def announcement_detail(request, pk):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     """View announcement details"""
     announcement = get_object_or_404(Announcement, pk=pk)
@@ -263,7 +262,7 @@ def dashboards(request):
     # Get latest 5 announcements
     latest_announcements = Announcement.objects.all().order_by('-created_at')[:5]
     announcements_count = Announcement.objects.count()
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     
     context = {
         'latest_announcements': latest_announcements,
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 16:25
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicate_results(apps, schema_editor):
+    """Keep the newest Result for each (student, exam, subject) before adding the constraint"""
+    Result = apps.get_model('exams', 'Result')
+    duplicates = (
+        Result.objects.values('student_id', 'exam_id', 'subject_id')
+        .annotate(n=Count('id'), keep=Max('id'))
+        .filter(n__gt=1)
+    )
+    for row in duplicates.iterator():
+        Result.objects.filter(
+            student_id=row['student_id'],
+            exam_id=row['exam_id'],
+            subject_id=row['subject_id'],
+        ).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0001_initial'),
+        ('exams', '0002_assignment_submission'),
+        ('students', '0004_alter_certificate_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_results, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='result',
+            unique_together={('student', 'exam', 'subject')},
+        ),
+    ]
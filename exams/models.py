@@ -6,9 +6,28 @@ from django.utils import timezone  # IMPORT HII! - ndiyo inayokosekana
 
 from students.models import Student
 from pyuploadcare.dj.models import FileField as UploadcareFileField
+from dashboard.models import UploadcareFileMeta
 
 
 
+GRADE_BANDS = (
+    (80, 'A', 'Excellent'),
+    (70, 'B', 'Very Good'),
+    (60, 'C', 'Good'),
+    (50, 'D', 'Fair'),
+    (40, 'E', 'Pass'),
+    (0,  'F', 'Fail'),
+)
+
+
+def grade_for_marks(marks):
+    """(grade, remark) kwa alama au wastani wowote"""
+    for floor, grade, remark in GRADE_BANDS:
+        if marks >= floor:
+            return (grade, remark)
+    return ('F', 'Fail')
+
+
 class Exam(models.Model):
     EXAM_TYPE_CHOICES = (
         ('MIDTERM', 'Midterm'),
@@ -32,14 +51,11 @@ class Result(models.Model):
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     marks = models.PositiveIntegerField()
 
+    class Meta:
+        unique_together = ('student', 'exam', 'subject')  # cell moja tu kwa kila somo
+
     def grade(self):
-        m = self.marks
-        if m >= 80: return ('A', 'Excellent')
-        if m >= 70: return ('B', 'Very Good')
-        if m >= 60: return ('C', 'Good')
-        if m >= 50: return ('D', 'Fair')
-        if m >= 40: return ('E', 'Pass')
-        return ('F', 'Fail')
+        return grade_for_marks(self.marks)
 
     def __str__(self):
         return f"{self.student.full_name} - {self.subject.name} ({self.marks})"
@@ -48,7 +64,7 @@ class Result(models.Model):
 
 # ─── NEW: ASSIGNMENT & SUBMISSION ────────────────────────────────
 
-class Assignment(models.Model):
+class Assignment(UploadcareFileMeta):
     STATUS_CHOICES = (
         ('PUBLISHED', 'Published'),
         ('DRAFT',     'Draft'),
@@ -95,22 +111,10 @@ class Assignment(models.Model):
     def submission_count(self):
         return self.submissions.count()
 
-    def get_file_url(self):
-        if self.file:
-            url = str(self.file.cdn_url)
-            # Ongeza filename mwishoni ili browser ijue ni file gani
-            try:
-                filename = self.file.filename
-                if filename:
-                    url = url.rstrip('/') + '/' + filename
-            except:
-                pass
-            return url
-        return None
 #https://ucarecdn.com/b11eddbe-d832-4a75-a40e-b12e0d7dc089/ID_CARD_CA_ENG_2026_0313.pdf
 #https://1q4ei5xyak.ucarecd.net/b11eddbe-d832-4a75-a40e-b12e0d7dc089/ID_CARD_CA_ENG_2026_0313.pdf
 
-class Submission(models.Model):
+class Submission(UploadcareFileMeta):
     STATUS_CHOICES = (
         ('SUBMITTED', 'Submitted'),
         ('LATE',      'Late Submission'),
@@ -151,15 +155,3 @@ class Submission(models.Model):
     def is_late(self):
         return self.submitted_at > self.assignment.due_date
 
-    def get_file_url(self):
-        if self.file:
-            url = str(self.file.cdn_url)
-            # Ongeza filename mwishoni ili browser ijue ni file gani
-            try:
-                filename = self.file.filename
-                if filename:
-                    url = url.rstrip('/') + '/' + filename
-            except:
-                pass
-            return url
-        return None
@@ -1,3 +1,127 @@
+import datetime
+
 from django.test import TestCase
 
-# Create your tests here.
+from classes.models import ClassRoom, Subject
+from students.models import Student
+from .models import Exam, Result
+from .utils import build_results_matrix, results_matrix_csv, save_marks_grid
+
+
+class BulkMarksEntryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.classroom = ClassRoom.objects.create(name='Form Two', code='F2')
+        cls.subjects = [
+            Subject.objects.create(name=f'Subject {i}', classroom=cls.classroom)
+            for i in range(10)
+        ]
+        cls.students = [
+            Student.objects.create(
+                full_name=f'Candidate {i}',
+                email=f'candidate{i}@example.com',
+                classroom=cls.classroom,
+                registration_number=f'CA/F2/2025/{i:04d}',
+            )
+            for i in range(20)
+        ]
+        cls.exam = Exam.objects.create(
+            name='Midterm', classroom=cls.classroom, date=datetime.date(2025, 6, 1)
+        )
+
+    def full_grid(self, value):
+        return {(st.id, sb.id): str(value) for st in self.students for sb in self.subjects}
+
+    def test_full_grid_is_saved_in_constant_queries(self):
+        # 20 x 10 grid keeps the INSERT inside SQLite's single-batch parameter limit
+        # SAVEPOINT, SELECT existing, INSERT, RELEASE
+        with self.assertNumQueries(4):
+            report = save_marks_grid(self.exam, self.full_grid(55))
+        self.assertEqual(report['created'], 200)
+        self.assertEqual(Result.objects.filter(exam=self.exam).count(), 200)
+
+        grid = self.full_grid(55)
+        grid[(self.students[0].id, self.subjects[0].id)] = '90'
+        # SAVEPOINT, SELECT existing, UPDATE, RELEASE
+        with self.assertNumQueries(4):
+            report = save_marks_grid(self.exam, grid)
+        self.assertEqual((report['created'], report['updated'], report['unchanged']), (0, 1, 199))
+
+    def test_invalid_cells_are_reported_and_skipped(self):
+        student, subject = self.students[0], self.subjects[0]
+        grid = {
+            (student.id, subject.id): '75',
+            (student.id, self.subjects[1].id): 'abc',
+            (student.id, self.subjects[2].id): '101',
+        }
+        report = save_marks_grid(self.exam, grid)
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(
+            [(e['subject_id'], e['value']) for e in report['errors']],
+            [(self.subjects[1].id, 'abc'), (self.subjects[2].id, '101')],
+        )
+        self.assertEqual(Result.objects.get(student=student, subject=subject).marks, 75)
+
+
+class ResultsMatrixTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.classroom = ClassRoom.objects.create(name='Form Three', code='F3')
+        cls.subjects = [
+            Subject.objects.create(name=name, classroom=cls.classroom)
+            for name in ('Maths', 'English', 'Biology')
+        ]
+        cls.students = [
+            Student.objects.create(
+                full_name=f'Learner {i}',
+                email=f'learner{i}@example.com',
+                classroom=cls.classroom,
+                registration_number=f'CA/F3/2025/{i:04d}',
+            )
+            for i in range(5)
+        ]
+        cls.exam = Exam.objects.create(
+            name='Terminal', classroom=cls.classroom, date=datetime.date(2025, 9, 1)
+        )
+        marks = [
+            (90, 85, 80),     # 255
+            (70, 60, 50),     # 180
+            (60, 60, 60),     # 180 - sawa na wa pili
+            (30, None, 20),   # 50, hakufanya English
+            (None, None, None),
+        ]
+        save_marks_grid(cls.exam, {
+            (student.id, subject.id): str(m)
+            for student, row in zip(cls.students, marks)
+            for subject, m in zip(cls.subjects, row) if m is not None
+        })
+
+    def test_matrix_is_built_in_constant_queries(self):
+        # students, subjects, results
+        with self.assertNumQueries(3):
+            matrix = build_results_matrix(self.exam)
+        self.assertEqual(len(matrix['rows']), 5)
+
+    def test_totals_positions_and_grades(self):
+        matrix = build_results_matrix(self.exam)
+        rows = {row['student'].id: row for row in matrix['rows']}
+        first, second, third, partial, absent = (rows[s.id] for s in self.students)
+
+        self.assertEqual((first['total'], first['average'], first['grade']), (255, 85.0, 'A'))
+        self.assertEqual([second['position'], third['position']], [2, 2])
+        self.assertEqual((partial['average'], partial['position'], partial['marks']), (25.0, 4, [30, None, 20]))
+        self.assertEqual((absent['position'], absent['grade']), (None, '-'))
+
+        self.assertEqual(matrix['distribution'], {'A': 1, 'B': 0, 'C': 2, 'D': 0, 'E': 0, 'F': 1})
+        self.assertEqual(matrix['top_total'], 255)
+        self.assertEqual(matrix['results_dict'][self.students[0].id]['Maths'], 90)
+
+    def test_csv_is_ordered_by_position(self):
+        content = results_matrix_csv(build_results_matrix(self.exam)).content.decode()
+        lines = content.strip().splitlines()
+        self.assertEqual(lines[0], 'Position,Reg No,Student,Maths,English,Biology,Total,Average,Grade')
+        self.assertTrue(lines[1].startswith('1,CA/F3/2025/0000,Learner 0,90,85,80,255'))
+        self.assertTrue(lines[4].startswith('4,CA/F3/2025/0003,Learner 3,30,,20,50'))
+        self.assertEqual(len(lines), 7)  # header, 5 students, subject averages
@@ -1,6 +1,142 @@
 #exam/utils.py
+import csv
+from collections import Counter
+
 from reportlab.pdfgen import canvas
+from django.db import transaction
+from django.db.models import Q
 from django.http import HttpResponse
+from django.utils.text import slugify
+
+from parents.snapshot import bump_students
+from students.models import Student
+from .models import GRADE_BANDS, Exam, Result, grade_for_marks
+
+MIN_MARKS = 0
+MAX_MARKS = 100
+
+
+# ─────────────────────────────────────────────────────────────────
+#  RESULTS MATRIX
+# ─────────────────────────────────────────────────────────────────
+
+def build_results_matrix(exam, students=None, subjects=None):
+    """
+    Pivot every Result of an exam into one row per student.
+
+    All marks come from a single query and are pivoted in memory, so the
+    cost does not grow with students x subjects. Each row carries the
+    per-subject marks (in `subjects` order), total, average, the grade of
+    the average and the class position (ties share a position: 1, 2, 2, 4).
+    Students with no marks get no position.
+
+    Returns a dict with 'subjects', 'rows', 'results_dict' (the shape the
+    exam_results template reads), 'distribution', 'subject_averages',
+    'class_average' and 'top_total'.
+    """
+    if students is None:
+        # wanafunzi wa darasa + waliofanya mtihani kisha wakahamishwa darasa
+        students = Student.objects.filter(
+            Q(classroom_id=exam.classroom_id) | Q(result__exam=exam)
+        ).distinct()
+    if subjects is None:
+        subjects = exam.classroom.subject_set.all()
+    students = list(students)
+    subjects = list(subjects)
+
+    marks_by_student = {}
+    for student_id, subject_id, marks in Result.objects.filter(exam=exam).values_list(
+        'student_id', 'subject_id', 'marks'
+    ):
+        marks_by_student.setdefault(student_id, {})[subject_id] = marks
+
+    rows = []
+    subject_totals = Counter()
+    subject_counts = Counter()
+    for student in students:
+        cells = marks_by_student.get(student.id, {})
+        marks = [cells.get(subject.id) for subject in subjects]
+        sat = [m for m in marks if m is not None]
+        total = sum(sat)
+        average = round(total / len(sat), 2) if sat else 0
+        for subject, m in zip(subjects, marks):
+            if m is not None:
+                subject_totals[subject.id] += m
+                subject_counts[subject.id] += 1
+        rows.append({
+            'student': student,
+            'marks': marks,
+            'total': total,
+            'count': len(sat),
+            'average': average,
+            'grade': grade_for_marks(average)[0] if sat else '-',
+            'position': None,
+        })
+
+    # Nafasi darasani: sort moja kwa total, sawa = nafasi sawa
+    ranked = sorted((row for row in rows if row['count']), key=lambda row: -row['total'])
+    for index, row in enumerate(ranked):
+        if index and row['total'] == ranked[index - 1]['total']:
+            row['position'] = ranked[index - 1]['position']
+        else:
+            row['position'] = index + 1
+
+    grades = Counter(row['grade'] for row in ranked)
+    distribution = {grade: grades.get(grade, 0) for _, grade, _ in GRADE_BANDS}
+
+    results_dict = {}
+    for row in rows:
+        cell = {subject.name: m for subject, m in zip(subjects, row['marks'])}
+        cell.update({
+            'total': row['total'], 'average': row['average'],
+            'grade': row['grade'], 'position': row['position'] or '-',
+        })
+        results_dict[row['student'].id] = cell
+
+    return {
+        'exam': exam,
+        'subjects': subjects,
+        'rows': rows,
+        'results_dict': results_dict,
+        'distribution': distribution,
+        'subject_averages': {
+            subject.id: round(subject_totals[subject.id] / subject_counts[subject.id], 2)
+            for subject in subjects if subject_counts[subject.id]
+        },
+        'class_average': round(sum(r['average'] for r in ranked) / len(ranked), 2) if ranked else 0,
+        'top_total': ranked[0]['total'] if ranked else 0,
+    }
+
+
+def results_matrix_csv(matrix):
+    """Download the results matrix as CSV, ordered by position"""
+    exam = matrix['exam']
+    subjects = matrix['subjects']
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{slugify(exam.name) or "results"}_results.csv"'
+
+    writer = csv.writer(response)
+    writer.writerow(
+        ['Position', 'Reg No', 'Student']
+        + [subject.name for subject in subjects]
+        + ['Total', 'Average', 'Grade']
+    )
+    rows = sorted(matrix['rows'], key=lambda row: (row['position'] is None, row['position'] or 0))
+    for row in rows:
+        student = row['student']
+        writer.writerow(
+            [row['position'] or '', student.registration_number or '', student.full_name]
+            + ['' if m is None else m for m in row['marks']]
+            + [row['total'], row['average'], row['grade']]
+        )
+    writer.writerow(
+        ['', '', 'Subject average']
+        + [matrix['subject_averages'].get(subject.id, '') for subject in subjects]
+        + ['', matrix['class_average'], '']
+    )
+    return response
+
+
 def report_card_pdf(student):
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{student.full_name}_report.pdf"'
@@ -10,19 +146,125 @@ def report_card_pdf(student):
     p.drawString(100, 750, f"Reg No: {student.registration_number}")
 
     y = 720
-    results = student.result_set.select_related('subject', 'exam').all()
-    total_marks = 0
-    subjects_count = results.count()
-    for r in results:
-        grade, remark = r.grade()
-        p.drawString(100, y, f"{r.exam.name} - {r.subject.name}: {r.marks} - {grade} ({remark})")
-        total_marks += r.marks
-        y -= 20
-
-    if subjects_count > 0:
-        average = total_marks / subjects_count
-        p.drawString(100, y-20, f"Average Marks: {average:.2f}")
+    exams = Exam.objects.filter(result__student=student).select_related('classroom').distinct().order_by('date')
+    for exam in exams:
+        matrix = build_results_matrix(exam)
+        row = next((r for r in matrix['rows'] if r['student'].id == student.id), None)
+        if row is None or not row['count']:
+            continue
+        for subject, marks in zip(matrix['subjects'], row['marks']):
+            if marks is None:
+                continue
+            if y < 60:
+                p.showPage()
+                y = 800
+            grade, remark = grade_for_marks(marks)
+            p.drawString(100, y, f"{exam.name} - {subject.name}: {marks} - {grade} ({remark})")
+            y -= 20
+        ranked = sum(1 for r in matrix['rows'] if r['position'])
+        p.drawString(100, y, f"Total: {row['total']}  Average: {row['average']:.2f} ({row['grade']})"
+                             f"  Position: {row['position']} of {ranked}")
+        y -= 30
 
     p.showPage()
     p.save()
     return response
+
+
+# ─────────────────────────────────────────────────────────────────
+#  BULK MARKS ENTRY
+# ─────────────────────────────────────────────────────────────────
+
+def marks_grid_from_post(post, student_ids, subject_ids, key='marks_{student}_{subject}'):
+    """
+    Collect raw marks from a submitted form into {(student_id, subject_id): value}.
+    Empty cells are skipped.
+    """
+    grid = {}
+    for student_id in student_ids:
+        for subject_id in subject_ids:
+            raw = post.get(key.format(student=student_id, subject=subject_id), '')
+            raw = str(raw).strip()
+            if raw:
+                grid[(student_id, subject_id)] = raw
+    return grid
+
+
+def validate_marks_grid(grid):
+    """
+    Validate every cell of a marks grid.
+    Returns (clean, errors): clean maps (student_id, subject_id) -> int,
+    errors is a list of {'student_id', 'subject_id', 'value', 'error'}.
+    """
+    clean, errors = {}, []
+    for (student_id, subject_id), raw in grid.items():
+        try:
+            marks = int(raw)
+        except (TypeError, ValueError):
+            errors.append({'student_id': student_id, 'subject_id': subject_id,
+                           'value': raw, 'error': 'Not a whole number'})
+            continue
+        if not MIN_MARKS <= marks <= MAX_MARKS:
+            errors.append({'student_id': student_id, 'subject_id': subject_id,
+                           'value': raw, 'error': f'Must be between {MIN_MARKS} and {MAX_MARKS}'})
+            continue
+        clean[(student_id, subject_id)] = marks
+    return clean, errors
+
+
+def save_marks_grid(exam, grid):
+    """
+    Validate and save a whole marks grid for one exam.
+
+    Existing Result rows are fetched in one query and diffed; only new or
+    changed cells are written (one bulk_create + one bulk_update) inside a
+    single transaction. Invalid cells are skipped and reported.
+
+    Returns {'created', 'updated', 'unchanged', 'errors'}.
+    """
+    clean, errors = validate_marks_grid(grid)
+    report = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': errors}
+    if not clean:
+        return report
+
+    student_ids = {student_id for student_id, _ in clean}
+    subject_ids = {subject_id for _, subject_id in clean}
+
+    with transaction.atomic():
+        existing = {
+            (r.student_id, r.subject_id): r
+            for r in Result.objects.select_for_update().filter(
+                exam=exam,
+                student_id__in=student_ids,
+                subject_id__in=subject_ids,
+            )
+        }
+
+        to_create, to_update = [], []
+        for (student_id, subject_id), marks in clean.items():
+            result = existing.get((student_id, subject_id))
+            if result is None:
+                to_create.append(Result(
+                    student_id=student_id, exam=exam, subject_id=subject_id, marks=marks
+                ))
+            elif result.marks != marks:
+                result.marks = marks
+                to_update.append(result)
+            else:
+                report['unchanged'] += 1
+
+        if to_create:
+            Result.objects.bulk_create(
+                to_create,
+                update_conflicts=True,
+                unique_fields=['student', 'exam', 'subject'],
+                update_fields=['marks'],
+            )
+        if to_update:
+            Result.objects.bulk_update(to_update, ['marks'])
+        # bulk_create/bulk_update hazitumi signals
+        bump_students(r.student_id for r in to_create + to_update)
+
+    report['created'] = len(to_create)
+    report['updated'] = len(to_update)
+    return report
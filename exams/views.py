@@ -1,96 +1,30 @@
 # exams/views.py
 
-import requests
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.http import Http404, StreamingHttpResponse
-from django.conf import settings as django_settings
+from django.http import Http404
 
 from .models import Exam, Result, Assignment, Submission
 from students.models import Student
 from classes.models import ClassRoom, Subject
-from dashboard.models import SchoolSettings
-from .utils import report_card_pdf
-
-
-# ─────────────────────────────────────────────────────────────────
-#  HELPER — Uploadcare proxy download
-# ─────────────────────────────────────────────────────────────────
-
-def _proxy_uploadcare_file(uc_file_obj):
-    """
-    Pakia file kutoka Uploadcare kwa kutumia keys za settings.py.
-    Inajaribu njia mbili — CDN na REST API.
-    """
-    uploadcare_config = getattr(django_settings, 'UPLOADCARE', {})
-    pub_key    = uploadcare_config.get('pub_key', '')
-    secret_key = uploadcare_config.get('secret', '')
-
-    try:
-        uuid = str(uc_file_obj.uuid).strip().strip('/')
-    except Exception:
-        raise Http404("Invalid file reference.")
-
-    urls_to_try = [f"https://ucarecdn.com/{uuid}/"]
-
-    try:
-        fname = uc_file_obj.filename
-        if fname:
-            urls_to_try.insert(0, f"https://ucarecdn.com/{uuid}/{fname}")
-    except Exception:
-        pass
-
-    # Jaribu CDN URLs
-    for url in urls_to_try:
-        try:
-            resp = requests.get(
-                url,
-                auth=(pub_key, secret_key),
-                timeout=30,
-                stream=True
-            )
-            if resp.status_code == 200:
-                content_type = resp.headers.get('Content-Type', 'application/octet-stream')
-                return resp, content_type
-        except requests.RequestException:
-            continue
-
-    # Last resort — REST API
-    try:
-        api_resp = requests.get(
-            f"https://api.uploadcare.com/files/{uuid}/",
-            headers={
-                'Authorization': f'Uploadcare.Simple {pub_key}:{secret_key}',
-                'Accept': 'application/vnd.uploadcare-v0.7+json',
-            },
-            timeout=15
+from dashboard.school_settings import get_school_settings
+from dashboard.uploadcare import serve_file
+from .utils import (
+    report_card_pdf, marks_grid_from_post, save_marks_grid,
+    build_results_matrix, results_matrix_csv,
+)
+
+
+def _report_marks_errors(request, report):
+    """Onyesha cells zilizokataliwa kwenye marks grid."""
+    for err in report['errors']:
+        messages.warning(
+            request,
+            f"Student #{err['student_id']}, subject #{err['subject_id']}: "
+            f"'{err['value']}' — {err['error']}"
         )
-        if api_resp.status_code == 200:
-            file_info  = api_resp.json()
-            direct_url = file_info.get('original_file_url') or file_info.get('url')
-            if direct_url:
-                direct_resp = requests.get(direct_url, timeout=30, stream=True)
-                if direct_resp.status_code == 200:
-                    content_type = direct_resp.headers.get('Content-Type', 'application/octet-stream')
-                    return direct_resp, content_type
-    except requests.RequestException:
-        pass
-
-    raise Http404("File not found on Uploadcare.")
-
-
-def _make_streaming_response(uc_file_obj, filename):
-    """Tengeneza StreamingHttpResponse kutoka Uploadcare file object."""
-    resp, content_type = _proxy_uploadcare_file(uc_file_obj)
-    django_resp = StreamingHttpResponse(
-        resp.iter_content(chunk_size=8192),
-        content_type=content_type
-    )
-    safe_filename = filename.replace('"', '_')
-    django_resp['Content-Disposition'] = f'inline; filename="{safe_filename}"'
-    return django_resp
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -98,7 +32,7 @@ def _make_streaming_response(uc_file_obj, filename):
 # ─────────────────────────────────────────────────────────────────
 
 def exam_list(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
     today        = timezone.now().date()
     next_week    = today + timezone.timedelta(days=7)
 
@@ -126,7 +60,7 @@ def exam_list(request):
 
 @login_required
 def create_exam(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     if request.method == 'POST':
         try:
@@ -211,22 +145,24 @@ def create_exam(request):
 
 
 def enter_marks(request, exam_id):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
     exam     = get_object_or_404(Exam, id=exam_id)
     students = Student.objects.filter(classroom=exam.classroom)
     subjects = Subject.objects.filter(classroom=exam.classroom)
 
     if request.method == 'POST':
-        for student in students:
-            for subject in subjects:
-                key   = f"marks_{student.id}_{subject.id}"
-                marks = request.POST.get(key)
-                if marks not in [None, '']:
-                    Result.objects.update_or_create(
-                        student=student, exam=exam, subject=subject,
-                        defaults={'marks': int(marks)}
-                    )
-        messages.success(request, "Marks saved successfully")
+        grid = marks_grid_from_post(
+            request.POST,
+            students.values_list('id', flat=True),
+            subjects.values_list('id', flat=True),
+        )
+        report = save_marks_grid(exam, grid)
+        _report_marks_errors(request, report)
+        messages.success(
+            request,
+            f"Marks saved successfully — {report['created']} new, "
+            f"{report['updated']} updated, {report['unchanged']} unchanged"
+        )
         return redirect('exams:exam_list')
 
     results    = Result.objects.filter(exam=exam)
@@ -240,39 +176,26 @@ def enter_marks(request, exam_id):
 
 
 def student_report_card(request, student_id):
-    settings_obj = SchoolSettings.objects.first()
     student = get_object_or_404(Student, id=student_id)
     return report_card_pdf(student)
 
 
 def exam_results(request, exam_id):
-    settings_obj = SchoolSettings.objects.first()
-    exam     = get_object_or_404(Exam, id=exam_id)
-    students = Student.objects.filter(classroom=exam.classroom)
-    subjects = exam.classroom.subject_set.all()
-
-    results_dict = {}
-    for student in students:
-        student_results = {}
-        total = count = 0
-        result = None
-        for subject in subjects:
-            result = Result.objects.filter(
-                student=student, exam=exam, subject=subject
-            ).first()
-            marks = result.marks if result else None
-            student_results[subject.name] = marks
-            if marks is not None:
-                total += marks
-                count += 1
-        average = round(total / count, 2) if count else 0
-        grade   = result.grade()[0] if count else '-'
-        student_results.update({'total': total, 'average': average, 'grade': grade})
-        results_dict[student.id] = student_results
+    settings_obj = get_school_settings()
+    exam   = get_object_or_404(Exam, id=exam_id)
+    matrix = build_results_matrix(exam)
+
+    if request.GET.get('format') == 'csv':
+        return results_matrix_csv(matrix)
 
     return render(request, 'exams/exam_results.html', {
-        'exam': exam, 'students': students,
-        'subjects': subjects, 'results_dict': results_dict,
+        'exam': exam,
+        'students': [row['student'] for row in matrix['rows']],
+        'subjects': matrix['subjects'],
+        'results_dict': matrix['results_dict'],
+        'grade_distribution': matrix['distribution'],
+        'class_average': matrix['class_average'],
+        'top_total': matrix['top_total'],
         'school_settings': settings_obj,
     })
 
@@ -283,7 +206,7 @@ def exam_results(request, exam_id):
 
 @login_required
 def assignment_list(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
     assignments  = Assignment.objects.select_related('classroom', 'subject').all()
 
     class_filter = request.GET.get('classroom', '')
@@ -300,7 +223,7 @@ def assignment_list(request):
 
 @login_required
 def create_assignment(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     if request.method == 'POST':
         title        = request.POST.get('title', '').strip()
@@ -341,7 +264,7 @@ def create_assignment(request):
 
 @login_required
 def assignment_submissions(request, assignment_id):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
     assignment   = get_object_or_404(Assignment, id=assignment_id)
     submissions  = assignment.submissions.select_related('student').order_by('submitted_at')
 
@@ -376,9 +299,8 @@ def assignment_submissions(request, assignment_id):
 
 @login_required
 def my_assignments(request):
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
+    student = request.student
+    if not student:
         messages.error(request, "Student profile not found.")
         return redirect('dashboard')
 
@@ -402,15 +324,14 @@ def my_assignments(request):
         'open_assignments':   assignments.filter(due_date__gte=now),
         'closed_assignments': assignments.filter(due_date__lt=now),
         'submitted_ids':      submitted_ids,
-        'school_settings':    SchoolSettings.objects.first(),
+        'school_settings':    get_school_settings(),
     })
 
 
 @login_required
 def submit_assignment(request, assignment_id):
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
+    student = request.student
+    if not student:
         raise Http404
 
     assignment = get_object_or_404(
@@ -452,7 +373,7 @@ def submit_assignment(request, assignment_id):
     return render(request, 'exams/submit_assignment.html', {
         'assignment':      assignment,
         'submission':      existing,
-        'school_settings': SchoolSettings.objects.first(),
+        'school_settings': get_school_settings(),
         'student':         student,
     })
 
@@ -464,9 +385,8 @@ def submit_assignment(request, assignment_id):
 @login_required
 def download_assignment_file(request, assignment_id):
     """Student download assignment file kupitia proxy."""
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
+    student = request.student
+    if not student:
         raise Http404
 
     assignment = get_object_or_404(
@@ -482,7 +402,7 @@ def download_assignment_file(request, assignment_id):
 
     try:
         filename = f"Assignment_{assignment.title.replace(' ', '_')}.pdf"
-        return _make_streaming_response(assignment.file, filename)
+        return serve_file(request, assignment.file, filename, disposition='inline')
     except Http404:
         messages.error(request, "File could not be retrieved. Please contact your teacher.")
         return redirect('exams:my_assignments')
@@ -499,7 +419,7 @@ def download_submission_file(request, submission_id):
     try:
         name     = submission.student.full_name.replace(' ', '_')
         filename = f"Submission_{name}.pdf"
-        return _make_streaming_response(submission.file, filename)
+        return serve_file(request, submission.file, filename, disposition='inline')
     except Http404:
         messages.error(request, "Submission file could not be retrieved.")
         return redirect('exams:assignment_submissions', assignment_id=submission.assignment.id)
\ No newline at end of file
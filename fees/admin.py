@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FeeStructure, Payment, FeePayment
+from .models import FeeStructure, Payment, FeePayment, StudentFeeLedger
 
 @admin.register(FeeStructure)
 class FeeStructureAdmin(admin.ModelAdmin):
@@ -22,3 +22,13 @@ class FeePaymentAdmin(admin.ModelAdmin):
     search_fields = ('student__first_name', 'student__last_name', 'reference')
     list_filter = ('date_paid',)
     ordering = ('-date_paid',)
+
+
+@admin.register(StudentFeeLedger)
+class StudentFeeLedgerAdmin(admin.ModelAdmin):
+    list_display = ('student', 'total_fee', 'total_paid', 'balance', 'status', 'last_payment_date', 'updated_at')
+    search_fields = ('student__full_name', 'student__registration_number')
+    list_filter = ('status',)
+    ordering = ('-balance',)
+    list_select_related = ('student',)
+    readonly_fields = ('student', 'total_fee', 'total_paid', 'balance', 'last_payment_date', 'status', 'updated_at')
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class FeesConfig(AppConfig):
     name = 'fees'
+
+    def ready(self):
+        import fees.signals
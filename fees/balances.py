@@ -0,0 +1,108 @@
+# fees/balances.py
+"""
+Set-based fee balance engine.
+
+Annotates any Student queryset with total_fee, total_paid, balance and
+fee_status using correlated subqueries, so a whole class (or the whole
+school) is resolved in a single query instead of one FeeStructure lookup
+plus one Payment aggregate per student.
+"""
+from django.db.models import (
+    Case, CharField, Exists, F, IntegerField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+
+from students.models import Student
+from .models import FeeStructure, Payment
+
+
+FEE_STATUS_PAID = 'PAID'
+FEE_STATUS_PARTIAL = 'PARTIAL'
+FEE_STATUS_UNPAID = 'UNPAID'
+
+
+def _class_fee_subquery():
+    return Subquery(
+        FeeStructure.objects.filter(classroom=OuterRef('classroom'))
+        .values('total_fee')[:1],
+        output_field=IntegerField(),
+    )
+
+
+def _total_paid_subquery():
+    return Subquery(
+        Payment.objects.filter(student=OuterRef('pk'))
+        .order_by()
+        .values('student')
+        .annotate(total=Sum('amount_paid'))
+        .values('total')[:1],
+        output_field=IntegerField(),
+    )
+
+
+def with_balances(queryset=None):
+    """
+    Annotate a Student queryset with:
+        has_fee_structure, total_fee, total_paid, balance, fee_status
+
+    Students without a FeeStructure get total_fee = 0.
+    `fee_status` is used (not `status`) because Student already has a status field.
+    """
+    if queryset is None:
+        queryset = Student.objects.all()
+
+    return queryset.annotate(
+        has_fee_structure=Exists(
+            FeeStructure.objects.filter(classroom=OuterRef('classroom'))
+        ),
+        total_fee=Coalesce(_class_fee_subquery(), Value(0), output_field=IntegerField()),
+        total_paid=Coalesce(_total_paid_subquery(), Value(0), output_field=IntegerField()),
+    ).annotate(
+        balance=F('total_fee') - F('total_paid'),
+        fee_status=Case(
+            When(balance__lte=0, then=Value(FEE_STATUS_PAID)),
+            When(total_paid__gt=0, then=Value(FEE_STATUS_PARTIAL)),
+            default=Value(FEE_STATUS_UNPAID),
+            output_field=CharField(),
+        ),
+    )
+
+
+def due_students(queryset=None):
+    """Students with a fee structure and an outstanding balance (one query)."""
+    if queryset is None:
+        queryset = Student.objects.all()
+    return with_balances(
+        queryset.filter(classroom__isnull=False).select_related('classroom')
+    ).filter(has_fee_structure=True, balance__gt=0)
+
+
+def balance_summary(queryset):
+    """List of summary dicts (one query) in the shape the fee views already use."""
+    return [
+        {
+            'student': student,
+            'total_fee': student.total_fee,
+            'total_paid': student.total_paid,
+            'balance': student.balance,
+            'status': student.fee_status,
+        }
+        for student in with_balances(queryset)
+    ]
+
+
+def student_balance(student):
+    """Balance summary for a single student, computed in one query."""
+    row = with_balances(Student.objects.filter(pk=student.pk)).values(
+        'has_fee_structure', 'total_fee', 'total_paid', 'balance', 'fee_status'
+    ).first()
+    if row is None:
+        return {
+            'has_fee_structure': False,
+            'total_fee': 0,
+            'total_paid': 0,
+            'balance': 0,
+            'status': FEE_STATUS_UNPAID,
+        }
+    row['status'] = row.pop('fee_status')
+    return row
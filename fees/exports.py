@@ -0,0 +1,237 @@
+# fees/exports.py
+"""
+Streaming CSV / XLSX export of the financial report.
+
+Rows are produced lazily: the per-class summaries come first as a header
+section, then every student is read with .iterator(chunk_size=...) and its
+balance taken from the fee ledger, so memory stays flat however many
+students and payments there are.
+"""
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.db.models import Count, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from classes.models import ClassRoom
+from students.models import Student
+from .models import FeeStructure, StudentFeeLedger
+
+
+EXPORT_CHUNK_SIZE = 1000
+
+CLASS_HEADER = ['CLASS', 'STUDENTS', 'FEE EACH', 'EXPECTED', 'PAID', 'BALANCE', 'RATE %']
+STUDENT_HEADER = ['#', 'STUDENT', 'CLASS', 'REG NO', 'FEE', 'PAID', 'BALANCE', 'STATUS']
+
+
+def build_class_summaries(classrooms):
+    """
+    Per-class expected / paid / balance in three aggregate queries.
+    Returns (class_summaries, totals) where totals has grand_expected,
+    grand_paid, grand_balance and grand_rate.
+    """
+    fee_map = dict(FeeStructure.objects.values_list('classroom_id', 'total_fee'))
+    students_count_map = dict(
+        Student.objects.values('classroom_id')
+        .annotate(n=Count('id'))
+        .values_list('classroom_id', 'n')
+    )
+    paid_class_map = dict(
+        StudentFeeLedger.objects.values('student__classroom_id')
+        .annotate(total=Sum('total_paid'))
+        .values_list('student__classroom_id', 'total')
+    )
+
+    class_summaries = []
+    grand_expected = grand_paid = grand_balance = 0
+
+    for cls in classrooms:
+        fee_each   = fee_map.get(cls.id, 0)
+        n_students = students_count_map.get(cls.id, 0)
+        expected   = fee_each * n_students
+        paid       = paid_class_map.get(cls.id, 0)
+        balance    = expected - paid
+        pct        = round(paid / expected * 100, 1) if expected > 0 else 0
+
+        grand_expected += expected
+        grand_paid     += paid
+        grand_balance  += balance
+
+        class_summaries.append({
+            'classroom':  cls,
+            'fee_each':   fee_each,
+            'n_students': n_students,
+            'expected':   expected,
+            'paid':       paid,
+            'balance':    balance,
+            'pct':        pct,
+        })
+
+    totals = {
+        'grand_expected': grand_expected,
+        'grand_paid':     grand_paid,
+        'grand_balance':  grand_balance,
+        'grand_rate':     round(grand_paid / grand_expected * 100, 1) if grand_expected > 0 else 0,
+    }
+    return class_summaries, totals
+
+
+def financial_report_rows(class_filter=''):
+    """Generator of report rows: class summary section, then one row per student."""
+    classrooms = ClassRoom.objects.all().order_by('name')
+    students = Student.objects.filter(classroom__isnull=False)
+    if class_filter:
+        classrooms = classrooms.filter(id=class_filter)
+        students = students.filter(classroom__id=class_filter)
+
+    class_summaries, totals = build_class_summaries(classrooms)
+
+    yield ['CLASS SUMMARY']
+    yield CLASS_HEADER
+    for row in class_summaries:
+        yield [row['classroom'].name, row['n_students'], row['fee_each'],
+               row['expected'], row['paid'], row['balance'], row['pct']]
+    yield ['TOTAL', '', '', totals['grand_expected'], totals['grand_paid'],
+           totals['grand_balance'], totals['grand_rate']]
+    yield []
+
+    yield ['STUDENTS']
+    yield STUDENT_HEADER
+    rows = (
+        students.order_by('classroom__name', 'full_name')
+        .values_list(
+            'full_name', 'classroom__name', 'registration_number',
+            'fee_ledger__total_fee', 'fee_ledger__total_paid',
+            'fee_ledger__balance', 'fee_ledger__status',
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for i, (name, class_name, reg_no, fee, paid, balance, status) in enumerate(rows, 1):
+        yield [i, name, class_name, reg_no, fee or 0, paid or 0, balance or 0, status or 'UNPAID']
+
+
+# ── CSV ──────────────────────────────────────────────────────────
+
+class _Echo:
+    """File-like object that returns what is written instead of buffering it."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, filename):
+    writer = csv.writer(_Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ── XLSX ─────────────────────────────────────────────────────────
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Financial Report" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+class _ChunkBuffer:
+    """Unseekable sink for zipfile; the generator drains it after every write."""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_chunks(rows, rows_per_flush=500):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            zf.writestr(name, content)
+        yield buffer.drain()
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            for i, row in enumerate(rows, 1):
+                cells = ''.join(_xlsx_cell(value) for value in row)
+                sheet.write(f'<row>{cells}</row>'.encode('utf-8'))
+                if i % rows_per_flush == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def stream_xlsx(rows, filename):
+    response = StreamingHttpResponse(
+        _xlsx_chunks(rows),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+EXPORT_FORMATS = {
+    'csv': stream_csv,
+    'xlsx': stream_xlsx,
+}
+
+
+def stream_financial_report(export_format, class_filter=''):
+    scope = f'class_{class_filter}' if class_filter else 'all'
+    filename = f'Financial_Report_{scope}_{timezone.now().strftime("%Y%m%d")}.{export_format}'
+    return EXPORT_FORMATS[export_format](financial_report_rows(class_filter), filename)
@@ -0,0 +1,112 @@
+# fees/ledger.py
+"""
+Maintenance of the StudentFeeLedger table.
+
+Each refresh recomputes the affected students with the set-based balance
+engine (one query) and writes them back with a single upsert, so a payment
+write touches only that student's ledger row.
+"""
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+
+from students.models import Student
+from .balances import with_balances
+from .models import Payment, StudentFeeLedger
+
+
+LEDGER_FIELDS = ['total_fee', 'total_paid', 'balance', 'last_payment_date', 'status', 'updated_at']
+
+
+def _last_payment_subquery():
+    return Subquery(
+        Payment.objects.filter(student=OuterRef('pk'))
+        .order_by()
+        .values('student')
+        .annotate(last=Max('date'))
+        .values('last')[:1]
+    )
+
+
+def _ledger_rows(students_qs):
+    rows = with_balances(students_qs).annotate(
+        last_payment_date=_last_payment_subquery()
+    ).values_list(
+        'pk', 'total_fee', 'total_paid', 'balance', 'last_payment_date', 'fee_status'
+    )
+    return [
+        StudentFeeLedger(
+            student_id=pk,
+            total_fee=total_fee,
+            total_paid=total_paid,
+            balance=balance,
+            last_payment_date=last_payment_date,
+            status=status,
+        )
+        for pk, total_fee, total_paid, balance, last_payment_date, status in rows
+    ]
+
+
+def _upsert(ledgers):
+    if not ledgers:
+        return 0
+    StudentFeeLedger.objects.bulk_create(
+        ledgers,
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=LEDGER_FIELDS,
+    )
+    return len(ledgers)
+
+
+def refresh_students(student_ids):
+    """Recompute ledger rows for the given student ids. Returns rows written."""
+    student_ids = {pk for pk in student_ids if pk}
+    if not student_ids:
+        return 0
+    with transaction.atomic():
+        return _upsert(_ledger_rows(Student.objects.filter(pk__in=student_ids)))
+
+
+def refresh_classroom(classroom_id):
+    """Recompute every ledger row in a classroom (e.g. after a FeeStructure change)."""
+    if not classroom_id:
+        return 0
+    with transaction.atomic():
+        return _upsert(_ledger_rows(Student.objects.filter(classroom_id=classroom_id)))
+
+
+def rebuild(batch_size=500, queryset=None):
+    """
+    Recompute the ledger for every student, batch_size students at a time.
+    Yields the running total so callers can report progress.
+    """
+    if queryset is None:
+        queryset = Student.objects.all()
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    done = 0
+    for start in range(0, len(ids), batch_size):
+        done += refresh_students(ids[start:start + batch_size])
+        yield done
+
+
+def ensure_ledgers(queryset):
+    """Create ledger rows for any student in `queryset` that does not have one yet."""
+    missing = queryset.filter(fee_ledger__isnull=True).values_list('pk', flat=True)
+    return refresh_students(list(missing))
+
+
+def computed_ledgers(student_ids):
+    """
+    {student_id: unsaved StudentFeeLedger} computed on the fly, for reads
+    that find no row: nothing is written (`rebuild_fee_ledger --missing-only`
+    fills the table).
+    """
+    return {row.student_id: row for row in _ledger_rows(Student.objects.filter(pk__in=student_ids))}
+
+
+def get_ledger(student):
+    """Ledger row for one student; computed without writing when it is missing."""
+    try:
+        return StudentFeeLedger.objects.get(student=student)
+    except StudentFeeLedger.DoesNotExist:
+        return computed_ledgers([student.pk])[student.pk]
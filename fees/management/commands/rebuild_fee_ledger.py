@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from students.models import Student
+from fees import ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the StudentFeeLedger table from payments and fee structures'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of students recomputed per query (default 500)'
+        )
+        parser.add_argument(
+            '--classroom',
+            type=int,
+            help='Only rebuild students in this classroom id'
+        )
+        parser.add_argument(
+            '--missing-only',
+            action='store_true',
+            help='Only create ledger rows for students that have none'
+        )
+
+    def handle(self, *args, **options):
+        students = Student.objects.all()
+        if options['classroom']:
+            students = students.filter(classroom_id=options['classroom'])
+
+        if options['missing_only']:
+            created = ledger.ensure_ledgers(students)
+            self.stdout.write(self.style.SUCCESS(f"✅ Created {created} missing ledger rows"))
+            return
+
+        total = students.count()
+        self.stdout.write(f"\n🔍 Rebuilding fee ledger for {total} students...\n")
+
+        done = 0
+        for done in ledger.rebuild(batch_size=options['batch_size'], queryset=students):
+            self.stdout.write(f"  {done}/{total}")
+
+        self.stdout.write(self.style.SUCCESS(f"\n✅ Fee ledger rebuilt: {done} students"))
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 16:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0001_initial'),
+        ('students', '0004_alter_certificate_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentFeeLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_fee', models.PositiveIntegerField(default=0)),
+                ('total_paid', models.PositiveIntegerField(default=0)),
+                ('balance', models.IntegerField(default=0)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('PAID', 'Paid'), ('PARTIAL', 'Partial'), ('UNPAID', 'Unpaid')], default='UNPAID', max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fee_ledger', to='students.student')),
+            ],
+            options={
+                'verbose_name': 'Student Fee Ledger',
+                'verbose_name_plural': 'Student Fee Ledgers',
+                'indexes': [models.Index(fields=['status'], name='fees_studen_status_cfa124_idx'), models.Index(fields=['balance'], name='fees_studen_balance_06b262_idx')],
+            },
+        ),
+    ]
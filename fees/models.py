@@ -38,15 +38,7 @@ class Payment(models.Model):
     @property
     def student_balance(self):
         """Calculate remaining balance for this student"""
-        total_paid = Payment.objects.filter(
-            student=self.student
-        ).aggregate(total=models.Sum('amount_paid'))['total'] or 0
-        
-        try:
-            fee_structure = FeeStructure.objects.get(classroom=self.student.classroom)
-            return fee_structure.total_fee - total_paid
-        except FeeStructure.DoesNotExist:
-            return 0
+        return Payment.get_student_balance(self.student)
 
     @staticmethod
     def get_student_payment_summary(student):
@@ -78,15 +70,12 @@ class Payment(models.Model):
     @staticmethod
     def get_student_balance(student):
         """Get student's fee balance"""
-        total_paid = Payment.objects.filter(student=student).aggregate(
-            models.Sum('amount_paid')
-        )['amount_paid__sum'] or 0
+        from .balances import student_balance  # balances imports this module
 
-        try:
-            fee = FeeStructure.objects.get(classroom=student.classroom).total_fee
-            return fee - total_paid
-        except FeeStructure.DoesNotExist:
+        summary = student_balance(student)
+        if not summary['has_fee_structure']:
             return 0
+        return summary['balance']
 
 
 class FeePayment(models.Model):
@@ -103,4 +92,39 @@ class FeePayment(models.Model):
         structure = FeeStructure.objects.filter(
             classroom=self.student.classroom
         ).first()
-        return structure.total_fee if structure else 0
\ No newline at end of file
+        return structure.total_fee if structure else 0
+
+class StudentFeeLedger(models.Model):
+    """
+    Denormalized per-student fee balance.
+    Maintained by fees.signals whenever a Payment, FeeStructure or the
+    student's classroom changes; `rebuild_fee_ledger` reconciles drift.
+    """
+    STATUS_CHOICES = (
+        ('PAID', 'Paid'),
+        ('PARTIAL', 'Partial'),
+        ('UNPAID', 'Unpaid'),
+    )
+
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        related_name='fee_ledger'
+    )
+    total_fee = models.PositiveIntegerField(default=0)
+    total_paid = models.PositiveIntegerField(default=0)
+    balance = models.IntegerField(default=0)
+    last_payment_date = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='UNPAID')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Student Fee Ledger"
+        verbose_name_plural = "Student Fee Ledgers"
+        indexes = [
+            models.Index(fields=['status']),
+            models.Index(fields=['balance']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.full_name} - {self.balance}"
@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from classes.models import ClassRoom
+from students.models import Student
+from .models import FeeStructure, Payment
+from . import ledger
+
+
+@receiver(pre_save, sender=Payment)
+def remember_previous_payment_student(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'student' not in update_fields:
+        return
+    if instance.pk:
+        instance._previous_student_id = (
+            Payment.objects.filter(pk=instance.pk)
+            .values_list('student_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Payment)
+def update_ledger_on_payment_save(sender, instance, **kwargs):
+    """Recompute the student's ledger row inside the same transaction as the payment"""
+    # Malipo yakihamishiwa mwanafunzi mwingine, wa zamani naye abadilike
+    ledger.refresh_students([instance.student_id, getattr(instance, '_previous_student_id', None)])
+
+
+@receiver(post_delete, sender=Payment)
+def update_ledger_on_payment_delete(sender, instance, **kwargs):
+    # Deferred to commit: when the student itself is being deleted the
+    # cascade removes payments first, and refreshing right away would
+    # re-insert a ledger row for a student that is about to disappear.
+    student_id = instance.student_id
+    transaction.on_commit(lambda: ledger.refresh_students([student_id]))
+
+
+@receiver(pre_save, sender=FeeStructure)
+def remember_previous_fee_classroom(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'classroom' not in update_fields:
+        return
+    if instance.pk:
+        instance._previous_classroom_id = (
+            FeeStructure.objects.filter(pk=instance.pk)
+            .values_list('classroom_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=FeeStructure)
+def update_ledger_on_fee_structure_save(sender, instance, **kwargs):
+    ledger.refresh_classroom(instance.classroom_id)
+    previous = getattr(instance, '_previous_classroom_id', None)
+    if previous != instance.classroom_id:
+        ledger.refresh_classroom(previous)
+
+
+@receiver(post_delete, sender=FeeStructure)
+def update_ledger_on_fee_structure_delete(sender, instance, **kwargs):
+    classroom_id = instance.classroom_id
+    transaction.on_commit(lambda: ledger.refresh_classroom(classroom_id))
+
+
+@receiver(pre_save, sender=Student)
+def remember_previous_classroom(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'classroom' not in update_fields:
+        return
+    if instance.pk:
+        instance._previous_classroom_id = (
+            Student.objects.filter(pk=instance.pk)
+            .values_list('classroom_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Student)
+def update_ledger_on_classroom_change(sender, instance, created, update_fields=None, **kwargs):
+    """Class fee depends on the classroom, so moving a student changes the balance"""
+    if update_fields is not None and 'classroom' not in update_fields:
+        return
+    if created or getattr(instance, '_previous_classroom_id', None) != instance.classroom_id:
+        ledger.refresh_students([instance.pk])
+
+
+@receiver(pre_delete, sender=ClassRoom)
+def update_ledger_on_classroom_delete(sender, instance, **kwargs):
+    """
+    Deleting a classroom sets Student.classroom to NULL with a queryset
+    update, which fires no Student signals; refresh those students' ledgers
+    once the delete has committed.
+    """
+    student_ids = list(Student.objects.filter(classroom=instance).values_list('pk', flat=True))
+    if student_ids:
+        transaction.on_commit(lambda: ledger.refresh_students(student_ids))
@@ -1,3 +1,215 @@
+import warnings
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from classes.models import ClassRoom
+from students.models import Student
+from .balances import due_students, student_balance, with_balances
+from .ledger import get_ledger
+from .models import FeeStructure, Payment, StudentFeeLedger
+
+
+class FeeBalanceEngineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.classroom = ClassRoom.objects.create(name='Form One', code='F1')
+        cls.no_fee_class = ClassRoom.objects.create(name='Form Two', code='F2')
+        FeeStructure.objects.create(classroom=cls.classroom, total_fee=100000)
+
+    def _make_students(self, count, classroom=None, prefix='S'):
+        students = []
+        for i in range(count):
+            student = Student.objects.create(
+                full_name=f'Student {prefix}{i}',
+                email=f'{prefix.lower()}{i}@example.com',
+                classroom=classroom or self.classroom,
+                registration_number=f'CA/{prefix}/2025/{i:04d}',
+            )
+            students.append(student)
+        return students
+
+    def test_balances_and_status(self):
+        unpaid, partial, paid = self._make_students(3)
+        Payment.objects.create(student=partial, amount_paid=40000)
+        Payment.objects.create(student=paid, amount_paid=60000)
+        Payment.objects.create(student=paid, amount_paid=40000)
+
+        rows = {s.pk: s for s in with_balances()}
+        self.assertEqual(rows[unpaid.pk].balance, 100000)
+        self.assertEqual(rows[unpaid.pk].fee_status, 'UNPAID')
+        self.assertEqual(rows[partial.pk].total_paid, 40000)
+        self.assertEqual(rows[partial.pk].fee_status, 'PARTIAL')
+        self.assertEqual(rows[paid.pk].balance, 0)
+        self.assertEqual(rows[paid.pk].fee_status, 'PAID')
+
+        self.assertEqual(
+            sorted(s.pk for s in due_students()), sorted([unpaid.pk, partial.pk])
+        )
+        self.assertEqual(Payment.get_student_balance(partial), 60000)
+
+    def test_student_without_fee_structure(self):
+        student = self._make_students(1, classroom=self.no_fee_class, prefix='N')[0]
+        Payment.objects.create(student=student, amount_paid=5000)
+
+        summary = student_balance(student)
+        self.assertFalse(summary['has_fee_structure'])
+        self.assertEqual(summary['total_fee'], 0)
+        self.assertEqual(Payment.get_student_balance(student), 0)
+        self.assertNotIn(student.pk, [s.pk for s in due_students()])
+
+    def test_query_count_is_flat(self):
+        """Benchmark: query count must not grow with the number of students."""
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                rows = list(due_students())
+                [(s.classroom.name, s.balance) for s in rows]
+            return len(ctx.captured_queries), len(rows)
+
+        for student in self._make_students(5, prefix='A'):
+            Payment.objects.create(student=student, amount_paid=1000)
+        small_queries, small_rows = count_queries()
+
+        for student in self._make_students(100, prefix='B'):
+            Payment.objects.create(student=student, amount_paid=1000)
+        large_queries, large_rows = count_queries()
+
+        self.assertEqual(small_rows, 5)
+        self.assertEqual(large_rows, 105)
+        self.assertEqual(small_queries, 1)
+        self.assertEqual(large_queries, small_queries)
+
+
+class StudentFeeLedgerTests(TestCase):
+
+    def setUp(self):
+        self.classroom = ClassRoom.objects.create(name='Form Three', code='F3')
+        self.structure = FeeStructure.objects.create(classroom=self.classroom, total_fee=50000)
+        self.student = Student.objects.create(
+            full_name='Ledger Student',
+            email='ledger@example.com',
+            classroom=self.classroom,
+            registration_number='CA/F3/2025/0001',
+        )
+
+    def ledger(self):
+        return StudentFeeLedger.objects.get(student=self.student)
+
+    def test_ledger_follows_payment_writes(self):
+        self.assertEqual(self.ledger().balance, 50000)
+        self.assertEqual(self.ledger().status, 'UNPAID')
+
+        payment = Payment.objects.create(student=self.student, amount_paid=20000)
+        self.assertEqual(self.ledger().total_paid, 20000)
+        self.assertEqual(self.ledger().status, 'PARTIAL')
+        self.assertEqual(self.ledger().last_payment_date, payment.date)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+        self.assertEqual(self.ledger().total_paid, 0)
+        self.assertIsNone(self.ledger().last_payment_date)
+
+    def test_ledger_follows_fee_structure_changes(self):
+        Payment.objects.create(student=self.student, amount_paid=30000)
+        self.structure.total_fee = 30000
+        self.structure.save()
+        self.assertEqual(self.ledger().balance, 0)
+        self.assertEqual(self.ledger().status, 'PAID')
+
+    def test_rebuild_command_reconciles_drift(self):
+        StudentFeeLedger.objects.filter(student=self.student).update(total_paid=999, balance=-1)
+        call_command('rebuild_fee_ledger', stdout=StringIO())
+        self.assertEqual(self.ledger().total_paid, 0)
+        self.assertEqual(self.ledger().balance, 50000)
+
+    def test_deleting_classroom_refreshes_its_students(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.classroom.delete()
+        self.assertEqual(self.ledger().balance, 0)
+        self.client.force_login(get_user_model().objects.create_user('fees-admin', password='x', is_staff=True))
+        response = self.client.get(reverse('fees:due_fee_list'))
+        self.assertEqual(response.context['due_list'], [])
+
+    def test_deleting_student_does_not_resurrect_ledger(self):
+        Payment.objects.create(student=self.student, amount_paid=10000)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.delete()
+        self.assertFalse(StudentFeeLedger.objects.exists())
+
+    def test_moving_payment_or_fee_structure_refreshes_both_sides(self):
+        other_class = ClassRoom.objects.create(name='Form Four', code='F4')
+        other = Student.objects.create(full_name='Other Student', email='other@example.com',
+                                       classroom=other_class, registration_number='CA/F4/2025/0001')
+        payment = Payment.objects.create(student=self.student, amount_paid=20000)
+        payment.student = other
+        payment.save()
+        self.assertEqual(self.ledger().total_paid, 0)
+        self.assertEqual(StudentFeeLedger.objects.get(student=other).total_paid, 20000)
+
+        self.structure.classroom = other_class
+        self.structure.save()
+        self.assertEqual(self.ledger().total_fee, 0)
+        self.assertEqual(StudentFeeLedger.objects.get(student=other).balance, 30000)
+
+    def test_missing_row_is_computed_without_writing(self):
+        Payment.objects.create(student=self.student, amount_paid=20000)
+        StudentFeeLedger.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            fee_ledger = get_ledger(self.student)
+        self.assertEqual((fee_ledger.total_paid, fee_ledger.balance, fee_ledger.status), (20000, 30000, 'PARTIAL'))
+        self.assertTrue(all(q['sql'].startswith('SELECT') for q in queries))
+        self.assertFalse(StudentFeeLedger.objects.exists())
+
+
+class FinancialReportExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        classroom = ClassRoom.objects.create(name='Form Four', code='F4')
+        FeeStructure.objects.create(classroom=classroom, total_fee=80000)
+        for i in range(3):
+            student = Student.objects.create(
+                full_name=f'Export Student {i}',
+                email=f'export{i}@example.com',
+                classroom=classroom,
+                registration_number=f'CA/F4/2025/{i:04d}',
+            )
+            Payment.objects.create(student=student, amount_paid=10000 * i)
+
+    def test_csv_export_streams_class_summary_first(self):
+        response = self.client.get('/fees/reports/', {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'CLASS SUMMARY')
+        self.assertEqual(lines[2], 'Form Four,3,80000,240000,30000,210000,12.5')
+        self.assertIn('STUDENTS', lines)
+        self.assertEqual(lines[-1], '3,Export Student 2,Form Four,CA/F4/2025/0002,80000,20000,60000,PARTIAL')
+
+    async def test_export_is_sent_chunk_by_chunk_under_asgi(self):
+        response = await self.async_client.get('/fees/reports/', {'format': 'csv'})
+        self.assertTrue(response.is_async)
+        chunks = []
+        # Iterator ya sync ingesomwa yote kwanza (na kutoa onyo hili)
+        with warnings.catch_warnings():
+            warnings.filterwarnings('error', message='StreamingHttpResponse must consume')
+            async for chunk in response.streaming_content:
+                chunks.append(chunk)
+        self.assertEqual(chunks[0], b'CLASS SUMMARY\r\n')
+        self.assertGreater(len(chunks), 5)
+
+    def test_xlsx_export_is_a_valid_workbook(self):
+        import zipfile
+        from io import BytesIO
 
-# Create your tests here.
+        response = self.client.get('/fees/reports/', {'format': 'xlsx'})
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIn('xl/worksheets/sheet1.xml', archive.namelist())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('Export Student 0', sheet)
+        self.assertEqual(sheet.count('<row>'), 10)
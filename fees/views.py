@@ -2,11 +2,15 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import FeeStructure, Payment, FeePayment
+from .models import FeeStructure, Payment, FeePayment, StudentFeeLedger
+from .balances import student_balance
+from .ledger import get_ledger
+from .exports import EXPORT_FORMATS, build_class_summaries, stream_financial_report
 from students.models import Student
 from django.db import models
 import uuid
-from dashboard.models import SchoolSettings
+from dashboard.school_settings import get_school_settings, static_logo
+from dashboard.pdf_cache import pdf_key, serve_cached_pdf, remember_pdf, student_inputs, payment_inputs
 from django.db.models import Sum
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.utils import ImageReader
@@ -15,7 +19,6 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib import colors
 from io import BytesIO
 from django.utils import timezone
-import os
 
 from classes.models import ClassRoom 
 
@@ -28,8 +31,8 @@ def debug_fees(request):
     """Debug view to see what's in the database"""
     context = {}
     
-    try:
-        student = Student.objects.get(user=request.user)
+    student = request.student
+    if student:
         context['student'] = student
         
         # Check if student has a class
@@ -56,7 +59,7 @@ def debug_fees(request):
         else:
             context['classroom_error'] = "Student has no classroom assigned"
             
-    except Student.DoesNotExist:
+    else:
         context['student_error'] = "Student profile not found"
     
     # Also show all fee structures and payments in system
@@ -70,15 +73,12 @@ def debug_fees(request):
 # MAIN FEE VIEWS
 # =============================================
 def my_fees(request):
-    settings_obj = SchoolSettings.objects.first()
-
     """
     View for students to see their own fees - BETTER VERSION
     """
     # Step 1: Try to get student profile directly
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
+    student = request.student
+    if not student:
         # Step 2: Auto-link if possible
         student = None
         
@@ -130,8 +130,6 @@ def my_fees(request):
 
 
 def link_student_account(request, student_id):
-    settings_obj = SchoolSettings.objects.first()
-
     """Allow user to manually link to a student account"""
     if request.method == 'POST':
         try:
@@ -159,7 +157,7 @@ def link_student_account(request, student_id):
     return redirect('fees:my_fees')
 
 def student_fee_detail(request, student_id=None):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     """
     View for individual student to check their fee details
@@ -173,9 +171,8 @@ def student_fee_detail(request, student_id=None):
             return redirect('fees:my_fees')
     else:
         # Try to get student associated with logged in user
-        try:
-            student = Student.objects.get(user=request.user)
-        except Student.DoesNotExist:
+        student = request.student
+        if not student:
             messages.error(request, "No student profile found for your account.")
             return redirect('fees:payment_list')
     
@@ -194,22 +191,19 @@ def student_fee_detail(request, student_id=None):
     # Get fee structure
     try:
         fee_structure = FeeStructure.objects.get(classroom=student.classroom)
-        total_fee = fee_structure.total_fee
     except FeeStructure.DoesNotExist:
         messages.warning(request, f"No fee structure defined for {student.classroom.name}")
-        total_fee = 0
         fee_structure = None
     
-    # Get payments
+    # Get payments — totals zinasomwa kutoka kwenye ledger
     payments = Payment.objects.filter(student=student).order_by('-date')
-    total_paid = payments.aggregate(total=Sum('amount_paid'))['total'] or 0
-    balance = total_fee - total_paid
+    fee_ledger = get_ledger(student)
     
     context = {
         'student': student,
-        'total_fee': total_fee,
-        'total_paid': total_paid,
-        'balance': balance,
+        'total_fee': fee_ledger.total_fee,
+        'total_paid': fee_ledger.total_paid,
+        'balance': fee_ledger.balance,
         'payments': payments,
         'fee_structure': fee_structure,
         'school_settings': settings_obj,
@@ -223,14 +217,14 @@ def student_fee_detail(request, student_id=None):
 # =============================================
 
 def fee_structure_list(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     structures = FeeStructure.objects.all()
     return render(request, 'fees/fee_structure_list.html', {'structures': structures,'school_settings': settings_obj})
 
 
 def add_fee_structure(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     if request.method == 'POST':
         classroom_id = request.POST['classroom']
@@ -253,7 +247,7 @@ def add_fee_structure(request):
 
 
 def record_payment(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     if request.method == 'POST':
         student_id = request.POST['student']
@@ -280,14 +274,14 @@ def record_payment(request):
 
 
 def payment_list(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     payments = Payment.objects.select_related('student').order_by('-date')
     return render(request, 'fees/payment_list.html', {'payments': payments,'school_settings': settings_obj})
 
 
 def student_fee_report(request, student_id):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     student = get_object_or_404(Student, id=student_id)
     
@@ -302,55 +296,39 @@ def student_fee_report(request, student_id):
         })
     
     payments = Payment.objects.filter(student=student)
-    total_paid = payments.aggregate(total=Sum('amount_paid'))['total'] or 0
-    
-    try:
-        total_fee = FeeStructure.objects.get(classroom=student.classroom).total_fee
-    except FeeStructure.DoesNotExist:
-        total_fee = 0
+    summary = student_balance(student)
+
+    if not summary['has_fee_structure']:
         messages.warning(request, "No fee structure for this student's class.")
-    
-    balance = total_fee - total_paid
 
     return render(request, 'fees/student_fee_report.html', {
         'student': student,
         'payments': payments,
-        'total_fee': total_fee,
-        'total_paid': total_paid,
-        'balance': balance,
+        'total_fee': summary['total_fee'],
+        'total_paid': summary['total_paid'],
+        'balance': summary['balance'],
         'school_settings': settings_obj
     })
 
 
 def due_fee_list(request):
-    settings_obj = SchoolSettings.objects.first()
-
-    students = Student.objects.all()
-    due_list = []
-
-    for student in students:
-        if not student.classroom:
-            continue
-            
-        try:
-            structure = FeeStructure.objects.get(classroom=student.classroom)
-            total_fee = structure.total_fee
-        except FeeStructure.DoesNotExist:
-            continue
-
-        paid = Payment.objects.filter(
-            student=student
-        ).aggregate(total=Sum('amount_paid'))['total'] or 0
-
-        balance = total_fee - paid
-
-        if balance > 0:
-            due_list.append({
-                'student': student,
-                'total_fee': total_fee,
-                'paid': paid,
-                'balance': balance
-            })
+    settings_obj = get_school_settings()
+
+    # Indexed lookup kwenye ledger badala ya aggregate ya payments zote;
+    # ledger inadumishwa na signals na `rebuild_fee_ledger`, si kwenye GET
+    ledgers = StudentFeeLedger.objects.filter(
+        balance__gt=0
+    ).select_related('student__classroom').order_by('student__full_name')
+
+    due_list = [
+        {
+            'student': entry.student,
+            'total_fee': entry.total_fee,
+            'paid': entry.total_paid,
+            'balance': entry.balance
+        }
+        for entry in ledgers
+    ]
 
     return render(request, 'fees/due_fee_list.html', {
         'due_list': due_list,
@@ -359,15 +337,13 @@ def due_fee_list(request):
 
 from reportlab.platypus import (
     SimpleDocTemplate, Table, TableStyle, 
-    Paragraph, Spacer, Image  # ← ongeza Image hapa
+    Paragraph, Spacer
 )
 
 
 def generate_fee_pdf(request, student_id):
     """Generate beautiful PDF receipt for student fee summary"""
     
-    from django.conf import settings as django_settings
-
     student = get_object_or_404(Student, id=student_id)
     
     # Check permission
@@ -380,15 +356,17 @@ def generate_fee_pdf(request, student_id):
         messages.error(request, "Student has no classroom assigned.")
         return redirect('fees:my_fees')
     
-    try:
-        fee_structure = FeeStructure.objects.get(classroom=student.classroom)
-        total_fee = fee_structure.total_fee
-    except FeeStructure.DoesNotExist:
-        total_fee = 0
+    fee_ledger = get_ledger(student)
+    total_fee = fee_ledger.total_fee
+    total_paid = fee_ledger.total_paid
+    balance = fee_ledger.balance
     
     payments = Payment.objects.filter(student=student).order_by('-date')
-    total_paid = payments.aggregate(total=Sum('amount_paid'))['total'] or 0
-    balance = total_fee - total_paid
+    
+    cache_key = pdf_key('fee_statement', student_inputs(student), payment_inputs(student))
+    cached = serve_cached_pdf(request, cache_key)
+    if cached:
+        return cached
     
     # Calculate payment percentage
     if total_fee > 0:
@@ -398,7 +376,7 @@ def generate_fee_pdf(request, student_id):
     
     # Get school settings
     try:
-        school_settings = SchoolSettings.objects.first()
+        school_settings = get_school_settings()
     except:
         school_settings = None
     
@@ -488,12 +466,11 @@ def generate_fee_pdf(request, student_id):
     # ========== HEADER SECTION ==========
     header_table_data = []
 
-    # School logo from static files
-    logo_path = os.path.join(django_settings.BASE_DIR, 'static', 'images', 'logo.jpeg')
+    # School logo from static files (decoded once per process)
+    logo = static_logo()
 
-    if os.path.exists(logo_path):
-        logo = Image(logo_path, width=80, height=80)
-        header_table_data.append([logo, ''])
+    if logo:
+        header_table_data.append([logo.flowable(width=80, height=80), ''])
     else:
         # Fallback to initials if logo file not found
         school_initials = school_settings.name[:2].upper() if school_settings else "CA"
@@ -687,11 +664,9 @@ def generate_fee_pdf(request, student_id):
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     response.write(pdf)
     
-    return response
+    return remember_pdf(cache_key, response)
 
 def generate_simple_pdf(student, total_fee, total_paid, balance, payments, school_settings):
-    settings_obj = SchoolSettings.objects.first()
-
     """Simple fallback PDF generator"""
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
@@ -749,61 +724,31 @@ def generate_simple_pdf(student, total_fee, total_paid, balance, payments, schoo
 
 
 
-from django.db.models import Sum, Count
+from django.db.models import Sum
 from classes.models import ClassRoom
 
 
 def financial_report(request):
-    settings_obj   = SchoolSettings.objects.first()
+    settings_obj   = get_school_settings()
     class_filter   = request.GET.get('classroom', '')
-    all_classrooms = ClassRoom.objects.all().order_by('name')
+    export_format  = request.GET.get('format', '')
 
-    # ── Queries 3 tu kwa data yote ───────────────────────────────
-    fee_map = dict(
-        FeeStructure.objects.values_list('classroom_id', 'total_fee')
-    )
-    students_count_map = dict(
-        Student.objects.values('classroom_id')
-        .annotate(n=Count('id'))
-        .values_list('classroom_id', 'n')
-    )
-    paid_class_map = dict(
-        Payment.objects.values('student__classroom_id')
-        .annotate(total=Sum('amount_paid'))
-        .values_list('student__classroom_id', 'total')
-    )
+    # ?format=csv / ?format=xlsx — streaming export, memory haiongezeki
+    if export_format in EXPORT_FORMATS:
+        return stream_financial_report(export_format, class_filter)
 
-    # ── Class summaries — no extra queries ───────────────────────
-    class_summaries  = []
-    grand_expected = grand_paid = grand_balance = 0
-
-    for cls in all_classrooms:
-        fee_each   = fee_map.get(cls.id, 0)
-        n_students = students_count_map.get(cls.id, 0)
-        expected   = fee_each * n_students
-        paid       = paid_class_map.get(cls.id, 0)
-        balance    = expected - paid
-        pct        = round(paid / expected * 100, 1) if expected > 0 else 0
-
-        grand_expected += expected
-        grand_paid     += paid
-        grand_balance  += balance
-
-        class_summaries.append({
-            'classroom':  cls,
-            'fee_each':   fee_each,
-            'n_students': n_students,
-            'expected':   expected,
-            'paid':       paid,
-            'balance':    balance,
-            'pct':        pct,
-        })
+    all_classrooms = ClassRoom.objects.all().order_by('name')
 
-    grand_rate = round(grand_paid / grand_expected * 100, 1) if grand_expected > 0 else 0
+    # ── Class summaries — aggregates 3 tu ────────────────────────
+    class_summaries, totals = build_class_summaries(all_classrooms)
+    grand_expected = totals['grand_expected']
+    grand_paid     = totals['grand_paid']
+    grand_balance  = totals['grand_balance']
+    grand_rate     = totals['grand_rate']
 
     # ── Student detail — query moja ───────────────────────────────
     selected_classroom = None
-    students_qs = Student.objects.select_related('classroom').all()
+    students_qs = Student.objects.select_related('classroom', 'fee_ledger').all()
 
     if class_filter:
         try:
@@ -812,22 +757,16 @@ def financial_report(request):
         except ClassRoom.DoesNotExist:
             pass
 
-    paid_student_map = dict(
-        Payment.objects.filter(student__in=students_qs)
-        .values('student_id')
-        .annotate(total=Sum('amount_paid'))
-        .values_list('student_id', 'total')
-    )
-
     students_detail = []
     for student in students_qs.order_by('classroom__name', 'full_name'):
         if not student.classroom_id:
             continue
-        fee     = fee_map.get(student.classroom_id, 0)
-        paid    = paid_student_map.get(student.id, 0)
-        balance = fee - paid
+        fee_ledger = student.fee_ledger
+        fee     = fee_ledger.total_fee
+        paid    = fee_ledger.total_paid
+        balance = fee_ledger.balance
         pct     = round(paid / fee * 100, 1) if fee > 0 else 0
-        status  = 'PAID' if balance <= 0 else 'PARTIAL' if paid > 0 else 'UNPAID'
+        status  = fee_ledger.status
 
         students_detail.append({
             'student': student,
@@ -853,7 +792,7 @@ def financial_report(request):
 
 
 def download_financial_report_pdf(request):
-    settings_obj  = SchoolSettings.objects.first()
+    settings_obj  = get_school_settings()
     class_filter  = request.GET.get('classroom', '')
     school_name   = settings_obj.name          if settings_obj else 'School'
     phone         = settings_obj.phone         if settings_obj else ''
@@ -869,32 +808,21 @@ def download_financial_report_pdf(request):
     DANGER  = colors.HexColor('#ef4444')
     WARNING = colors.HexColor('#f59e0b')
 
-    # ── Pre-fetch — queries 4 tu ─────────────────────────────────
+    export_format = request.GET.get('format', '')
+    if export_format in EXPORT_FORMATS:
+        return stream_financial_report(export_format, class_filter)
+
+    # ── Pre-fetch ────────────────────────────────────────────────
     filter_cls_qs = ClassRoom.objects.all().order_by('name')
     if class_filter:
         filter_cls_qs = filter_cls_qs.filter(id=class_filter)
 
-    fee_map = dict(FeeStructure.objects.values_list('classroom_id', 'total_fee'))
-    students_count_map = dict(
-        Student.objects.values('classroom_id')
-        .annotate(n=Count('id')).values_list('classroom_id', 'n')
-    )
-    paid_class_map = dict(
-        Payment.objects.values('student__classroom_id')
-        .annotate(total=Sum('amount_paid'))
-        .values_list('student__classroom_id', 'total')
-    )
+    class_summaries, totals = build_class_summaries(filter_cls_qs)
 
-    students_qs = Student.objects.select_related('classroom').all()
+    students_qs = Student.objects.select_related('classroom', 'fee_ledger').all()
     if class_filter:
         students_qs = students_qs.filter(classroom__id=class_filter)
 
-    paid_student_map = dict(
-        Payment.objects.filter(student__in=students_qs)
-        .values('student_id').annotate(total=Sum('amount_paid'))
-        .values_list('student_id', 'total')
-    )
-
     # ── Build PDF ─────────────────────────────────────────────────
     buffer   = BytesIO()
     doc      = SimpleDocTemplate(buffer, pagesize=letter,
@@ -927,24 +855,17 @@ def download_financial_report_pdf(request):
     elements.append(Spacer(1, 10))
 
     # Grand totals + class rows
-    grand_expected = grand_paid = 0
-    class_rows = []
-
-    for cls in filter_cls_qs:
-        fee_each = fee_map.get(cls.id, 0)
-        n        = students_count_map.get(cls.id, 0)
-        ex       = fee_each * n
-        pd       = paid_class_map.get(cls.id, 0)
-        bl       = ex - pd
-        pc       = round(pd / ex * 100, 1) if ex > 0 else 0
-        grand_expected += ex
-        grand_paid     += pd
-        class_rows.append([cls.name, str(n), f'Tsh {fee_each:,.0f}',
-                           f'Tsh {ex:,.0f}', f'Tsh {pd:,.0f}',
-                           f'Tsh {bl:,.0f}', f'{pc}%'])
-
-    grand_balance = grand_expected - grand_paid
-    grand_rate    = round(grand_paid / grand_expected * 100, 1) if grand_expected > 0 else 0
+    class_rows = [
+        [row['classroom'].name, str(row['n_students']), f"Tsh {row['fee_each']:,.0f}",
+         f"Tsh {row['expected']:,.0f}", f"Tsh {row['paid']:,.0f}",
+         f"Tsh {row['balance']:,.0f}", f"{row['pct']}%"]
+        for row in class_summaries
+    ]
+
+    grand_expected = totals['grand_expected']
+    grand_paid     = totals['grand_paid']
+    grand_balance  = totals['grand_balance']
+    grand_rate     = totals['grand_rate']
 
     # Totals box
     g_data  = [['INAYOTARAJIWA','IMELIPWA','BADO','KIWANGO'],
@@ -999,10 +920,11 @@ def download_financial_report_pdf(request):
     for i, student in enumerate(students_qs.order_by('classroom__name','full_name'), 1):
         if not student.classroom_id:
             continue
-        fee     = fee_map.get(student.classroom_id, 0)
-        paid    = paid_student_map.get(student.id, 0)
-        balance = fee - paid
-        status  = 'PAID' if balance <= 0 else 'PARTIAL' if paid > 0 else 'UNPAID'
+        fee_ledger = student.fee_ledger
+        fee     = fee_ledger.total_fee
+        paid    = fee_ledger.total_paid
+        balance = fee_ledger.balance
+        status  = fee_ledger.status
         s_rows.append([str(i), student.full_name[:22],
                        student.classroom.name[:14] if student.classroom else '',
                        student.registration_number,
@@ -18,16 +18,25 @@ INSTALLATION:
    (same folder as manage.py) and name it `jamiitek_middleware.py`.
 
 NOTES:
-- Status is cached for 5 minutes to avoid excessive API calls.
-- If the API is unreachable, the site continues working (fail-open).
+- Status is refreshed every 5 minutes in the background; requests never
+  wait for the API except the very first one after installation.
+- If the API is unreachable, the site continues working (fail-open) and
+  retries with exponential backoff (30s up to 15 minutes).
 - Enabled features are accessible via: request.jamiitek_features
 """
 
-import requests
+import json
 import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
 from django.http import HttpResponse
-from django.core.cache import cache
+from django.core.cache import caches
 
 logger = logging.getLogger(__name__)
 
@@ -187,72 +196,218 @@ MAINTENANCE_HTML = """<!DOCTYPE html>
 </html>"""
 
 
+DEFAULT_MESSAGE = (
+    'This website has been <strong>temporarily suspended</strong> due to an outstanding hosting payment. '
+    'To restore access immediately, please contact <strong>JamiiTek Technologies</strong> and settle your pending balance.'
+)
+
+
+class FileStatusStore:
+    """
+    Status record in a small JSON file shared by every worker on the host.
+    Reading costs one stat() unless another worker has written a new record.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._record = {}
+
+    def read(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return dict(self._record)
+        if mtime != self._mtime:
+            try:
+                with open(self.path) as fh:
+                    self._record = json.load(fh)
+                self._mtime = mtime
+            except (OSError, ValueError):
+                pass
+        return dict(self._record)
+
+    def write(self, record):
+        tmp = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'w') as fh:
+                json.dump(record, fh)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"JamiiTek: Could not write status file: {e}")
+        self._record = dict(record)
+
+
+class CacheStatusStore:
+    """Status record in a Django cache alias (use a shared one, e.g. Redis)."""
+
+    KEY = 'jamiitek_site_status'
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def read(self):
+        return self.cache.get(self.KEY) or {}
+
+    def write(self, record):
+        self.cache.set(self.KEY, record, None)
+
+
 class JamiiTekStatusMiddleware:
     """
-    Checks the site's status from the JamiiTek management panel on every
-    request and blocks access if the site is suspended or under maintenance.
+    Checks the site's status from the JamiiTek management panel and blocks
+    access if the site is suspended or under maintenance.
+
+    - The last known status is served straight from a store shared by all
+      workers. Once it is older than FRESH seconds it is refreshed by one
+      background thread while requests keep using the stale copy.
+    - Failed fetches are remembered and retried only after an exponential
+      backoff (circuit breaker), so an outage at JamiiTek never makes our
+      requests wait. Only the very first fetch (nothing stored yet) is done
+      inline.
+    - Block pages are rendered once per status/message change.
+
+    Optional settings:
+        JAMIITEK_STATUS_CACHE = 'default'   # Django cache alias; default is a file in the temp dir
+        JAMIITEK_STATUS_FILE  = '/tmp/jamiitek_status.json'
     """
 
-    CACHE_KEY = 'jamiitek_site_status'
-    CACHE_TIMEOUT = 300  # 5 minutes
+    FRESH = 300              # 5 minutes
+    MAX_STALE = 24 * 3600    # status older than this is ignored (fail-open)
+    TIMEOUT = 3
+    BACKOFF_BASE = 30
+    BACKOFF_MAX = 15 * 60
     BYPASS_PATHS = ['/admin/', '/api/', '/static/', '/media/']
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
         self.api_key = getattr(settings, 'JAMIITEK_API_KEY', None)
         self.api_url = getattr(
             settings, 'JAMIITEK_API_URL',
             'https://jamiitek.co.tz/api/site-status/'
         )
+        alias = getattr(settings, 'JAMIITEK_STATUS_CACHE', None)
+        if alias:
+            self.store = CacheStatusStore(alias)
+        else:
+            self.store = FileStatusStore(getattr(
+                settings, 'JAMIITEK_STATUS_FILE',
+                os.path.join(tempfile.gettempdir(), 'jamiitek_status.json'),
+            ))
+        self.session = requests.Session()
+        self._refresh_lock = threading.Lock()
+        self._page_key = None
+        self._page = None
 
     def __call__(self, request):
-        for path in self.BYPASS_PATHS:
-            if request.path.startswith(path):
-                return self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._bypass(request):
+            blocked = self._apply_status(request, self._get_status())
+            if blocked is not None:
+                return blocked
+        return self.get_response(request)
 
+    async def __acall__(self, request):
+        # ASGI: status inasomwa kwenye thread kwa muda mfupi; view (k.m. long-poll) haishikilii thread
+        if not self._bypass(request):
+            status_data = await sync_to_async(self._get_status, thread_sensitive=False)()
+            blocked = self._apply_status(request, status_data)
+            if blocked is not None:
+                return blocked
+        return await self.get_response(request)
+
+    def _bypass(self, request):
         if not self.api_key:
-            return self.get_response(request)
+            return True
+        return any(request.path.startswith(path) for path in self.BYPASS_PATHS)
 
-        status_data = self._get_status()
+    def _apply_status(self, request, status_data):
+        """Attach features/status to the request; a 503 response when the site is blocked."""
+        if not status_data:
+            return None
+        request.jamiitek_features = status_data.get('features', {})
+        request.jamiitek_status = status_data.get('status', 'active')
 
-        if status_data:
-            request.jamiitek_features = status_data.get('features', {})
-            request.jamiitek_status = status_data.get('status', 'active')
+        site_status = status_data.get('status', 'active')
+        if site_status in ('suspended', 'maintenance'):
+            message = status_data.get('suspension_message', DEFAULT_MESSAGE)
+            return HttpResponse(self._render_page(site_status, message), status=503, content_type='text/html')
+        return None
 
-            site_status = status_data.get('status', 'active')
-            message = status_data.get(
-                'suspension_message',
-                'This website has been <strong>temporarily suspended</strong> due to an outstanding hosting payment. '
-                'To restore access immediately, please contact <strong>JamiiTek Technologies</strong> and settle your pending balance.'
-            )
+    def _render_page(self, site_status, message):
+        """HTML ya 503, inatengenezwa upya tu status au ujumbe ukibadilika."""
+        key = (site_status, message)
+        if key != self._page_key:
+            template = SUSPENSION_HTML if site_status == 'suspended' else MAINTENANCE_HTML
+            self._page = template.format(message=message).encode()
+            self._page_key = key
+        return self._page
 
-            if site_status == 'suspended':
-                html = SUSPENSION_HTML.format(message=message)
-                return HttpResponse(html, status=503, content_type='text/html')
+    def _get_status(self):
+        """Last known site status, refreshed in the background when stale. None = unknown (fail-open)."""
+        now = time.time()
+        record = self.store.read()
+        data = record.get('data')
+        age = now - record.get('fetched_at', 0)
+        if data is not None and age > self.MAX_STALE:
+            data = None
 
-            elif site_status == 'maintenance':
-                html = MAINTENANCE_HTML.format(message=message)
-                return HttpResponse(html, status=503, content_type='text/html')
+        if age > self.FRESH and now >= record.get('retry_at', 0):
+            if data is None and not record.get('failures'):
+                # Mara ya kwanza kabisa: hakuna status yoyote, subiri jibu moja
+                data = self._refresh().get('data')
+            else:
+                self._refresh_in_background()
+        return data
 
-        return self.get_response(request)
+    def _refresh_in_background(self):
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # thread nyingine ya process hii tayari inafanya kazi
 
-    def _get_status(self):
-        """Fetch site status from the JamiiTek API (cached for 5 minutes)."""
-        cached = cache.get(self.CACHE_KEY)
-        if cached is not None:
-            return cached
+        def run():
+            try:
+                self._refresh()
+            finally:
+                self._refresh_lock.release()
+
+        threading.Thread(target=run, name='jamiitek-status-refresh', daemon=True).start()
 
+    def _refresh(self):
+        """Fetch the status once and store the outcome. Returns the stored record."""
+        now = time.time()
+        record = self.store.read()
+        if record.get('lease_until', 0) > now:
+            return record  # worker mwingine anaifanya sasa hivi
+        record['lease_until'] = now + self.TIMEOUT + 1
+        self.store.write(record)
+
+        data = None
         try:
             url = f"{self.api_url.rstrip('/')}/{self.api_key}/"
-            resp = requests.get(url, timeout=3)
+            resp = self.session.get(url, timeout=self.TIMEOUT)
             if resp.status_code == 200:
                 data = resp.json()
-                cache.set(self.CACHE_KEY, data, self.CACHE_TIMEOUT)
-                return data
+            else:
+                logger.warning(f"JamiiTek: status API returned {resp.status_code}")
         except Exception as e:
             logger.warning(f"JamiiTek: Could not reach status API: {e}")
 
-        return None
+        now = time.time()
+        if data is not None:
+            record = {'data': data, 'fetched_at': now, 'failures': 0, 'retry_at': 0}
+        else:
+            failures = record.get('failures', 0) + 1
+            backoff = min(self.BACKOFF_BASE * 2 ** (failures - 1), self.BACKOFF_MAX)
+            record.update({'failures': failures, 'retry_at': now + backoff})
+        record['lease_until'] = 0
+        self.store.write(record)
+        return record
 
 
 def is_feature_enabled(request, feature_key):
@@ -1,5 +1,4 @@
-from .models import Parent
-from dashboard.models import SchoolSettings
+from dashboard.school_settings import get_school_settings
 from django.utils import timezone
 
 
@@ -8,18 +7,15 @@ def parent_context(request):
     context = {}
     
     # Add school settings
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     if school_settings:
         context['school_settings'] = school_settings
     
     # Add parent information if logged in
-    if request.user.is_authenticated:
-        try:
-            parent = Parent.objects.get(user=request.user)
-            context['parent'] = parent
-            context['children_count'] = parent.children_count
-        except Parent.DoesNotExist:
-            pass
+    parent = getattr(request, 'parent', None)
+    if parent:
+        context['parent'] = parent
+        context['children_count'] = parent.children_count
     
     # Add current year
     context['current_year'] = timezone.now().year
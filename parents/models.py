@@ -124,50 +124,15 @@ class Parent(models.Model):
     
     def get_attendance_summary(self):
         """Get attendance summary for all children"""
-        from attendance.models import Attendance  # Import here to avoid circular import
-        
-        summary = []
-        for student in self.students.all():
-            attendance_data = Attendance.objects.filter(student=student)
-            if attendance_data.exists():
-                present_count = attendance_data.filter(status='PRESENT').count()
-                total_count = attendance_data.count()
-                attendance_percentage = (present_count / total_count) * 100 if total_count > 0 else 0
-                
-                summary.append({
-                    'student': student,
-                    'present_count': present_count,
-                    'total_count': total_count,
-                    'percentage': round(attendance_percentage, 1)
-                })
-        return summary
+        from .snapshot import dashboard_snapshot  # Import here to avoid circular import
+
+        return dashboard_snapshot(self)['attendance_summary']
     
     def get_fee_summary(self):
         """Get fee summary for all children"""
-        from fees.models import FeeStructure, Payment  # Import here to avoid circular import
-        
-        summary = []
-        for student in self.students.all():
-            if student.classroom:
-                try:
-                    fee_structure = FeeStructure.objects.get(classroom=student.classroom)
-                    total_fee = fee_structure.total_fee
-                except FeeStructure.DoesNotExist:
-                    total_fee = 0
-            
-                total_paid = Payment.objects.filter(student=student).aggregate(
-                    total=models.Sum('amount_paid')
-                )['total'] or 0
-                
-                balance = total_fee - total_paid
-                
-                summary.append({
-                    'student': student,
-                    'total_fee': total_fee,
-                    'total_paid': total_paid,
-                    'balance': balance
-                })
-        return summary
+        from fees.balances import balance_summary  # Import here to avoid circular import
+
+        return balance_summary(self.students.filter(classroom__isnull=False))
     
     def get_full_family_balance(self):
         """Get total fee balance for all children"""
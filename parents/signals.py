@@ -1,11 +1,15 @@
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
 from django.conf import settings
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from attendance.models import StudentAttendance
+from exams.models import Result
+from fees.models import FeeStructure, Payment
+from students.models import Student
 from .models import Parent
+from .snapshot import bump_students
+from dashboard.outbox import queue_email
 
 
 @receiver(post_save, sender=User)
@@ -40,36 +44,48 @@ def create_or_update_parent_profile(sender, instance, created, **kwargs):
             pass
 
 
+def _parent_email_context(parent):
+    # JSON tu: outbox inahifadhi context na kuitumia kwenye worker
+    return {
+        'parent': {'full_name': parent.full_name, 'email': parent.email},
+        'school_name': getattr(settings, 'SCHOOL_NAME', 'Charles Academy'),
+        'support_email': getattr(settings, 'SUPPORT_EMAIL', settings.DEFAULT_FROM_EMAIL),
+    }
+
+
 @receiver(post_save, sender=Parent)
 def send_parent_welcome_email(sender, instance, created, **kwargs):
     """
-    Send welcome email to parent when account is created
+    Queue welcome email to parent when account is created
     """
     if created and instance.email:
-        subject = f"Welcome to {settings.SCHOOL_NAME} Parent Portal"
-        
-        context = {
-            'parent': instance,
-            'school_name': settings.SCHOOL_NAME,
-            'login_url': f"{settings.SITE_URL}/parents/login/",
-            'support_email': settings.SUPPORT_EMAIL,
-        }
-        
-        html_message = render_to_string('parents/emails/welcome_email.html', context)
-        plain_message = strip_tags(html_message)
+        context = _parent_email_context(instance)
+        context['login_url'] = f"{getattr(settings, 'SITE_URL', '')}/parents/login/"
         
         try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[instance.email],
-                html_message=html_message,
-                fail_silently=True,
-            )
+            # Savepoint: insert ikishindwa, transaction ya parent inaendelea kufanya kazi
+            with transaction.atomic():
+                queue_email(
+                    [instance.email],
+                    f"Welcome to {context['school_name']} Parent Portal",
+                    template='parents/emails/welcome_email.html',
+                    context=context,
+                )
         except Exception as e:
             # Log error but don't crash
-            print(f"Failed to send welcome email: {e}")
+            print(f"Failed to queue welcome email: {e}")
+
+
+@receiver(pre_save, sender=Parent)
+def remember_previous_active(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'is_active' not in update_fields:
+        return
+    if instance.pk:
+        instance._previous_is_active = (
+            Parent.objects.filter(pk=instance.pk)
+            .values_list('is_active', flat=True)
+            .first()
+        )
 
 
 @receiver(post_save, sender=Parent)
@@ -78,43 +94,29 @@ def notify_parent_account_activation(sender, instance, created, **kwargs):
     Notify parent when account is activated/deactivated
     """
     if not created and instance.email:
-        # Check if active status changed
-        try:
-            old_instance = Parent.objects.get(id=instance.id)
-            if old_instance.is_active != instance.is_active:
-                subject = f"Account Status Update - {settings.SCHOOL_NAME}"
-                
-                if instance.is_active:
-                    status = "ACTIVATED"
-                    message = "Your parent account has been activated. You can now access the parent portal."
-                else:
-                    status = "DEACTIVATED"
-                    message = "Your parent account has been deactivated. Please contact school administration."
-                
-                context = {
-                    'parent': instance,
-                    'school_name': settings.SCHOOL_NAME,
-                    'status': status,
-                    'message': message,
-                    'support_email': settings.SUPPORT_EMAIL,
-                }
-                
-                html_message = render_to_string('parents/emails/account_status.html', context)
-                plain_message = strip_tags(html_message)
-                
-                try:
-                    send_mail(
-                        subject=subject,
-                        message=plain_message,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[instance.email],
-                        html_message=html_message,
-                        fail_silently=True,
+        # Check if active status changed (post_save ingesoma row iliyokwisha hifadhiwa)
+        previous = getattr(instance, '_previous_is_active', None)
+        if previous is not None and previous != instance.is_active:
+            if instance.is_active:
+                status = "ACTIVATED"
+                message = "Your parent account has been activated. You can now access the parent portal."
+            else:
+                status = "DEACTIVATED"
+                message = "Your parent account has been deactivated. Please contact school administration."
+            
+            context = _parent_email_context(instance)
+            context.update({'status': status, 'message': message})
+            
+            try:
+                with transaction.atomic():
+                    queue_email(
+                        [instance.email],
+                        f"Account Status Update - {context['school_name']}",
+                        template='parents/emails/account_status.html',
+                        context=context,
                     )
-                except Exception as e:
-                    print(f"Failed to send status email: {e}")
-        except Parent.DoesNotExist:
-            pass
+            except Exception as e:
+                print(f"Failed to queue status email: {e}")
 
 
 @receiver(pre_save, sender=Parent)
@@ -152,4 +154,30 @@ def delete_associated_user(sender, instance, **kwargs):
     #         instance.user.delete()
     # except Exception:
     #     pass
-    pass
\ No newline at end of file
+    pass
+
+
+# ==================== DASHBOARD SNAPSHOT ====================
+
+@receiver(post_save, sender=StudentAttendance)
+@receiver(post_delete, sender=StudentAttendance)
+@receiver(post_save, sender=Result)
+@receiver(post_delete, sender=Result)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def refresh_dashboard_for_student_record(sender, instance, **kwargs):
+    """Attendance, results or payments changed - parents' dashboards must rebuild"""
+    bump_students([instance.student_id])
+
+
+@receiver(post_save, sender=Student)
+def refresh_dashboard_for_student(sender, instance, **kwargs):
+    bump_students([instance.pk])
+
+
+@receiver(post_save, sender=FeeStructure)
+@receiver(post_delete, sender=FeeStructure)
+def refresh_dashboard_for_fee_structure(sender, instance, **kwargs):
+    bump_students(
+        Student.objects.filter(classroom_id=instance.classroom_id).values_list('pk', flat=True)
+    )
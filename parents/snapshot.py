@@ -0,0 +1,193 @@
+# parents/snapshot.py
+"""
+Per-parent dashboard snapshot.
+
+Everything the parent dashboard shows about the children (attendance
+stats, fee balances, latest results and today's status) is gathered in a
+fixed number of batched queries, however many children a parent has, and
+kept in the Django cache (per worker unless the cache is shared).
+
+The cache key carries a version per child, kept as a shared stamp
+(dashboard/stamps.py) so every worker sees a change at once. Any write to StudentAttendance,
+Result or Payment for a child (and any FeeStructure change for its class)
+bumps that child's version, so the next dashboard view rebuilds instead of
+serving stale data. Bulk writers that skip model signals call
+bump_students() themselves.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from attendance.models import StudentAttendance
+from dashboard import stamps
+from attendance.stats import attendance_stats
+from exams.models import Result, grade_for_marks
+from fees.ledger import computed_ledgers
+from students.models import Student
+
+SNAPSHOT_TIMEOUT = 60 * 10
+RESULTS_PER_CHILD = 3
+RECENT_RESULTS = 5
+MAX_MARKS = 100
+
+
+def _student_version_key(student_id):
+    return f'parents:dashboard:student:{student_id}'
+
+
+def bump_students(student_ids):
+    """Invalidate every dashboard snapshot that includes these students."""
+    keys = [_student_version_key(pk) for pk in set(student_ids) if pk]
+    if keys:
+        # Baada ya commit, la sivyo ombi lingine linaweza kujenga snapshot
+        # kutoka data ya zamani chini ya version mpya
+        transaction.on_commit(lambda: stamps.bump(keys))
+
+
+def _snapshot_key(parent_id, student_ids, today):
+    # Orodha ya watoto iko ndani ya key, hivyo kuongeza/kuondoa mtoto kunabadilisha key
+    keys = [_student_version_key(pk) for pk in student_ids]
+    versions = stamps.read(keys)
+    raw = ','.join(f'{key}={versions[key]}' for key in keys)
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'parents:dashboard:{parent_id}:{today.isoformat()}:{digest}'
+
+
+def _children(student_ids):
+    students = (
+        Student.objects.filter(pk__in=student_ids)
+        .select_related('classroom', 'fee_ledger')
+    )
+    children, ledgers = [], {}
+    for student in students:
+        name = student.full_name
+        children.append({
+            'id': student.id,
+            'full_name': name,
+            'registration_number': student.registration_number,
+            'classroom': str(student.classroom) if student.classroom else None,
+            'avatar_initials': name[:2].upper() if len(name) >= 2 else name[:1].upper(),
+        })
+        if student.classroom_id and hasattr(student, 'fee_ledger'):
+            ledgers[student.id] = student.fee_ledger
+    # Dashboard ni GET: mtoto asiye na ledger row anahesabiwa bila kuiandika
+    missing = [s.id for s in students if s.classroom_id and s.id not in ledgers]
+    if missing:
+        ledgers.update(computed_ledgers(missing))
+    return children, ledgers
+
+
+def _attendance_summary(children):
+    stats = attendance_stats([c['id'] for c in children])
+    summary = []
+    for child in children:
+        entry = stats.get(child['id'])
+        if not entry:
+            continue
+        summary.append({
+            'student': child,
+            'present_count': entry['totals']['present'],
+            'total_count': entry['totals']['total'],
+            'percentage': entry['totals']['percentage'],
+        })
+    return summary
+
+
+def _recent_results(children):
+    by_id = {child['id']: child for child in children}
+    rows = (
+        Result.objects.filter(student_id__in=by_id)
+        .annotate(row=Window(
+            RowNumber(),
+            partition_by=[F('student_id')],
+            order_by=[F('exam__date').desc(), F('id').desc()],
+        ))
+        .filter(row__lte=RESULTS_PER_CHILD)
+        .values_list('student_id', 'marks', 'subject__name', 'exam__name', 'exam__date')
+        .order_by('-exam__date', '-id')
+    )
+    return [
+        {
+            'student': by_id[student_id],
+            'subject': {'name': subject_name},
+            'exam': {'name': exam_name, 'date': exam_date},
+            'marks': marks,
+            'max_marks': MAX_MARKS,
+            'grade': grade_for_marks(marks)[0],
+        }
+        for student_id, marks, subject_name, exam_name, exam_date in rows[:RECENT_RESULTS]
+    ]
+
+
+def _today_attendance(children, today):
+    statuses = {}
+    # General (subject=None) entry kwanza, kisha ya somo lolote
+    for student_id, status in (
+        StudentAttendance.objects.filter(student_id__in=[c['id'] for c in children], date=today)
+        .order_by(F('subject_id').asc(nulls_first=True), 'id')
+        .values_list('student_id', 'status')
+    ):
+        statuses.setdefault(student_id, status)
+    return [
+        {
+            'student': child,
+            'attendance': {'status': statuses[child['id']], 'time_in': None}
+            if child['id'] in statuses else None,
+        }
+        for child in children
+    ]
+
+
+def build_snapshot(student_ids, today=None):
+    """Gather the dashboard data for these children. Plain dicts only, safe to cache."""
+    today = today or timezone.localdate()
+    children, ledgers = _children(student_ids)
+
+    fee_summary = [
+        {
+            'student': child,
+            'total_fee': ledgers[child['id']].total_fee,
+            'total_paid': ledgers[child['id']].total_paid,
+            'balance': ledgers[child['id']].balance,
+            'status': ledgers[child['id']].status,
+        }
+        for child in children if child['id'] in ledgers
+    ]
+    attendance_summary = _attendance_summary(children)
+    recent_results = _recent_results(children)
+
+    if attendance_summary:
+        avg_attendance = sum(item['percentage'] for item in attendance_summary) / len(attendance_summary)
+    else:
+        avg_attendance = 0
+
+    return {
+        'date': today,
+        'children': children,
+        'attendance_summary': attendance_summary,
+        'fee_summary': fee_summary,
+        'recent_results': recent_results,
+        'today_attendance': _today_attendance(children, today),
+        'stats': {
+            'total_children': len(children),
+            'avg_attendance': round(avg_attendance, 1),
+            'total_balance': sum(item['balance'] for item in fee_summary),
+            'results_count': len(recent_results),
+        },
+    }
+
+
+def dashboard_snapshot(parent):
+    """Cached snapshot for one parent, rebuilt when any child's data changes."""
+    today = timezone.localdate()
+    student_ids = list(parent.students.order_by('pk').values_list('pk', flat=True))
+    key = _snapshot_key(parent.pk, student_ids, today)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(student_ids, today)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
@@ -1,3 +1,150 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import StudentAttendance
+from attendance.utils import save_class_attendance
+from classes.models import ClassRoom, Subject
+from exams.models import Exam, Result
+from fees.models import FeeStructure, Payment, StudentFeeLedger
+from dashboard.models import OutboxEmail
+from dashboard.outbox import send_pending
+from students.models import Student
+from .models import Parent
+from .snapshot import build_snapshot, dashboard_snapshot
+
+
+# Snapshots ziko kwenye cache ya process; queries zinazohesabiwa ni za app na stamps tu
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DashboardSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.classroom = ClassRoom.objects.create(name='Form One', code='F1')
+        cls.subject = Subject.objects.create(name='Maths', classroom=cls.classroom)
+        FeeStructure.objects.create(classroom=cls.classroom, total_fee=300000)
+        cls.exam = Exam.objects.create(
+            name='Midterm', classroom=cls.classroom, date=datetime.date(2025, 6, 1)
+        )
+        cls.children = [
+            Student.objects.create(
+                full_name=f'Child {i}',
+                email=f'child{i}@example.com',
+                classroom=cls.classroom,
+                registration_number=f'CA/F1/2025/{i:04d}',
+            )
+            for i in range(5)
+        ]
+        user = get_user_model().objects.create_user(username='mzazi', password='x', role='PARENT')
+        # email tupu: snapshot tests hazihitaji welcome email kwenye outbox
+        cls.parent = Parent.objects.create(
+            user=user, full_name='Mzazi Mmoja', phone='+255700000000', email='', address='Dodoma'
+        )
+        cls.parent.students.set(cls.children[:2])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_snapshot_contents(self):
+        first = self.children[0]
+        Payment.objects.create(student=first, amount_paid=100000, receipt_no='R-0001')
+        Result.objects.create(student=first, exam=self.exam, subject=self.subject, marks=72)
+        StudentAttendance.objects.create(student=first, date=timezone.localdate(), status='PRESENT')
+        StudentAttendance.objects.create(
+            student=first, date=datetime.date(2025, 2, 1), status='ABSENT'
+        )
+
+        snapshot = build_snapshot([c.id for c in self.children[:2]])
+        self.assertEqual([c['full_name'] for c in snapshot['children']], ['Child 0', 'Child 1'])
+        self.assertEqual(snapshot['stats']['total_balance'], 200000 + 300000)
+        self.assertEqual(
+            [(a['present_count'], a['total_count'], a['percentage']) for a in snapshot['attendance_summary']],
+            [(1, 2, 50.0)],
+        )
+        self.assertEqual(snapshot['recent_results'][0]['grade'], 'B')
+        self.assertEqual(snapshot['today_attendance'][0]['attendance']['status'], 'PRESENT')
+        self.assertIsNone(snapshot['today_attendance'][1]['attendance'])
+
+    def test_query_count_does_not_grow_with_children(self):
+        self.parent.students.set(self.children)
+        for child in self.children:
+            Result.objects.create(student=child, exam=self.exam, subject=self.subject, marks=60)
+        ids = [c.id for c in self.children]
+        # students+ledgers, attendance, results, today
+        with self.assertNumQueries(4):
+            build_snapshot(ids)
+        with self.assertNumQueries(4):
+            build_snapshot(ids[:1])
+
+    def test_missing_ledgers_are_computed_not_written(self):
+        Payment.objects.create(student=self.children[0], amount_paid=1000)
+        StudentFeeLedger.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            snapshot = build_snapshot([c.id for c in self.children])
+        self.assertTrue(all(q['sql'].startswith('SELECT') for q in queries))
+        self.assertFalse(StudentFeeLedger.objects.exists())
+        self.assertIn(1000, [f['total_paid'] for f in snapshot['fee_summary']])
+
+    def test_cached_until_a_child_record_changes(self):
+        dashboard_snapshot(self.parent)
+        # student ids, stamps za watoto, kisha snapshot kutoka cache
+        with self.assertNumQueries(2):
+            dashboard_snapshot(self.parent)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Result.objects.create(
+                student=self.children[1], exam=self.exam, subject=self.subject, marks=90
+            )
+        self.assertEqual(dashboard_snapshot(self.parent)['recent_results'][0]['marks'], 90)
+
+        # bulk writer haitumi signals, inajibump yenyewe
+        with self.captureOnCommitCallbacks(execute=True):
+            save_class_attendance({self.children[0].id: 'ABSENT'}, timezone.localdate())
+        today = dashboard_snapshot(self.parent)['today_attendance']
+        self.assertEqual(today[0]['attendance']['status'], 'ABSENT')
+
+    def test_other_students_do_not_invalidate(self):
+        dashboard_snapshot(self.parent)
+        with self.captureOnCommitCallbacks(execute=True):
+            Result.objects.create(
+                student=self.children[4], exam=self.exam, subject=self.subject, marks=90
+            )
+        with self.assertNumQueries(2):
+            dashboard_snapshot(self.parent)
+
+    def test_attendance_summary_rejects_invalid_ranges(self):
+        self.parent.user.user_permissions.add(Permission.objects.get(codename='view_child_attendance'))
+        self.client.force_login(self.parent.user)
+        url = reverse('parents:attendance_summary_api')
+        for params in ({'start': '2025-02-30'}, {'months': '99999999'}, {'student_id': 'abc'}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400, params)
+        response = self.client.get(url, {'student_id': self.children[0].id})
+        self.assertEqual([row['student_id'] for row in response.json()['data']], [self.children[0].id])
+
+
+class ParentEmailTests(TestCase):
+
+    def test_welcome_and_status_emails_render_and_send(self):
+        user = get_user_model().objects.create_user(username='mzazi2', password='x', role='PARENT')
+        parent = Parent.objects.create(
+            user=user, full_name='Mzazi Wawili', phone='0700000000', email='mzazi2@example.com', address='Arusha'
+        )
+        parent.is_active = not parent.is_active
+        parent.save()
+        parent.save()  # hakuna mabadiliko ya is_active: hakuna email
+        self.assertEqual(send_pending(), (2, 0))
+        self.assertEqual(OutboxEmail.objects.filter(status='SENT').count(), 2)
+        self.assertIn('Mzazi Wawili', mail.outbox[0].alternatives[0][0])
+        self.assertTrue(mail.outbox[1].subject.startswith('Account Status Update'))
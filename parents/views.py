@@ -19,21 +19,27 @@ from datetime import datetime, timedelta
 
 # PDF Generation imports
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from io import BytesIO
-import os
 
 # App imports
-from dashboard.models import SchoolSettings, Announcement
+from dashboard.models import Announcement
+from dashboard.school_settings import get_school_settings, school_logo
 from students.models import Student
 from attendance .models import StudentAttendance
+from attendance.stats import attendance_stats, empty_counts, last_months, monthly_series, range_from_params
 
 from exams.models import Result, Exam, Subject
 from fees.models import FeeStructure, Payment
+from fees.ledger import get_ledger
 from .models import Parent
+from .snapshot import dashboard_snapshot
+from dashboard.pdf_cache import (
+    pdf_key, serve_cached_pdf, remember_pdf, student_inputs, result_inputs, payment_inputs,
+)
 from .forms import ParentLoginForm, ParentProfileForm, UserUpdateForm
 
 
@@ -43,11 +49,8 @@ def parent_login(request):
     """Parent login view"""
     if request.user.is_authenticated:
         # Check if user is a parent
-        try:
-            parent = Parent.objects.get(user=request.user)
+        if request.parent:
             return redirect('parents:dashboard')
-        except Parent.DoesNotExist:
-            pass
     
     if request.method == 'POST':
         form = ParentLoginForm(request, data=request.POST)
@@ -84,7 +87,7 @@ def parent_login(request):
         form = ParentLoginForm()
     
     # Get school settings for branding
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     
     context = {
         'form': form,
@@ -109,9 +112,8 @@ def parent_logout(request):
 @permission_required('parents.view_parent_dashboard', raise_exception=True)
 def parent_dashboard(request):
     """Parent Dashboard - Main view"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         messages.error(request, "Parent profile not found. Please contact administrator.")
         logout(request)
         return redirect('parents:login')
@@ -122,10 +124,10 @@ def parent_dashboard(request):
         return redirect('parents:login')
     
     # Get school settings
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     
-    # Get parent's students
-    students = parent.students.all().select_related('classroom')
+    # Watoto, mahudhurio, ada na matokeo - snapshot moja iliyo kwenye cache
+    snapshot = dashboard_snapshot(parent)
     
     # Get recent announcements (last 5)
     recent_announcements = Announcement.objects.filter(
@@ -133,45 +135,6 @@ def parent_dashboard(request):
         is_published=True
     ).order_by('-created_at')[:5]
     
-    # Get attendance summary for all children
-    attendance_summary = parent.get_attendance_summary()
-    
-    # Get recent results (last 5)
-    recent_results = []
-    for student in students:
-        results = Result.objects.filter(
-            student=student
-        ).select_related('exam', 'subject').order_by('-exam__date')[:3]
-        recent_results.extend(results)
-    recent_results = recent_results[:5]  # Limit to 5
-    
-    # Get fee summary
-    fee_summary = parent.get_fee_summary()
-    
-    # Calculate overall statistics
-    total_children = students.count()
-    
-    # Calculate average attendance percentage
-    if attendance_summary:
-        avg_attendance = sum(item['percentage'] for item in attendance_summary) / len(attendance_summary)
-    else:
-        avg_attendance = 0
-    
-    # Calculate total fee balance
-    total_balance = parent.get_full_family_balance()
-    
-    # Get today's attendance status
-    today_attendance = []
-    for student in students:
-        attendance = Attendance.objects.filter(
-            student=student,
-            date=timezone.now().date()
-        ).first()
-        today_attendance.append({
-            'student': student,
-            'attendance': attendance
-        })
-    
     # Get upcoming events/announcements
     upcoming_events = Announcement.objects.filter(
         Q(audience='PARENTS') | Q(audience='ALL'),
@@ -183,21 +146,19 @@ def parent_dashboard(request):
     context = {
         'parent': parent,
         'school_settings': school_settings,
-        'students': students,
+        'students': snapshot['children'],
         'recent_announcements': recent_announcements,
-        'attendance_summary': attendance_summary,
-        'recent_results': recent_results,
-        'fee_summary': fee_summary,
-        'today_attendance': today_attendance,
+        'attendance_summary': snapshot['attendance_summary'],
+        'recent_results': snapshot['recent_results'],
+        'fee_summary': snapshot['fee_summary'],
+        'today_attendance': snapshot['today_attendance'],
         'upcoming_events': upcoming_events,
-        'stats': {
-            'total_children': total_children,
-            'avg_attendance': round(avg_attendance, 1),
-            'total_balance': total_balance,
-            'announcements_count': recent_announcements.count(),
-            'results_count': len(recent_results),
-        },
-        'today': timezone.now().date(),
+        'stats': dict(
+            snapshot['stats'],
+            recent_announcements=len(recent_announcements),
+            announcements_count=len(recent_announcements),
+        ),
+        'today': snapshot['date'],
     }
     
     return render(request, 'parents/dashboard.html', context)
@@ -209,9 +170,8 @@ def parent_dashboard(request):
 @permission_required('parents.view_child_attendance', raise_exception=True)
 def child_attendance(request, student_id=None):
     """View child attendance records"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         messages.error(request, "Parent profile not found.")
         return redirect('parents:dashboard')
     
@@ -233,6 +193,10 @@ def child_attendance(request, student_id=None):
         students = parent.students.all()
         selected_student = None
     
+    # Takwimu za watoto wote kwa query moja (miezi kamili ya kalenda)
+    chart_start, chart_end = last_months(6)
+    overall_stats = attendance_stats(students)
+    
     # Process attendance data for each student
     attendance_data = []
     
@@ -259,40 +223,11 @@ def child_attendance(request, student_id=None):
         page_obj = paginator.get_page(page_number)
         
         # Calculate statistics
-        all_attendance = StudentAttendance.objects.filter(student=student)
-        present_count = all_attendance.filter(status='PRESENT').count()
-        absent_count = all_attendance.filter(status='ABSENT').count()
-        late_count = all_attendance.filter(status='LATE').count()
-        excused_count = all_attendance.filter(status='EXCUSED').count()
-        total_count = all_attendance.count()
+        entry = overall_stats.get(student.id)
+        totals = entry['totals'] if entry else empty_counts()
         
-        attendance_percentage = (present_count / total_count * 100) if total_count > 0 else 0
-        
-        # Get monthly attendance for chart
-        monthly_data = []
-        for i in range(6):  # Last 6 months
-            month_date = timezone.now() - timedelta(days=30*i)
-            month_start = month_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            if i > 0:
-                next_month = timezone.now() - timedelta(days=30*(i-1))
-                month_end = next_month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            else:
-                month_end = timezone.now()
-            
-            month_attendance = StudentAttendance.objects.filter(
-                student=student,
-                date__range=[month_start, month_end]
-            )
-            month_present = month_attendance.filter(status='PRESENT').count()
-            month_total = month_attendance.count()
-            month_percentage = (month_present / month_total * 100) if month_total > 0 else 0
-            
-            monthly_data.append({
-                'month': month_start.strftime('%b'),
-                'percentage': round(month_percentage, 1),
-                'present': month_present,
-                'total': month_total
-            })
+        # Get monthly attendance for chart (oldest first)
+        monthly_data = monthly_series(entry, chart_start, chart_end, label='%b')
         
         attendance_data.append({
             'student': student,
@@ -300,14 +235,13 @@ def child_attendance(request, student_id=None):
             'paginator': paginator,
             'page_obj': page_obj,
             'statistics': {
-                'present_count': present_count,
-                'absent_count': absent_count,
-                'late_count': late_count,
-                'excused_count': excused_count,
-                'total_count': total_count,
-                'percentage': round(attendance_percentage, 1)
+                'present_count': totals['present'],
+                'absent_count': totals['absent'],
+                'late_count': totals['late'],
+                'total_count': totals['total'],
+                'percentage': totals['percentage'],
             },
-            'monthly_data': monthly_data[::-1],  # Reverse to show oldest first
+            'monthly_data': monthly_data,
             'filter': {
                 'month': filter_month,
                 'year': filter_year,
@@ -335,13 +269,18 @@ def child_attendance(request, student_id=None):
 @permission_required('parents.view_child_attendance', raise_exception=True)
 def attendance_summary_api(request):
     """API endpoint for attendance summary chart"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         return JsonResponse({'error': 'Parent not found'}, status=404)
     
     student_id = request.GET.get('student_id')
-    months = int(request.GET.get('months', 6))
+    if student_id and not student_id.isdigit():
+        return JsonResponse({'error': 'student_id must be a positive integer'}, status=400)
+    try:
+        start, end = range_from_params(request.GET)
+    except ValueError:
+        # Tarehe isiyo halali (mf. 2025-02-30) au months kubwa kupita kiasi
+        return JsonResponse({'error': 'Invalid date range'}, status=400)
     
     if student_id:
         student = get_object_or_404(Student, id=student_id)
@@ -351,51 +290,22 @@ def attendance_summary_api(request):
     else:
         students = parent.students.all()
     
-    data = []
+    stats = attendance_stats(students, start, end)
     
+    data = []
     for student in students:
-        student_data = {
+        entry = stats.get(student.id)
+        totals = entry['totals'] if entry else empty_counts()
+        data.append({
+            'student_id': student.id,
             'student_name': student.full_name,
-            'months': [],
-            'total_present': 0,
-            'total_days': 0
-        }
-        
-        for i in range(months):
-            month_date = timezone.now() - timedelta(days=30*i)
-            month_start = month_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            
-            if i > 0:
-                next_month = timezone.now() - timedelta(days=30*(i-1))
-                month_end = next_month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            else:
-                month_end = timezone.now()
-            
-            month_attendance = StudentAttendance.objects.filter(
-                student=student,
-                date__range=[month_start, month_end]
-            )
-            
-            month_present = month_attendance.filter(status='PRESENT').count()
-            month_total = month_attendance.count()
-            
-            student_data['months'].append({
-                'month': month_start.strftime('%b %Y'),
-                'present': month_present,
-                'total': month_total,
-                'percentage': (month_present / month_total * 100) if month_total > 0 else 0
-            })
-            
-            student_data['total_present'] += month_present
-            student_data['total_days'] += month_total
-        
-        student_data['overall_percentage'] = (
-            student_data['total_present'] / student_data['total_days'] * 100
-        ) if student_data['total_days'] > 0 else 0
-        
-        data.append(student_data)
+            'months': monthly_series(entry, start, end),
+            'total_present': totals['present'],
+            'total_days': totals['total'],
+            'overall_percentage': totals['percentage'],
+        })
     
-    return JsonResponse({'data': data})
+    return JsonResponse({'data': data, 'start': start.isoformat(), 'end': end.isoformat()})
 
 
 # ==================== RESULTS VIEWS ====================
@@ -404,9 +314,8 @@ def attendance_summary_api(request):
 @permission_required('parents.view_child_results', raise_exception=True)
 def child_results(request, student_id=None):
     """View child academic results"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         messages.error(request, "Parent profile not found.")
         return redirect('parents:dashboard')
     
@@ -563,9 +472,8 @@ def child_results(request, student_id=None):
 @permission_required('parents.view_child_results', raise_exception=True)
 def download_results_pdf(request, student_id):
     """Download results PDF for a specific child"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         messages.error(request, "Parent profile not found.")
         return redirect('parents:dashboard')
     
@@ -577,7 +485,7 @@ def download_results_pdf(request, student_id):
         return redirect('parents:dashboard')
     
     # Get school settings
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     
     # Get student results
     results = Result.objects.filter(student=student).select_related('exam', 'subject')
@@ -586,6 +494,11 @@ def download_results_pdf(request, student_id):
         messages.warning(request, "No results available to download.")
         return redirect('parents:child_results')
     
+    cache_key = pdf_key('parent_results', student_inputs(student), result_inputs(student))
+    cached = serve_cached_pdf(request, cache_key)
+    if cached:
+        return cached
+    
     # Create PDF
     buffer = BytesIO()
     doc = SimpleDocTemplate(
@@ -619,14 +532,9 @@ def download_results_pdf(request, student_id):
     )
     
     # School header
-    if school_settings and school_settings.logo:
-        try:
-            logo_path = school_settings.logo.path
-            if os.path.exists(logo_path):
-                logo = Image(logo_path, width=1.5*inch, height=1.5*inch)
-                elements.append(logo)
-        except:
-            pass
+    logo = school_logo()
+    if logo:
+        elements.append(logo.flowable(width=1.5*inch, height=1.5*inch))
     
     school_name = school_settings.name if school_settings else "SCHOOL MANAGEMENT SYSTEM"
     school_address = school_settings.address if school_settings else ""
@@ -790,7 +698,7 @@ def download_results_pdf(request, student_id):
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     response.write(pdf)
     
-    return response
+    return remember_pdf(cache_key, response)
 
 
 # ==================== FEES VIEWS ====================
@@ -799,9 +707,8 @@ def download_results_pdf(request, student_id):
 @permission_required('parents.view_child_fees', raise_exception=True)
 def child_fees(request, student_id=None):
     """View child fee balances and payments"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         messages.error(request, "Parent profile not found.")
         return redirect('parents:dashboard')
     
@@ -870,12 +777,10 @@ def child_fees(request, student_id=None):
         page_number = request.GET.get('page')
         page_obj = paginator.get_page(page_number)
         
-        # Calculate statistics
-        total_paid = Payment.objects.filter(student=student).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-        
-        balance = total_fee - total_paid
+        # Calculate statistics from the fee ledger (indexed lookup, no aggregate)
+        fee_ledger = get_ledger(student)
+        total_paid = fee_ledger.total_paid
+        balance = fee_ledger.balance
         
         # Calculate payment percentage
         payment_percentage = (total_paid / total_fee * 100) if total_fee > 0 else 0
@@ -966,9 +871,8 @@ def child_fees(request, student_id=None):
 @permission_required('parents.view_child_fees', raise_exception=True)
 def download_fee_statement(request, student_id):
     """Download fee statement PDF for a specific child"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         messages.error(request, "Parent profile not found.")
         return redirect('parents:dashboard')
     
@@ -979,8 +883,13 @@ def download_fee_statement(request, student_id):
         messages.error(request, "Access denied to this student's records.")
         return redirect('parents:dashboard')
     
+    cache_key = pdf_key('parent_fee_statement', student_inputs(student), payment_inputs(student))
+    cached = serve_cached_pdf(request, cache_key)
+    if cached:
+        return cached
+    
     # Get school settings
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     
     # Get fee data
     if student.classroom:
@@ -1023,14 +932,9 @@ def download_fee_statement(request, student_id):
     )
     
     # School header
-    if school_settings and school_settings.logo:
-        try:
-            logo_path = school_settings.logo.path
-            if os.path.exists(logo_path):
-                logo = Image(logo_path, width=1.5*inch, height=1.5*inch)
-                elements.append(logo)
-        except:
-            pass
+    logo = school_logo()
+    if logo:
+        elements.append(logo.flowable(width=1.5*inch, height=1.5*inch))
     
     school_name = school_settings.name if school_settings else "SCHOOL MANAGEMENT SYSTEM"
     school_address = school_settings.address if school_settings else ""
@@ -1234,7 +1138,7 @@ def download_fee_statement(request, student_id):
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     response.write(pdf)
     
-    return response
+    return remember_pdf(cache_key, response)
 
 
 # ==================== ANNOUNCEMENTS VIEWS ====================
@@ -1243,9 +1147,8 @@ def download_fee_statement(request, student_id):
 @permission_required('parents.view_school_announcements', raise_exception=True)
 def announcements(request):
     """View school announcements"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         messages.error(request, "Parent profile not found.")
         return redirect('parents:dashboard')
     
@@ -1325,9 +1228,8 @@ def announcements(request):
 @permission_required('parents.view_school_announcements', raise_exception=True)
 def announcement_detail(request, announcement_id):
     """View announcement detail"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         messages.error(request, "Parent profile not found.")
         return redirect('parents:dashboard')
     
@@ -1360,9 +1262,8 @@ def announcement_detail(request, announcement_id):
 @login_required
 def profile(request):
     """Parent profile view and update"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         messages.error(request, "Parent profile not found.")
         return redirect('home')
     
@@ -1408,9 +1309,8 @@ def profile(request):
 @login_required
 def change_password(request):
     """Change password view"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         messages.error(request, "Parent profile not found.")
         return redirect('parents:dashboard')
     
@@ -1452,23 +1352,11 @@ def change_password(request):
 @login_required
 def get_dashboard_stats(request):
     """API endpoint for dashboard statistics"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         return JsonResponse({'error': 'Parent not found'}, status=404)
     
-    # Get statistics
-    children_count = parent.children_count
-    attendance_summary = parent.get_attendance_summary()
-    fee_summary = parent.get_fee_summary()
-    
-    # Calculate averages
-    if attendance_summary:
-        avg_attendance = sum(item['percentage'] for item in attendance_summary) / len(attendance_summary)
-    else:
-        avg_attendance = 0
-    
-    total_balance = sum(item['balance'] for item in fee_summary)
+    snapshot = dashboard_snapshot(parent)
     
     # Get recent announcements count
     recent_announcements_count = Announcement.objects.filter(
@@ -1486,9 +1374,9 @@ def get_dashboard_stats(request):
     ).count()
     
     stats = {
-        'children_count': children_count,
-        'avg_attendance': round(avg_attendance, 1),
-        'total_balance': total_balance,
+        'children_count': snapshot['stats']['total_children'],
+        'avg_attendance': snapshot['stats']['avg_attendance'],
+        'total_balance': snapshot['stats']['total_balance'],
         'recent_announcements': recent_announcements_count,
         'upcoming_events': upcoming_events_count,
         'today': timezone.now().strftime('%Y-%m-%d')
@@ -1500,20 +1388,20 @@ def get_dashboard_stats(request):
 @login_required
 def get_child_list(request):
     """API endpoint for child list"""
-    try:
-        parent = Parent.objects.get(user=request.user)
-    except Parent.DoesNotExist:
+    parent = request.parent
+    if not parent:
         return JsonResponse({'error': 'Parent not found'}, status=404)
     
-    children = []
-    for student in parent.students.all():
-        children.append({
-            'id': student.id,
-            'name': student.full_name,
-            'class': str(student.classroom) if student.classroom else 'N/A',
-            'registration_number': student.registration_number,
-            'avatar_initials': student.full_name[:2].upper() if len(student.full_name) >= 2 else student.full_name[0].upper()
-        })
+    children = [
+        {
+            'id': child['id'],
+            'name': child['full_name'],
+            'class': child['classroom'] or 'N/A',
+            'registration_number': child['registration_number'],
+            'avatar_initials': child['avatar_initials'],
+        }
+        for child in dashboard_snapshot(parent)['children']
+    ]
     
     return JsonResponse({'children': children})
 
@@ -1543,11 +1431,8 @@ def parent_register(request):
     """Parent registration view"""
     # If user is already logged in, redirect to dashboard
     if request.user.is_authenticated:
-        try:
-            parent = Parent.objects.get(user=request.user)
+        if request.parent:
             return redirect('parents:dashboard')
-        except Parent.DoesNotExist:
-            pass
     
     if request.method == 'POST':
         form = ParentRegistrationForm(request.POST, request.FILES)
@@ -1578,7 +1463,7 @@ def parent_register(request):
         form = ParentRegistrationForm()
     
     # Get school settings
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     
     context = {
         'form': form,
@@ -1592,7 +1477,7 @@ def parent_register(request):
 
 def registration_success(request):
     """Registration success page"""
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     
     context = {
         'school_settings': school_settings,
@@ -1604,7 +1489,7 @@ def registration_success(request):
 
 def registration_closed(request):
     """Registration closed page"""
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     
     context = {
         'school_settings': school_settings,
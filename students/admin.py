@@ -59,8 +59,8 @@ class CertificateAdmin(admin.ModelAdmin):
 
     
     def download_link(self, obj):
-        if obj.file:
-            cdn_url = str(obj.file.cdn_url)
+        cdn_url = obj.get_file_url()  # columns za ndani, bila API call
+        if cdn_url:
             return format_html(
                 '<a href="{}" target="_blank" '
                 'style="background:#4361ee;color:white;padding:4px 10px;'
@@ -0,0 +1,224 @@
+# students/batch.py
+"""
+Kutengeneza report cards / ID cards za darasa zima (au shule nzima) kwa mkupuo.
+
+All database reads happen up front in a handful of queries (students,
+results or subjects, SchoolSettings). The rendering itself touches no
+database and runs in a ProcessPoolExecutor, one worker per core by default.
+
+Every student's PDF is written to `<output>.parts/` under a name that
+includes its input fingerprint (the same pdf_key() the download views use).
+A rerun after a crash or Ctrl-C skips the parts that are already there and
+still current, then assembles a ZIP of per-student files or a single merged
+PDF. The parts directory is removed once the output is written.
+
+The ClassRoom admin actions queue a `class_documents` BackgroundJob;
+run_job() is its handler (see dashboard/jobs.py).
+"""
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dashboard.school_settings import get_school_settings
+from dashboard.pdf_cache import pdf_key, settings_stamp, student_inputs
+from exams.models import Result
+from .documents import id_card_subject, render_id_card, render_results_pdf
+from .models import Student
+
+KINDS = ('report_cards', 'id_cards')
+FORMATS = ('zip', 'pdf')
+
+
+def file_safe(value):
+    return re.sub(r'[^A-Za-z0-9_-]+', '-', str(value)).strip('-')
+
+
+def _result_inputs(rows):
+    # Sawa na pdf_cache.result_inputs() lakini kutoka rows zilizokwisha pakiwa
+    return tuple(
+        (r.pk, r.marks, r.subject.name, r.exam.name, r.exam.date, r.exam.exam_type)
+        for r in rows
+    )
+
+
+def load_jobs(kind, classrooms=None):
+    """
+    Preload everything needed to render `kind` for these classrooms (None = whole school).
+
+    Returns (jobs, skipped, school_settings). Each job is a dict with the
+    student, the render payload, the file name inside the output and the part
+    name; `skipped` lists students with nothing to render (no results yet).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown document kind: {kind}")
+
+    students = Student.objects.select_related('classroom').order_by('classroom__name', 'full_name', 'pk')
+    if classrooms is not None:
+        students = students.filter(classroom__in=classrooms)
+    students = list(students)
+
+    school_settings = get_school_settings()
+    stamp = settings_stamp(school_settings)
+
+    payloads = {}
+    if kind == 'report_cards':
+        rows = defaultdict(list)
+        for result in (
+            Result.objects.filter(student__in=[s.pk for s in students])
+            .select_related('exam', 'subject')
+            .order_by('student_id', 'pk')
+        ):
+            rows[result.student_id].append(result)
+        for student in students:
+            if rows[student.pk]:
+                key = pdf_key('student_results', student_inputs(student), _result_inputs(rows[student.pk]), stamp=stamp)
+                payloads[student.pk] = (rows[student.pk], key)
+    else:
+        from classes.models import Subject
+        names = defaultdict(list)
+        for classroom_id, name in Subject.objects.filter(
+            classroom_id__in={s.classroom_id for s in students if s.classroom_id}
+        ).values_list('classroom_id', 'name'):
+            names[classroom_id].append(name)
+        for student in students:
+            subject = id_card_subject(student, names[student.classroom_id])
+            payloads[student.pk] = (subject, pdf_key('id_card', student_inputs(student), subject, stamp=stamp))
+
+    jobs, skipped = [], []
+    for student in students:
+        if student.pk not in payloads:
+            skipped.append(student)
+            continue
+        payload, key = payloads[student.pk]
+        reg = file_safe(student.registration_number)
+        if kind == 'report_cards':
+            filename = f"Academic_Transcript_{reg}_{file_safe(student.full_name.replace(' ', '_'))}.pdf"
+        else:
+            filename = f"ID_CARD_{reg}.pdf"
+        jobs.append({
+            'student': student,
+            'payload': payload,
+            'filename': filename,
+            'part': f'{reg}-{key}.pdf',
+        })
+    return jobs, skipped, school_settings
+
+
+def _init_worker():
+    # Kwa spawn (si fork) process mpya haina Django iliyo tayari
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+        django.setup()
+
+
+def render_part(kind, student, payload, school_settings, path):
+    """Render one student's PDF to `path` (atomically). Runs inside a worker process."""
+    if kind == 'report_cards':
+        pdf = render_results_pdf(student, payload, school_settings)
+    else:
+        pdf = render_id_card(student, school_settings, payload)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(pdf)
+    os.replace(tmp, path)
+    return path
+
+
+def _assemble(jobs, parts_dir, output, fmt):
+    tmp = f'{output}.tmp'
+    if fmt == 'zip':
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for job in jobs:
+                archive.write(os.path.join(parts_dir, job['part']), job['filename'])
+    else:
+        from pypdf import PdfWriter
+        writer = PdfWriter()
+        for job in jobs:
+            writer.append(os.path.join(parts_dir, job['part']))
+        with open(tmp, 'wb') as fh:
+            writer.write(fh)
+        writer.close()
+    os.replace(tmp, output)
+
+
+def generate(kind, output, classrooms=None, fmt='zip', workers=None, resume=True, progress=None):
+    """
+    Render `kind` for every student in `classrooms` and write `output` (.zip or merged .pdf).
+
+    progress(done, total, student, cached) is called after each student.
+    Returns a dict with the output path and rendered/resumed/skipped counts.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+
+    jobs, skipped, school_settings = load_jobs(kind, classrooms)
+    parts_dir = f'{output}.parts'
+    if not resume:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    existing = set(os.listdir(parts_dir))
+    todo = [job for job in jobs if job['part'] not in existing]
+    total, done = len(jobs), 0
+    for job in jobs:
+        if job['part'] in existing:
+            done += 1
+            if progress:
+                progress(done, total, job['student'], True)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(todo) <= 1:
+        for job in todo:
+            render_part(kind, job['student'], job['payload'], school_settings, os.path.join(parts_dir, job['part']))
+            done += 1
+            if progress:
+                progress(done, total, job['student'], False)
+    elif todo:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo)), initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(
+                    render_part, kind, job['student'], job['payload'], school_settings,
+                    os.path.join(parts_dir, job['part']),
+                ): job
+                for job in todo
+            }
+            for future in as_completed(futures):
+                future.result()
+                done += 1
+                if progress:
+                    progress(done, total, futures[future]['student'], False)
+
+    if jobs:
+        _assemble(jobs, parts_dir, output, fmt)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+
+    return {
+        'output': output if jobs else None,
+        'rendered': len(todo),
+        'resumed': total - len(todo),
+        'skipped': skipped,
+    }
+
+
+def run_job(job):
+    """dashboard.jobs handler: params kind, classrooms [pk] and format; the file goes to the job result storage."""
+    from classes.models import ClassRoom
+    from dashboard import jobs
+
+    kind, fmt = job.params['kind'], job.params.get('format', 'zip')
+    classrooms = list(ClassRoom.objects.filter(pk__in=job.params['classrooms']))
+    # Jina la kudumu kwa job: ikijaribiwa tena kwenye mashine hii inaendelea ilipoishia
+    output = os.path.join(tempfile.gettempdir(), 'class_documents', f'job-{job.pk}.{fmt}')
+    summary = generate(kind, output, classrooms=classrooms, fmt=fmt, progress=jobs.progress_callback(job))
+    if not summary['output']:
+        return 'Nothing to generate'
+    label = '_'.join(file_safe(c.code or c.pk) for c in classrooms)
+    jobs.save_result(job, output, f"{kind}-{label}-{job.created_at:%Y%m%d}.{fmt}")
+    return f"{summary['rendered'] + summary['resumed']} students, {len(summary['skipped'])} skipped"
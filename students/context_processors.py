@@ -1,14 +1,11 @@
 # students/context_processors.py  ← tengeneza file hii
 
-from students.models import Student
-
 def student_context(request):
     """Weka student kwenye context kila page kwa student users."""
     if request.user.is_authenticated and hasattr(request.user, 'role'):
         if request.user.role == 'STUDENT':
-            try:
-                student = Student.objects.get(user=request.user)
+            # request.student ni ile ile view imetumia, hakuna query ya pili
+            student = getattr(request, 'student', None)
+            if student:
                 return {'student': student}
-            except Student.DoesNotExist:
-                pass
     return {}
\ No newline at end of file
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from students.models import Student
 from accounts.models import User
-from students.utils import create_student_user
+from students.provisioning import provision
 import logging
 import re
 
@@ -67,6 +67,17 @@ class Command(BaseCommand):
         created_count = 0
         skipped_count = 0
         
+        # Accounts zinazokosekana kwa mkupuo mmoja (usernames za herufi ndogo);
+        # --keep-case inabaki kwenye njia ya mmoja mmoja hapo chini
+        if (options['create_missing'] or options['force']) and not options['keep_case']:
+            missing = students.filter(user__isnull=True)
+            self.stdout.write(f"\n👥 Creating {missing.count()} missing user accounts in bulk...")
+            summary = provision(missing)
+            created_count += len(summary['created'])
+            error_count += len(summary['failed'])
+            for student, error in summary['failed']:
+                self.stdout.write(self.style.ERROR(f"  ❌ {student.registration_number}: {error}"))
+        
         self.stdout.write(f"\n🔍 Processing {students.count()} students...\n")
         
         for student in students:
@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from classes.models import ClassRoom
+from students import batch
+
+
+class Command(BaseCommand):
+    help = 'Generate report cards or ID cards for whole classes (merged PDF or ZIP), in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=batch.KINDS)
+        parser.add_argument(
+            '--classroom',
+            action='append',
+            default=[],
+            help='Classroom id or code (repeat for several classes)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Every student in the school'
+        )
+        parser.add_argument(
+            '--format',
+            choices=batch.FORMATS,
+            default='zip',
+            help='zip = one PDF per student, pdf = one merged PDF (default zip)'
+        )
+        parser.add_argument(
+            '--output',
+            help='Output file (default ./<kind>-<classes>-<date>.<format>)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Worker processes (default: one per CPU core)'
+        )
+        parser.add_argument(
+            '--no-resume',
+            action='store_true',
+            help='Ignore parts left by an interrupted run and render everything again'
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        if options['all']:
+            classrooms = None
+            label = 'school'
+        elif options['classroom']:
+            classrooms = []
+            for value in options['classroom']:
+                lookup = {'pk': value} if value.isdigit() else {'code__iexact': value}
+                try:
+                    classrooms.append(ClassRoom.objects.get(**lookup))
+                except (ClassRoom.DoesNotExist, ClassRoom.MultipleObjectsReturned):
+                    raise CommandError(f"Classroom not found (or code is ambiguous): {value}")
+            label = '_'.join(batch.file_safe(c.code or c.pk) for c in classrooms)
+        else:
+            raise CommandError('Pass --classroom (one or more) or --all')
+
+        # Si chini ya MEDIA: faili hizi zina taarifa za wanafunzi
+        output = options['output'] or f"{kind}-{label}-{timezone.now():%Y%m%d}.{options['format']}"
+
+        self.stdout.write(f"\n📄 Generating {kind} for {label} → {output}\n")
+
+        def progress(done, total, student, cached):
+            note = ' (resumed)' if cached else ''
+            self.stdout.write(f"  [{done}/{total}] {student.registration_number}{note}")
+
+        summary = batch.generate(
+            kind,
+            output,
+            classrooms=classrooms,
+            fmt=options['format'],
+            workers=options['workers'],
+            resume=not options['no_resume'],
+            progress=progress,
+        )
+
+        for student in summary['skipped']:
+            self.stdout.write(self.style.WARNING(f"  ⚠️ {student.registration_number}: no results, skipped"))
+        if not summary['output']:
+            self.stdout.write(self.style.WARNING("\n⚠️ Nothing to generate"))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ {summary['output']}: {summary['rendered']} rendered, {summary['resumed']} resumed"
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from classes.models import ClassRoom
+from students.models import Student
+from students.provisioning import provision
+
+
+class Command(BaseCommand):
+    help = 'Create user accounts for every student without one (bulk insert, passwords hashed in parallel)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--classroom',
+            action='append',
+            default=[],
+            help='Only this classroom id or code (repeat for several classes); default all students'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Password hashing processes (default: one per CPU core)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Users inserted per transaction (default 200)'
+        )
+
+    def handle(self, *args, **options):
+        students = Student.objects.filter(user__isnull=True).order_by('registration_number')
+        if options['classroom']:
+            classrooms = []
+            for value in options['classroom']:
+                lookup = {'pk': value} if value.isdigit() else {'code__iexact': value}
+                try:
+                    classrooms.append(ClassRoom.objects.get(**lookup))
+                except (ClassRoom.DoesNotExist, ClassRoom.MultipleObjectsReturned):
+                    raise CommandError(f"Classroom not found (or code is ambiguous): {value}")
+            students = students.filter(classroom__in=classrooms)
+
+        students = list(students)
+        self.stdout.write(f"\n👥 Creating user accounts for {len(students)} students...\n")
+
+        def progress(done, total):
+            self.stdout.write(f"  [{done}/{total}]")
+
+        summary = provision(
+            students,
+            workers=options['workers'],
+            batch_size=max(options['batch_size'], 1),
+            progress=progress,
+        )
+
+        for student, error in summary['failed']:
+            self.stdout.write(self.style.ERROR(f"  ❌ {student.registration_number}: {error}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ Created {len(summary['created'])} user accounts. {len(summary['failed'])} failed."
+        ))
@@ -90,12 +90,34 @@ class Student(models.Model):
         super().save(*args, **kwargs)
 
 
+class RegistrationSequence(models.Model):
+    """
+    Namba ya mwisho ya registration iliyotolewa kwa kila (darasa, mwaka).
+
+    Advanced only by students.utils.reserve_registration_numbers(), with an
+    UPDATE ... SET last_number = last_number + n, so concurrent requests
+    never get the same number.
+    """
+    class_code = models.CharField(max_length=20)
+    year = models.PositiveIntegerField()
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Registration Sequence"
+        verbose_name_plural = "Registration Sequences"
+        unique_together = ('class_code', 'year')
+
+    def __str__(self):
+        return f"CA/{self.class_code}/{self.year}: {self.last_number}"
+
+
 
 
 #
 from pyuploadcare.dj.models import FileField as UploadcareFileField
+from dashboard.models import UploadcareFileMeta
 
-class Certificate(models.Model):
+class Certificate(UploadcareFileMeta):
     CERTIFICATE_TYPES = (
         ('COMPLETION',    'Certificate of Completion'),
         ('ACHIEVEMENT',   'Certificate of Achievement'),
@@ -140,9 +162,3 @@ class Certificate(models.Model):
 
     def __str__(self):
         return f"{self.title} — {self.student.full_name}"
-
-    def get_file_url(self):
-        """Rudisha CDN URL ya Uploadcare"""
-        if self.file:
-            return str(self.file.cdn_url)
-        return None
\ No newline at end of file
@@ -0,0 +1,175 @@
+# students/provisioning.py
+"""
+Kuwatengenezea wanafunzi wengi user accounts kwa mkupuo.
+
+create_student_user() costs a few queries and one PBKDF2 hash per student,
+serially. provision() does the same job for a whole intake:
+
+  * every username already taken under the same registration prefixes is
+    read in one query, and collisions (ca/cs1/2024/0001 -> ..._1, ..._2)
+    are resolved in memory. Comparison is on User.login_key, so a new
+    username can never be a '/'-'_' or upper/lower variant of an existing one;
+  * passwords are hashed in a ProcessPoolExecutor, one worker per core;
+  * users are inserted with bulk_create and linked with bulk_update, one
+    transaction per batch. The batch's students are locked first
+    (select_for_update, skip_locked) and usernames are planned under that
+    lock, so a second run at the same time skips students the first one
+    holds or has already linked instead of giving them `_1` accounts.
+
+Large intakes run as a `provision_student_users` background job (run_job()
+below, see dashboard/jobs.py); only one such job is queued at a time.
+
+Usernames, passwords and e-mails follow create_student_user().
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from accounts.models import User
+from dashboard import jobs
+from .batch import _init_worker
+from .models import Student
+
+logger = logging.getLogger(__name__)
+
+
+def account_fields(student, username):
+    """Email, first and last name for a student's new User, as in create_student_user()."""
+    email = student.email or f"{username.replace('/', '_')}@charlesacademy.com"
+    name_parts = student.full_name.split()
+    if len(name_parts) >= 2:
+        return email, name_parts[0], ' '.join(name_parts[1:])
+    return email, student.full_name, ''
+
+
+def _base_username(student):
+    return student.registration_number.strip().lower().replace(' ', '')
+
+
+def taken_login_keys(bases):
+    """login_keys of existing users under these usernames' prefixes, in one query."""
+    prefixes = {User.make_login_key(base).rpartition('_')[0] or User.make_login_key(base) for base in bases}
+    if not prefixes:
+        return set()
+    query = reduce(or_, (Q(login_key__startswith=prefix) for prefix in prefixes))
+    return set(User.objects.filter(query).values_list('login_key', flat=True))
+
+
+def plan_usernames(students, taken=None):
+    """{student.pk: username}, unique against existing users and each other."""
+    bases = {student.pk: _base_username(student) for student in students}
+    taken = taken_login_keys(bases.values()) if taken is None else taken
+    usernames = {}
+    for student in students:
+        base = username = bases[student.pk]
+        counter = 1
+        while User.make_login_key(username) in taken:
+            username = f"{base}_{counter}"
+            counter += 1
+        taken.add(User.make_login_key(username))
+        usernames[student.pk] = username
+    return usernames
+
+
+def hash_passwords(passwords, workers=None):
+    """make_password() for each password, spread over worker processes."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) <= 1:
+        return [make_password(p) for p in passwords]
+    with ProcessPoolExecutor(max_workers=min(workers, len(passwords)), initializer=_init_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(len(passwords) // (workers * 4), 1)))
+
+
+def _insert(batch, hashes):
+    """Lock, plan and link one batch. Returns (students linked, their users)."""
+    users = []
+    with transaction.atomic():
+        free = set(
+            Student.objects.select_for_update(skip_locked=True)
+            .filter(pk__in=[s.pk for s in batch], user__isnull=True)
+            .values_list('pk', flat=True)
+        )
+        # Wengine wameshapewa account (au run nyingine inawashughulikia sasa hivi)
+        batch = [student for student in batch if student.pk in free]
+        if not batch:
+            return [], []
+        usernames = plan_usernames(batch)
+        for student in batch:
+            username = usernames[student.pk]
+            email, first_name, last_name = account_fields(student, username)
+            users.append(User(
+                username=username,
+                login_key=User.make_login_key(username),  # bulk_create haiiti save()
+                email=email,
+                first_name=first_name,
+                last_name=last_name,
+                password=hashes[student.pk],
+                role='STUDENT',
+            ))
+        User.objects.bulk_create(users)
+        for student, user in zip(batch, users):
+            student.user = user
+        Student.objects.bulk_update(batch, ['user'])
+        from parents.snapshot import bump_students
+        bump_students([student.pk for student in batch])
+    return batch, users
+
+
+def provision(students=None, workers=None, batch_size=200, progress=None):
+    """
+    Create and link a User for every student in `students` that has none
+    (default: all such students).
+
+    progress(done, total) is called after each batch. Returns a dict with
+    `created` [(student, user)], `failed` [(student, error)] and `skipped`
+    [student] (linked or being linked by another run meanwhile).
+    """
+    if students is None:
+        students = Student.objects.filter(user__isnull=True)
+    students = [s for s in students if not s.user_id]
+    created, failed, skipped = [], [], []
+    if not students:
+        return {'created': created, 'failed': failed, 'skipped': skipped}
+
+    hashed = hash_passwords([f"{student.get_first_name()}@123" for student in students], workers)
+    hashes = {student.pk: h for student, h in zip(students, hashed)}
+
+    total, done = len(students), 0
+    for start in range(0, total, batch_size):
+        batch = students[start:start + batch_size]
+        try:
+            linked, users = _insert(batch, hashes)
+        except IntegrityError:
+            # Mtu mwingine ametengeneza username hizi wakati huo huo; jaribu tena, inapanga upya
+            try:
+                linked, users = _insert(batch, hashes)
+            except IntegrityError as e:
+                logger.error(f"✗ Could not create users for batch starting {batch[0].registration_number}: {e}")
+                for student in batch:
+                    student.user = None
+                failed += [(student, str(e)) for student in batch]
+                linked = users = None
+        if linked is not None:
+            created += list(zip(linked, users))
+            skipped += [student for student in batch if student not in linked]
+        done += len(batch)
+        if progress:
+            progress(done, total)
+
+    logger.info(f"✓ Provisioned {len(created)} student users, {len(failed)} failed, {len(skipped)} skipped")
+    return {'created': created, 'failed': failed, 'skipped': skipped}
+
+
+def run_job(job):
+    """dashboard.jobs handler for `provision_student_users`: every student without a user."""
+    summary = provision(workers=job.params.get('workers'), progress=jobs.progress_callback(job))
+    return (
+        f"Created {len(summary['created'])} user accounts. {len(summary['failed'])} failed, "
+        f"{len(summary['skipped'])} already handled."
+    )
@@ -1,13 +1,14 @@
 from accounts.models import User
-from django.core.mail import send_mail
+from dashboard.outbox import queue_email
 from django.conf import settings
-from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.urls import reverse
-from .models import Student
+from .models import RegistrationSequence, Student
 import logging
 import re
 from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 
 logger = logging.getLogger(__name__)
 
@@ -20,25 +21,66 @@ def generate_registration_number(class_code, year, sequence_number):
         logger.error(f"Error generating reg number: {e}")
         return f"CA/{class_code}/{year}/0001"
 
+def _highest_existing_sequence(class_code, year):
+    """Namba kubwa iliyopo tayari kwenye CA/CLASS/YEAR/NNNN (mara moja tu, counter ikianzishwa)"""
+    highest = 0
+    for reg in Student.objects.filter(
+        registration_number__startswith=f"CA/{class_code}/{year}/"
+    ).values_list('registration_number', flat=True):
+        match = re.search(r'/(\d+)$', reg)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def reserve_registration_numbers(class_code, year, count=1):
+    """
+    Reserve `count` consecutive sequence numbers for class/year and return them as a range.
+
+    One UPDATE with an F() increment: the row stays locked until the
+    caller's transaction ends, so concurrent adds and bulk imports never
+    share a number. Numbers taken by a rolled-back transaction go back.
+    """
+    class_code = class_code.strip().upper()
+    year = int(year)
+    counters = RegistrationSequence.objects.filter(class_code=class_code, year=year)
+    with transaction.atomic():
+        if not counters.update(last_number=F('last_number') + count):
+            # Counter mpya: anza baada ya wanafunzi waliopo (get_or_create inashughulikia race)
+            RegistrationSequence.objects.get_or_create(
+                class_code=class_code, year=year,
+                defaults={'last_number': _highest_existing_sequence(class_code, year)},
+            )
+            counters.update(last_number=F('last_number') + count)
+        last = counters.values_list('last_number', flat=True).get()
+    return range(last - count + 1, last + 1)
+
+
+def allocate_registration_numbers(class_code, year, count=1):
+    """`count` new registration numbers (CA/CLASS/YEAR/NNNN) for a bulk import."""
+    return [
+        generate_registration_number(class_code.strip().upper(), year, sequence)
+        for sequence in reserve_registration_numbers(class_code, year, count)
+    ]
+
+
+def note_registration_number(registration_number):
+    """A manually typed CA/CLASS/YEAR/NNNN: move the counter past it so it is never handed out again"""
+    match = re.match(r'^CA/([^/]+)/(\d{4})/(\d+)$', (registration_number or '').strip().upper())
+    if not match:
+        return
+    class_code, year, number = match.group(1), int(match.group(2)), int(match.group(3))
+    with transaction.atomic():
+        reserve_registration_numbers(class_code, year, 0)
+        RegistrationSequence.objects.filter(class_code=class_code, year=year).update(
+            last_number=Greatest(F('last_number'), number)
+        )
+
+
 def get_next_registration_sequence(class_code, year):
-    """Pata nambari inayofuata ya registration kwa darasa na mwaka"""
-    try:
-        # Tafuta registration number ya mwisho kwa darasa hilo na mwaka
-        last_student = Student.objects.filter(
-            classroom__code=class_code,
-            admission_year=year
-        ).order_by('-registration_number').first()
-        
-        if last_student and last_student.registration_number:
-            # Extract sequence number from registration number
-            match = re.search(r'/(\d{4})$', last_student.registration_number)
-            if match:
-                return int(match.group(1)) + 1
-        
-        return 1
-    except Exception as e:
-        logger.error(f"Error getting sequence: {e}")
-        return 1
+    """Pata (na uhifadhi) nambari inayofuata ya registration kwa darasa na mwaka"""
+    return reserve_registration_numbers(class_code, year)[0]
+
 def create_username_from_reg_number(registration_number):
     """Create username kutoka kwa registration number (keep original format)"""
     # Return registration number as-is (lowercase)
@@ -112,7 +154,7 @@ def create_student_user(student, password=None):
         raise
 
 def send_student_credentials(student, user, password, request=None):
-    """Send login credentials to student email"""
+    """Queue login credentials to student email (sent by `manage.py send_outbox`)"""
     try:
         # Check email configuration
         if not all([settings.EMAIL_HOST, settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD]):
@@ -128,18 +170,20 @@ def send_student_credentials(student, user, password, request=None):
         # Prepare subject
         subject = f"Student Portal Login Credentials - {student.registration_number}"
         
-        # Prepare context for template
+        # Context ya template (JSON, worker ataitumia baadaye)
         context = {
-            'student': student,
-            'user': user,
+            'student': {
+                'full_name': student.full_name,
+                'registration_number': student.registration_number,
+                'classroom': {'name': student.classroom.name} if student.classroom else None,
+            },
+            'first_name': student.full_name.split()[0] if student.full_name.split() else '',
+            'username': user.username,
             'password': password,
-            'login_url': login_url,
+            'portal_url': login_url,
             'school_name': "Charles Academy"
         }
         
-        # HTML message
-        html_message = render_to_string('students/email/credentials_email.html', context)
-        
         # Plain text message
         plain_message = f"""
 Dear {student.full_name},
@@ -163,49 +207,50 @@ Best regards,
 Charles Academy
         """
         
-        # Send email
-        send_mail(
-            subject=subject,
-            message=plain_message.strip(),
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[student.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+        # Savepoint: insert ikishindwa, transaction ya mwitaji inaendelea kufanya kazi
+        with transaction.atomic():
+            queue_email(
+                [student.email],
+                subject,
+                template='students/emails/credentials_email.html',
+                context=context,
+                body=plain_message.strip(),
+            )
         
-        logger.info(f"✓ Credentials email sent to {student.email}")
+        logger.info(f"✓ Credentials email queued for {student.email}")
         return True
         
     except Exception as e:
-        logger.error(f"✗ Failed to send email: {e}", exc_info=True)
+        logger.error(f"✗ Failed to queue email: {e}", exc_info=True)
         return False
 
-def batch_create_student_users(students):
-    """Create user accounts for multiple students"""
+def batch_create_student_users(students, workers=None):
+    """Create user accounts for multiple students (bulk, see students.provisioning)"""
+    from .provisioning import provision
+
     results = {
         'success': [],
         'failed': []
     }
     
+    students = list(students)
     for student in students:
-        try:
-            if student.user:
-                results['success'].append({
-                    'student': student,
-                    'message': 'Already has user account'
-                })
-                continue
-                
-            user = create_student_user(student)
+        if student.user_id:
             results['success'].append({
                 'student': student,
-                'user': user
-            })
-            
-        except Exception as e:
-            results['failed'].append({
-                'student': student,
-                'error': str(e)
+                'message': 'Already has user account'
             })
     
-    return results
\ No newline at end of file
+    summary = provision([s for s in students if not s.user_id], workers=workers)
+    for student, user in summary['created']:
+        results['success'].append({
+            'student': student,
+            'user': user
+        })
+    for student, error in summary['failed']:
+        results['failed'].append({
+            'student': student,
+            'error': error
+        })
+    
+    return results
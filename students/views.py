@@ -5,11 +5,11 @@ from django.http import HttpResponse
 from django.db.models import Q
 from django.utils import timezone
 from io import BytesIO
-import os
 import mimetypes
 from .models import Student, Certificate
 from classes.models import ClassRoom
-from dashboard.models import SchoolSettings
+from dashboard.school_settings import get_school_settings
+from dashboard.pdf_cache import pdf_key, serve_cached_pdf, remember_pdf, student_inputs, result_inputs
 from accounts.decorators import role_required
 
 # For PDF generation
@@ -29,7 +29,7 @@ def student_list(request):
         return download_students_pdf(request)
     
     # Get school settings
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
     
     # Start with all students
     students_queryset = Student.objects.all().select_related('classroom')
@@ -131,7 +131,7 @@ def download_students_pdf(request):
         )
     
     # Get school settings
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     
     # Create PDF in memory
     buffer = BytesIO()
@@ -281,13 +281,19 @@ from .utils import (
     create_student_user, 
     send_student_credentials,
     get_next_registration_sequence,
-    generate_registration_number
+    generate_registration_number,
+    note_registration_number
 )
+from .provisioning import provision
+from dashboard.jobs import enqueue
 import logging
 import re
 
 logger = logging.getLogger(__name__)
 
+# Zaidi ya hapa bulk_create_users inaweka job ya provision_student_users kwa worker
+BULK_USERS_INLINE_LIMIT = 50
+
 @login_required
 @permission_required('students.add_student', raise_exception=True)
 def add_student(request):
@@ -338,6 +344,7 @@ def add_student(request):
                     if Student.objects.filter(registration_number__iexact=reg_number).exists():
                         messages.error(request, "Registration number already exists")
                         return redirect('students:add_student')
+                    note_registration_number(reg_number)
                 else:
                     # Generate registration number
                     try:
@@ -456,25 +463,30 @@ def bulk_create_users(request):
     if request.method == 'POST':
         try:
             students_without_users = Student.objects.filter(user__isnull=True)
+            count = students_without_users.count()
             
-            if not students_without_users.exists():
+            if not count:
                 messages.info(request, "All students already have user accounts")
                 return redirect('students:student_list')
             
-            success_count = 0
-            failed_count = 0
-            
-            for student in students_without_users:
-                try:
-                    create_student_user(student)
-                    success_count += 1
-                except Exception as e:
-                    logger.error(f"Failed to create user for {student.registration_number}: {e}")
-                    failed_count += 1
-            
-            messages.success(request, 
-                f"Created {success_count} user accounts. "
-                f"{failed_count} failed.")
+            if count <= BULK_USERS_INLINE_LIMIT:
+                summary = provision(students_without_users)
+                messages.success(request, 
+                    f"Created {len(summary['created'])} user accounts. "
+                    f"{len(summary['failed'])} failed.")
+            else:
+                # Intake kubwa: worker (run_jobs) anaifanya; job moja tu kwa wakati mmoja
+                _, created = enqueue(
+                    'provision_student_users', user=request.user, unique_key='provision_student_users'
+                )
+                if created:
+                    messages.info(request,
+                        f"Creating {count} user accounts in the background. "
+                        f"Refresh the student list in a minute.")
+                else:
+                    messages.info(request,
+                        "User accounts are already being created in the background. "
+                        "Refresh the student list in a minute.")
                 
         except Exception as e:
             messages.error(request, f"Bulk operation failed: {str(e)}")
@@ -483,8 +495,6 @@ def bulk_create_users(request):
 
 
 def delete_student(request, id):
-    settings_obj = SchoolSettings.objects.first()
-
     Student.objects.filter(id=id).delete()
     return redirect('students:student_list')
 
@@ -493,7 +503,6 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .models import Student
 from classes.models import ClassRoom  # ← Hii imekosekana!
-from dashboard.models import SchoolSettings  # ← Na hii pia!
 
 @login_required  # ← Usisahau kuongeza decorator
 def edit_student(request, id):
@@ -502,7 +511,7 @@ def edit_student(request, id):
     
     # Handle case where SchoolSettings doesn't exist
     try:
-        settings_obj = SchoolSettings.objects.first()
+        settings_obj = get_school_settings()
     except:
         settings_obj = None
     
@@ -585,59 +594,10 @@ from django.http import HttpResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
 from io import BytesIO
-import os
 
 from .models import Student
-from dashboard.models import SchoolSettings
-
-
-# ─────────────────────────────────────────────────────────────────────────────
-#  Helpers
-# ─────────────────────────────────────────────────────────────────────────────
-
-def hex_to_rgb(hex_color):
-    hex_color = hex_color.lstrip('#')
-    r = int(hex_color[0:2], 16) / 255
-    g = int(hex_color[2:4], 16) / 255
-    b = int(hex_color[4:6], 16) / 255
-    return (r, g, b)
-
-
-def draw_rounded_rect(cv, x, y, w, h, radius, fill=None, stroke=None, lw=0):
-    cv.saveState()
-    if fill:
-        cv.setFillColorRGB(*fill)
-    if stroke:
-        cv.setStrokeColorRGB(*stroke)
-        cv.setLineWidth(lw)
-    path = cv.beginPath()
-    path.moveTo(x + radius, y)
-    path.lineTo(x + w - radius, y)
-    path.arcTo(x + w - 2*radius, y,         x + w, y + 2*radius,         -90, 90)
-    path.lineTo(x + w, y + h - radius)
-    path.arcTo(x + w - 2*radius, y + h - 2*radius, x + w, y + h,           0, 90)
-    path.lineTo(x + radius, y + h)
-    path.arcTo(x, y + h - 2*radius, x + 2*radius, y + h,                  90, 90)
-    path.lineTo(x, y + radius)
-    path.arcTo(x, y, x + 2*radius, y + 2*radius,                         180, 90)
-    path.close()
-    cv.drawPath(path, fill=(1 if fill else 0), stroke=(1 if stroke else 0))
-    cv.restoreState()
-
-
-def draw_circle(cv, cx, cy, r, fill=None, stroke=None, lw=1):
-    cv.saveState()
-    if fill:
-        cv.setFillColorRGB(*fill)
-    if stroke:
-        cv.setStrokeColorRGB(*stroke)
-        cv.setLineWidth(lw)
-    cv.circle(cx, cy, r, fill=(1 if fill else 0), stroke=(1 if stroke else 0))
-    cv.restoreState()
+from .documents import id_card_subject, render_id_card, render_results_pdf
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -650,253 +610,37 @@ def download_id_card_pdf(request, student_id):
 
     # ── Fetch objects ─────────────────────────────────────────────────────────
     if request.user.role == 'STUDENT':
-        student = get_object_or_404(Student, user=request.user, id=student_id)
+        student = request.student
+        if not student or student.id != student_id:
+            raise Http404("No Student matches the given query.")
     else:
         student = get_object_or_404(Student, id=student_id)
 
     try:
-        school_settings = SchoolSettings.objects.first()
+        school_settings = get_school_settings()
     except Exception:
         school_settings = None
 
-    # ── Color palette ─────────────────────────────────────────────────────────
-    theme_hex = (
-        school_settings.theme_color
-        if school_settings and school_settings.theme_color
-        else '#1a237e'
-    )
-    primary  = hex_to_rgb(theme_hex)
-    accent   = tuple(min(1.0, v * 0.55 + 0.45) for v in primary)
-    dark     = tuple(max(0.0, v * 0.68) for v in primary)
-    WHITE    = (1.0, 1.0, 1.0)
-    MID_GREY = (0.52, 0.52, 0.58)
-    GOLD     = (1.0, 0.80, 0.18)
-
-    # ── School meta ───────────────────────────────────────────────────────────
-    school_name   = school_settings.name          if school_settings else "CHARLES ACADEMY"
-    academic_year = school_settings.academic_year if school_settings else str(timezone.now().year)
-
-    # ── Student data ──────────────────────────────────────────────────────────
-    full_name  = student.full_name.upper()
-    reg_number = student.registration_number
-
     # Subject: query Subject model linked to student classroom
-    subject = 'N/A'
+    subject_names = []
     if student.classroom:
         from classes.models import Subject
-        subjects = Subject.objects.filter(classroom=student.classroom).values_list('name', flat=True)
-        if subjects.exists():
-            subject = ', '.join(subjects[:3])  # max 3 subjects
-        else:
-            subject = student.classroom.name   # fallback to class name
-    if len(subject) > 30:
-        subject = subject[:30] + '...' 
-
-    adm_year = str(student.admission_year) if student.admission_year else str(timezone.now().year)
-
-    # ── Canvas setup ──────────────────────────────────────────────────────────
-    W = 85.6 * mm
-    H = 54.0 * mm
-    buf = BytesIO()
-    cv = canvas.Canvas(buf, pagesize=(W, H))
-    cv.setTitle("Student ID Card")
-
-    # ══════════════════════════════════════════════════════════════════════════
-    #  BACKGROUND
-    # ══════════════════════════════════════════════════════════════════════════
-    cv.setFillColorRGB(*WHITE)
-    cv.rect(0, 0, W, H, fill=1, stroke=0)
-
-    HEADER_H = H * 0.42
-
-    # Header solid band
-    cv.setFillColorRGB(*primary)
-    cv.rect(0, H - HEADER_H, W, HEADER_H, fill=1, stroke=0)
-
-    # Decorative parallelograms on header
-    cv.saveState()
-    lighter = tuple(min(1.0, v + 0.10) for v in primary)
-    cv.setFillColorRGB(*lighter)
-    for i in range(7):
-        xs = -12 * mm + i * 17 * mm
-        p = cv.beginPath()
-        p.moveTo(xs,           H - HEADER_H)
-        p.lineTo(xs + 9 * mm,  H - HEADER_H)
-        p.lineTo(xs + 12 * mm, H)
-        p.lineTo(xs + 3 * mm,  H)
-        p.close()
-        cv.drawPath(p, fill=1, stroke=0)
-    cv.restoreState()
-
-    # Decorative circles top-right
-    cv.saveState()
-    cv.setFillColorRGB(*tuple(min(1.0, v + 0.18) for v in primary))
-    cv.circle(W - 7 * mm, H - 3 * mm, 11 * mm, fill=1, stroke=0)
-    cv.setFillColorRGB(*tuple(min(1.0, v + 0.26) for v in primary))
-    cv.circle(W - 1 * mm, H - 9 * mm,  7 * mm, fill=1, stroke=0)
-    cv.restoreState()
-
-    # Gold stripe below header
-    STRIPE_H = 2.2 * mm
-    cv.setFillColorRGB(*GOLD)
-    cv.rect(0, H - HEADER_H - STRIPE_H, W, STRIPE_H, fill=1, stroke=0)
-
-    # Footer band
-    FOOTER_H = 7 * mm
-    cv.setFillColorRGB(*dark)
-    cv.rect(0, 0, W, FOOTER_H, fill=1, stroke=0)
-
-    # Accent circle in footer-left
-    draw_circle(cv, 5 * mm, FOOTER_H / 2, 3.5 * mm, fill=accent)
-
-    # Info section boundaries
-    INFO_TOP    = H - HEADER_H - STRIPE_H
-    INFO_BOTTOM = FOOTER_H
-    INFO_H      = INFO_TOP - INFO_BOTTOM
-
-    # ══════════════════════════════════════════════════════════════════════════
-    #  HEADER: SCHOOL LOGO  +  SCHOOL NAME
-    # ══════════════════════════════════════════════════════════════════════════
-    LOGO_CX = 10 * mm
-    LOGO_CY = H - HEADER_H / 2
-    LOGO_R  = 8.5 * mm
-
-    # White halo behind logo
-    draw_circle(cv, LOGO_CX, LOGO_CY, LOGO_R + 1.4 * mm, fill=WHITE)
-
-    # Load logo from static/images/logo.jpeg
-    logo_drawn = False
-    from django.conf import settings as django_settings
-    from django.contrib.staticfiles import finders
-    logo_path = finders.find('images/logo.jpeg')
-
-    if logo_path and os.path.exists(logo_path):
-        try:
-            reader = ImageReader(logo_path)
-            cv.saveState()
-            clip = cv.beginPath()
-            clip.circle(LOGO_CX, LOGO_CY, LOGO_R)
-            cv.clipPath(clip, stroke=0)
-            side = LOGO_R * 2
-            cv.drawImage(reader,
-                         LOGO_CX - LOGO_R, LOGO_CY - LOGO_R,
-                         width=side, height=side,
-                         preserveAspectRatio=True, mask='auto')
-            cv.restoreState()
-            logo_drawn = True
-        except Exception:
-            pass
+        subject_names = list(
+            Subject.objects.filter(classroom=student.classroom).values_list('name', flat=True)[:3]
+        )
+    subject = id_card_subject(student, subject_names)
+
+    cache_key = pdf_key('id_card', student_inputs(student), subject)
+    cached = serve_cached_pdf(request, cache_key)
+    if cached:
+        return cached
 
-    if not logo_drawn:
-        # Fallback: accent-colored circle with school initials
-        draw_circle(cv, LOGO_CX, LOGO_CY, LOGO_R, fill=accent)
-        initials = ''.join(word[0].upper() for word in school_name.split()[:3])
-        fs = 10 if len(initials) <= 2 else 7.5
-        cv.saveState()
-        cv.setFillColorRGB(*WHITE)
-        cv.setFont('Helvetica-Bold', fs)
-        cv.drawCentredString(LOGO_CX, LOGO_CY - fs * 0.36, initials)
-        cv.restoreState()
-
-    # School name + subtitle text (right of logo)
-    TEXT_X = LOGO_CX + LOGO_R + 3 * mm
-    cv.saveState()
-    cv.setFillColorRGB(*WHITE)
-    disp_name = school_name[:22] + ('...' if len(school_name) > 22 else '')
-    cv.setFont('Helvetica-Bold', 8.5)
-    cv.drawString(TEXT_X, H - 9 * mm, disp_name)
-
-    cv.setFillColorRGB(*tuple(min(1.0, v + 0.38) for v in primary))
-    cv.setFont('Helvetica', 5.5)
-    cv.drawString(TEXT_X, H - 13.5 * mm, "SCHOOL IDENTIFICATION CARD")
-
-    # Gold "STUDENT ID" badge pill
-    BX, BY, BW, BH = TEXT_X, H - 19 * mm, 20 * mm, 4.5 * mm
-    draw_rounded_rect(cv, BX, BY, BW, BH, radius=1 * mm, fill=GOLD)
-    cv.setFillColorRGB(*dark)
-    cv.setFont('Helvetica-Bold', 5.5)
-    cv.drawCentredString(BX + BW / 2, BY + 1.2 * mm, "STUDENT ID")
-    cv.restoreState()
-
-    # ══════════════════════════════════════════════════════════════════════════
-    #  INFO ROWS  (full-width layout — no photo column)
-    # ══════════════════════════════════════════════════════════════════════════
-    LX      = 4 * mm
-    LABEL_W = 17 * mm
-    VAL_X   = LX + LABEL_W + 1.5 * mm
-
-    def draw_row(label, value, y, bold_val=False, val_color=None, tinted=False):
-        cv.saveState()
-        if tinted:
-            tint = tuple(min(1.0, v * 0.05 + 0.95) for v in primary)
-            cv.setFillColorRGB(*tint)
-            cv.rect(LX - 1 * mm, y - 1.6 * mm, W - LX - 2 * mm, 5 * mm, fill=1, stroke=0)
-
-        # Gold bullet dot
-        cv.setFillColorRGB(*GOLD)
-        cv.circle(LX - 0.8 * mm, y + 1.3 * mm, 0.75 * mm, fill=1, stroke=0)
-
-        # Label text
-        cv.setFillColorRGB(*MID_GREY)
-        cv.setFont('Helvetica', 5.5)
-        cv.drawString(LX + 0.8 * mm, y, label.upper())
-        cv.drawString(LX + LABEL_W, y, ':')
-
-        # Value text
-        vc = val_color if val_color else (0.08, 0.08, 0.08)
-        cv.setFillColorRGB(*vc)
-        cv.setFont('Helvetica-Bold' if bold_val else 'Helvetica', 6.5)
-        cv.drawString(VAL_X, y, str(value))
-        cv.restoreState()
-
-    BASE_Y  = INFO_BOTTOM + INFO_H - 3.5 * mm
-    ROW_GAP = INFO_H / 5.8
-
-    # Subtle horizontal dividers between rows
-    cv.saveState()
-    cv.setStrokeColorRGB(0.87, 0.87, 0.92)
-    cv.setLineWidth(0.35)
-    for i in range(1, 5):
-        ly = BASE_Y - i * ROW_GAP + 1.3 * mm
-        cv.line(LX, ly, W - 3 * mm, ly)
-    cv.restoreState()
-
-    name_disp = full_name[:28] + ('...' if len(full_name) > 28 else '')
-
-    draw_row("Full Name",  name_disp,      BASE_Y,               bold_val=True, val_color=primary, tinted=True)
-    draw_row("Reg No",     reg_number,     BASE_Y - ROW_GAP)
-    draw_row("Subject",    subject,        BASE_Y - 2 * ROW_GAP, val_color=dark,                   tinted=True)
-    draw_row("Adm. Year",  adm_year,       BASE_Y - 3 * ROW_GAP)
-    draw_row("Status",     student.status, BASE_Y - 4 * ROW_GAP, val_color=MID_GREY,               tinted=True)
-
-    # ══════════════════════════════════════════════════════════════════════════
-    #  FOOTER TEXT
-    # ══════════════════════════════════════════════════════════════════════════
-    cv.saveState()
-    cv.setFillColorRGB(*WHITE)
-    cv.setFont('Helvetica-Bold', 5.5)
-    cv.drawString(10 * mm, 2.2 * mm, f"VALID: {academic_year}")
-    cv.setFont('Helvetica', 5)
-    cv.setFillColorRGB(*tuple(min(1.0, v + 0.38) for v in dark))
-    cv.drawRightString(W - 3 * mm, 2.2 * mm, f"ID: {reg_number[-8:]}")
-    cv.restoreState()
-
-    # Outer card border
-    cv.saveState()
-    cv.setStrokeColorRGB(*primary)
-    cv.setLineWidth(1.0)
-    cv.rect(0.5, 0.5, W - 1, H - 1, fill=0, stroke=1)
-    cv.restoreState()
-
-    cv.save()
-
-    pdf = buf.getvalue()
-    buf.close()
+    pdf = render_id_card(student, school_settings, subject)
 
     response = HttpResponse(pdf, content_type='application/pdf')
-    filename = f"ID_CARD_{reg_number}.pdf"
+    filename = f"ID_CARD_{student.registration_number}.pdf"
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+    return remember_pdf(cache_key, response)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -904,13 +648,12 @@ def download_id_card_pdf(request, student_id):
 @login_required
 def my_id_card(request):
     """View student's own ID card in browser."""
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
+    student = request.student
+    if not student:
         messages.error(request, "Student profile not found.")
         return redirect('dashboard')
 
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     return render(request, 'students/id_card_view.html', {
         'student': student,
         'school_settings': school_settings,
@@ -926,20 +669,18 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from io import BytesIO
 from django.utils import timezone
-from dashboard.models import SchoolSettings
 from students.models import Student
 from exams.models import Result, Exam
 
 
 @login_required
 def student_portal(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     user = request.user
     
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
+    student = request.student
+    if not student:
         messages.error(request, "Student profile not found.")
         return redirect('home')
     
@@ -973,9 +714,8 @@ def download_results_pdf(request):
     """Download student results as PDF"""
     user = request.user
     
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
+    student = request.student
+    if not student:
         messages.error(request, "Student profile not found.")
         return redirect('students:student_portal')
     
@@ -986,434 +726,32 @@ def download_results_pdf(request):
         messages.warning(request, "No results available to download.")
         return redirect('students:student_portal')
     
+    cache_key = pdf_key('student_results', student_inputs(student), result_inputs(student))
+    cached = serve_cached_pdf(request, cache_key)
+    if cached:
+        return cached
+    
     # Get school settings
     try:
-        school_settings = SchoolSettings.objects.first()
+        school_settings = get_school_settings()
     except:
         school_settings = None
     
-    # Group results by exam
-    results_by_exam = {}
-    for result in results:
-        exam_name = result.exam.name if result.exam else "Unknown Exam"
-        if exam_name not in results_by_exam:
-            results_by_exam[exam_name] = []
-        results_by_exam[exam_name].append(result)
-    
-    # Calculate statistics
-    total_subjects = results.count()
-    total_marks = sum([r.marks for r in results if r.marks])
-    average_marks = total_marks / total_subjects if total_subjects > 0 else 0
-    
-    # Count grades using the grade() method from model
-    grades_count = {}
-    for result in results:
-        grade_info = result.grade()
-        grade = grade_info[0] if grade_info else 'N/A'
-        grades_count[grade] = grades_count.get(grade, 0) + 1
-    
-    # Create PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer, 
-        pagesize=letter,
-        leftMargin=40,
-        rightMargin=40,
-        topMargin=40,
-        bottomMargin=40
-    )
-    elements = []
-    
-    # Custom Styles
-    styles = getSampleStyleSheet()
-    
-    # Theme color from school settings
-    theme_color = school_settings.theme_color if school_settings else '#4361ee'
-    
-    # Title Style
-    title_style = ParagraphStyle(
-        'TitleStyle',
-        parent=styles['Heading1'],
-        fontSize=22,
-        textColor=colors.HexColor(theme_color),
-        spaceAfter=15,
-        alignment=1,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Subtitle Style
-    subtitle_style = ParagraphStyle(
-        'SubtitleStyle',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#475569'),
-        spaceAfter=10,
-        alignment=1,
-        fontName='Helvetica'
-    )
-    
-    # Section Title Style
-    section_style = ParagraphStyle(
-        'SectionStyle',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor(theme_color),
-        spaceAfter=10,
-        spaceBefore=15,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Normal Style
-    normal_style = ParagraphStyle(
-        'NormalStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.black,
-        fontName='Helvetica'
-    )
-    
-    # Bold Style
-    bold_style = ParagraphStyle(
-        'BoldStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.black,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Footer Style
-    footer_style = ParagraphStyle(
-        'FooterStyle',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.grey,
-        alignment=1,
-        fontName='Helvetica-Oblique'
-    )
-    
-    # ========== HEADER SECTION ==========
-    # School information
-    school_name = school_settings.name if school_settings else "Charles Academy"
-    phone = school_settings.phone if school_settings else "+255 123 456 789"
-    email = school_settings.contact_email if school_settings else "admin@charlesacademy.edu"
-    academic_year = school_settings.academic_year if school_settings else str(timezone.now().year)
-    
-    # School Header
-    school_header = f"""
-    <b><font size="18" color="{theme_color}">{school_name}</font></b><br/>
-    <font size="11" color="#475569">ACADEMIC TRANSCRIPT</font><br/>
-    <font size="9" color="#64748b">Phone: {phone} | Email: {email} | Academic Year: {academic_year}</font>
-    """
-    
-    elements.append(Paragraph(school_header, normal_style))
-    elements.append(Spacer(1, 15))
-    elements.append(Paragraph("OFFICIAL EXAMINATION RESULTS", title_style))
-    elements.append(Paragraph("Individual Academic Performance Report", subtitle_style))
-    
-    # Document Info
-    doc_info = f"""
-    <b>Document No:</b> AT-{student.registration_number}-{timezone.now().strftime("%Y%m%d")} | 
-    <b>Generated:</b> {timezone.now().strftime("%d/%m/%Y %I:%M %p")} |
-    <b>Student ID:</b> {student.registration_number}
-    """
-    elements.append(Paragraph(doc_info, normal_style))
-    elements.append(Spacer(1, 20))
-    
-    # ========== STUDENT INFORMATION ==========
-    elements.append(Paragraph("STUDENT INFORMATION", section_style))
-    
-    student_data = [
-        ['FULL NAME:', student.full_name, 'ADMISSION NO:', student.registration_number],
-        ['CLASS:', str(student.classroom) if student.classroom else 'Not Assigned', 
-         'ADMISSION YEAR:', str(student.admission_year)],
-        ['STATUS:', student.status, 'REPORT DATE:', timezone.now().strftime("%d/%m/%Y")],
-    ]
-    
-    student_table = Table(student_data, colWidths=[80, 150, 80, 130])
-    student_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f1f5f9')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-    ]))
-    
-    elements.append(student_table)
-    elements.append(Spacer(1, 25))
-    
-    # ========== ACADEMIC SUMMARY ==========
-    elements.append(Paragraph("ACADEMIC SUMMARY", section_style))
-    
-    # Get overall grade from average marks
-    overall_grade_info = get_grade_info(average_marks)
-    overall_grade = overall_grade_info[0] if overall_grade_info else 'N/A'
-    overall_remark = overall_grade_info[1] if overall_grade_info else 'N/A'
-    
-    summary_data = [
-        ['TOTAL SUBJECTS', 'AVERAGE MARKS', 'OVERALL GRADE', 'PERFORMANCE'],
-        [str(total_subjects), f"{average_marks:.1f}/100", 
-         overall_grade, 
-         overall_remark]
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[120, 120, 120, 120])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(theme_color)),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('ALIGN', (0, 1), (-1, 1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-        ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#f8fafc')),
-    ]))
-    
-    elements.append(summary_table)
-    elements.append(Spacer(1, 15))
-    
-    # Grade Distribution
-    if grades_count:
-        grade_dist_text = "<b>Grade Distribution:</b> "
-        for grade, count in grades_count.items():
-            grade_dist_text += f"{grade}: {count} | "
-        elements.append(Paragraph(grade_dist_text[:-3], normal_style))
-    
-    elements.append(Spacer(1, 20))
-    
-    # ========== DETAILED RESULTS BY EXAM ==========
-    for exam_name, exam_results in results_by_exam.items():
-        elements.append(Paragraph(f"EXAM: {exam_name.upper()}", section_style))
-        
-        # Prepare results data for this exam
-        exam_results_data = [['SUBJECT', 'MARKS', 'GRADE', 'REMARKS']]
-        total_exam_marks = 0
-        
-        for result in exam_results:
-            grade_info = result.grade()
-            grade = grade_info[0] if grade_info else 'N/A'
-            remark = grade_info[1] if grade_info else 'N/A'
-            exam_results_data.append([
-                result.subject.name if result.subject else "Unknown Subject",
-                f"{result.marks}/100",
-                grade,
-                remark
-            ])
-            total_exam_marks += result.marks
-        
-        # Calculate average for this exam
-        exam_average = total_exam_marks / len(exam_results) if exam_results else 0
-        exam_grade_info = get_grade_info(exam_average)
-        
-        results_table = Table(exam_results_data, colWidths=[150, 80, 80, 140])
-        results_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(theme_color)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('ALIGN', (1, 1), (1, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (2, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('TEXTCOLOR', (2, 1), (2, -1), get_grade_color),
-        ]))
-        
-        elements.append(results_table)
-        
-        # Exam summary
-        exam_summary = f"""
-        <b>Exam Average:</b> {exam_average:.1f}/100 | 
-        <b>Overall Grade:</b> {exam_grade_info[0] if exam_grade_info else 'N/A'} | 
-        <b>Subjects:</b> {len(exam_results)}
-        """
-        elements.append(Paragraph(exam_summary, normal_style))
-        elements.append(Spacer(1, 20))
-    
-    # ========== PERFORMANCE ANALYSIS ==========
-    elements.append(Paragraph("PERFORMANCE ANALYSIS", section_style))
-    
-    if results.exists():
-        # Find top and lowest subjects across all exams
-        all_results = list(results)
-        top_result = max(all_results, key=lambda x: x.marks)
-        lowest_result = min(all_results, key=lambda x: x.marks)
-        
-        analysis_data = [
-            ['METRIC', 'SUBJECT', 'MARKS', 'ANALYSIS'],
-            ['Strongest Subject', top_result.subject.name if top_result.subject else "Unknown", 
-             f"{top_result.marks}/100", f"Excellent performance in {top_result.subject.name if top_result.subject else 'this subject'}"],
-            ['Needs Improvement', lowest_result.subject.name if lowest_result.subject else "Unknown", 
-             f"{lowest_result.marks}/100", f"Focus required in {lowest_result.subject.name if lowest_result.subject else 'this subject'}"]
-        ]
-        
-        analysis_table = Table(analysis_data, colWidths=[100, 100, 80, 140])
-        analysis_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#475569')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-            ('BACKGROUND', (0, 1), (0, 2), colors.HexColor('#f8fafc')),
-        ]))
-        
-        elements.append(analysis_table)
-    else:
-        elements.append(Paragraph("Insufficient data for detailed analysis.", normal_style))
-    
-    elements.append(Spacer(1, 25))
-    
-    # ========== GRADING SYSTEM ==========
-    elements.append(Paragraph("GRADING SYSTEM USED", section_style))
-    
-    grading_data = [
-        ['MARKS RANGE', 'GRADE', 'REMARKS'],
-        ['80 - 100', 'A', 'Excellent'],
-        ['70 - 79', 'B', 'Very Good'],
-        ['60 - 69', 'C', 'Good'],
-        ['50 - 59', 'D', 'Fair'],
-        ['40 - 49', 'E', 'Pass'],
-        ['0 - 39', 'F', 'Fail']
-    ]
-    
-    grading_table = Table(grading_data, colWidths=[100, 60, 160])
-    grading_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#475569')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-    ]))
-    
-    elements.append(grading_table)
-    elements.append(Spacer(1, 25))
-    
-    # ========== FOOTER SECTION ==========
-    elements.append(Paragraph("_" * 100, normal_style))
-    elements.append(Spacer(1, 15))
-    
-    # Important Notes
-    notes_data = [
-        ['IMPORTANT NOTES:'],
-        ['• This is an official academic transcript from Charles Academy.'],
-        ['• Please keep this document for your records.'],
-        ['• For any discrepancies, contact academic office within 14 days.'],
-        ['• Results are subject to verification by the examination board.'],
-        ['• This transcript is confidential and intended for personal use only.'],
-    ]
-    
-    notes_table = Table(notes_data, colWidths=[480])
-    notes_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('TEXTCOLOR', (0, 0), (0, 0), colors.HexColor('#dc2626')),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#64748b')),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-    ]))
-    
-    elements.append(notes_table)
-    elements.append(Spacer(1, 20))
-    
-    # Signature Section
-    signature_data = [
-        ['', ''],
-        ['___________________________', '___________________________'],
-        ['Student/Parent Signature', 'Class Teacher Signature'],
-        ['', ''],
-        ['Date: ___________________', f'Stamp & Seal: {school_name}'],
-    ]
-    
-    signature_table = Table(signature_data, colWidths=[240, 240])
-    signature_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 2), (-1, 2), 'Helvetica'),
-        ('FONTSIZE', (0, 2), (-1, 2), 8),
-        ('FONTNAME', (0, 4), (-1, 4), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 4), (-1, 4), 8),
-        ('TEXTCOLOR', (0, 4), (-1, 4), colors.HexColor('#475569')),
-    ]))
-    
-    elements.append(signature_table)
-    elements.append(Spacer(1, 20))
-    
-    # Final Footer
-    footer_text = f"""
-    {school_name} • Dar es Salaam, Tanzania • Tel: {phone} • Email: {email}<br/>
-    This document is valid only with official school stamp and signature.<br/>
-    Generated on: {timezone.now().strftime("%d %B, %Y at %I:%M %p")} • Transcript ID: AT-{student.registration_number}-{timezone.now().strftime("%Y%m%d%H%M")}
-    """
-    
-    elements.append(Paragraph(footer_text, footer_style))
-    
-    # ========== BUILD PDF ==========
+    results = list(results)
     try:
-        doc.build(elements)
+        pdf = render_results_pdf(student, results, school_settings)
     except Exception as e:
         # Fallback to simple PDF
         print(f"PDF generation error: {e}")
         return generate_simple_results_pdf(student, results, school_settings)
     
-    # Get PDF value from buffer
-    pdf = buffer.getvalue()
-    buffer.close()
-    
     # Create HTTP response with PDF
     response = HttpResponse(content_type='application/pdf')
     filename = f"Academic_Transcript_{student.registration_number}_{student.full_name.replace(' ', '_')}_{timezone.now().strftime('%Y%m%d')}.pdf"
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     response.write(pdf)
     
-    return response
-
-
-# Helper functions
-def get_grade_info(marks):
-    """Convert marks to grade and remark"""
-    if marks >= 80:
-        return ('A', 'Excellent')
-    elif marks >= 70:
-        return ('B', 'Very Good')
-    elif marks >= 60:
-        return ('C', 'Good')
-    elif marks >= 50:
-        return ('D', 'Fair')
-    elif marks >= 40:
-        return ('E', 'Pass')
-    else:
-        return ('F', 'Fail')
-
-
-def get_grade_color(col, row, sty):
-    """Return color based on grade"""
-    if row == 0:
-        return colors.white
-    grade = sty.text
-    if grade == 'A':
-        return colors.HexColor('#10b981')  # Green
-    elif grade == 'B':
-        return colors.HexColor('#3b82f6')  # Blue
-    elif grade == 'C':
-        return colors.HexColor('#f59e0b')  # Orange
-    elif grade == 'D':
-        return colors.HexColor('#8b5cf6')  # Purple
-    elif grade == 'E':
-        return colors.HexColor('#ef4444')  # Red
-    elif grade == 'F':
-        return colors.HexColor('#dc2626')  # Dark Red
-    return colors.black
+    return remember_pdf(cache_key, response)
 
 
 def generate_simple_results_pdf(student, results, school_settings):
@@ -1477,7 +815,7 @@ from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.forms import PasswordChangeForm
 
 def change_password(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
 
     if request.method == 'POST':
         form = PasswordChangeForm(request.user, request.POST)
@@ -1500,7 +838,7 @@ def change_password(request):
 def student_detail(request, student_id):
     """View student details"""
     student = get_object_or_404(Student, id=student_id)
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
     
     # For students: ensure they can only view their own profile
     if request.user.role == 'STUDENT' and request.user != student.user:
@@ -1509,7 +847,7 @@ def student_detail(request, student_id):
     
     # For teachers: ensure they teach this student's class
     if request.user.role == 'TEACHER':
-        if not student.classroom or student.classroom not in request.user.teacher_profile.classes.all():
+        if not request.teacher or not student.classroom or student.classroom not in request.teacher.classes.all():
             messages.error(request, "You can only view students in your classes.")
             return redirect('dashboard')
     
@@ -1549,14 +887,13 @@ from django.http import FileResponse, Http404
 @login_required
 def my_certificates(request):
     """Student anaona certificates zake zote."""
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
+    student = request.student
+    if not student:
         messages.error(request, "Student profile not found.")
         return redirect('dashboard')
 
     certificates = student.certificates.all().order_by('-issued_date')
-    school_settings = SchoolSettings.objects.first()
+    school_settings = get_school_settings()
 
     return render(request, 'students/certificates.html', {
         'student':        student,
@@ -1565,67 +902,8 @@ def my_certificates(request):
     })
 
 
-import requests
-from django.http import HttpResponse, Http404, StreamingHttpResponse
-from django.conf import settings
-
-
-def _proxy_uploadcare_file(uuid, filename=None):
-    """
-    Pakia file kutoka Uploadcare REST API kwa kutumia secret key.
-    Rudisha (content, content_type, filename) au raise Http404.
-    """
-    uploadcare_config = getattr(settings, 'UPLOADCARE', {})
-    pub_key    = uploadcare_config.get('pub_key', '')
-    secret_key = uploadcare_config.get('secret', '')
-
-    if not uuid:
-        raise Http404("No file UUID.")
-
-    # Clean UUID — ondoa slashes/spaces
-    uuid = str(uuid).strip().strip('/')
-
-    # Uploadcare CDN URL — direct na UUID tu
-    cdn_url = f"https://ucarecdn.com/{uuid}/"
-    if filename:
-        cdn_url = f"https://ucarecdn.com/{uuid}/{filename}"
-
-    try:
-        response = requests.get(
-            cdn_url,
-            auth=(pub_key, secret_key),   # Basic auth na Uploadcare keys
-            timeout=30,
-            stream=True
-        )
-
-        if response.status_code == 200:
-            content_type = response.headers.get('Content-Type', 'application/octet-stream')
-            return response, content_type
-        
-        # Kama CDN imefail, jaribu REST API
-        api_url = f"https://api.uploadcare.com/files/{uuid}/"
-        api_response = requests.get(
-            api_url,
-            headers={
-                'Authorization': f'Uploadcare.Simple {pub_key}:{secret_key}',
-                'Accept': 'application/vnd.uploadcare-v0.7+json',
-            },
-            timeout=15
-        )
-
-        if api_response.status_code == 200:
-            file_info   = api_response.json()
-            direct_url  = file_info.get('original_file_url') or file_info.get('url')
-            if direct_url:
-                direct_resp = requests.get(direct_url, timeout=30, stream=True)
-                if direct_resp.status_code == 200:
-                    content_type = direct_resp.headers.get('Content-Type', 'application/octet-stream')
-                    return direct_resp, content_type
-
-    except requests.RequestException as e:
-        raise Http404(f"File fetch failed: {e}")
-
-    raise Http404("File not found on Uploadcare.")
+from django.http import HttpResponse, Http404
+from dashboard.uploadcare import serve_file
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -1633,10 +911,9 @@ def _proxy_uploadcare_file(uuid, filename=None):
 # ─────────────────────────────────────────────────────────────────
 @login_required
 def download_certificate(request, cert_id):
-    """Download certificate — proxy kupitia Uploadcare API."""
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
+    """Download certificate — kupitia Uploadcare gateway (dashboard/uploadcare.py)."""
+    student = request.student
+    if not student:
         raise Http404
 
     from .models import Certificate
@@ -1647,27 +924,9 @@ def download_certificate(request, cert_id):
         return redirect('students:my_certificates')
 
     try:
-        uuid     = str(certificate.file.uuid)
         filename = f"Certificate_{certificate.title.replace(' ', '_')}.pdf"
-
-        response, content_type = _proxy_uploadcare_file(uuid, filename)
-
-        django_response = StreamingHttpResponse(
-            response.iter_content(chunk_size=8192),
-            content_type=content_type,
-        )
-
-        # ✅ FIX: set on django_response, NOT on requests response
-        django_response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        # ✅ Allow browsers to show download progress
-        content_length = response.headers.get('Content-Length')
-        if content_length:
-            django_response['Content-Length'] = content_length
-
-        return django_response
-
-    except Exception:
+        return serve_file(request, certificate.file, filename)
+    except Http404:
         messages.error(request, "Certificate file could not be retrieved.")
         return redirect('students:my_certificates')
 
@@ -1708,6 +967,6 @@ def admin_upload_certificate(request, student_id):
     context = {
         'student':           student,
         'cert_type_choices': Certificate.CERTIFICATE_TYPES,
-        'school_settings':   SchoolSettings.objects.first(),
+        'school_settings':   get_school_settings(),
     }
     return render(request, 'students/upload_certificate.html', context)
\ No newline at end of file
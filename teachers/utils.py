@@ -1,13 +1,12 @@
 # teachers/utils.py
-from django.core.mail import send_mail
-from django.conf import settings
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from django.db import transaction
 from django.urls import reverse
 
+from dashboard.outbox import queue_email
+
 def send_teacher_credentials(teacher, password, request=None):
     """
-    Send login credentials to teacher's email
+    Queue login credentials to teacher's email (sent by `manage.py send_outbox`)
     """
     try:
         # Get login URL
@@ -19,9 +18,9 @@ def send_teacher_credentials(teacher, password, request=None):
         # Prepare email content
         subject = f"Teacher Portal Login Credentials - {teacher.first_name} {teacher.last_name}"
         
-        # Create context for email template
+        # Context ya template (JSON, worker ataitumia baadaye)
         context = {
-            'teacher': teacher,
+            'teacher': {'first_name': teacher.first_name, 'last_name': teacher.last_name},
             'username': teacher.email,  # Username ni email
             'password': password,
             'first_name': teacher.first_name,
@@ -29,22 +28,18 @@ def send_teacher_credentials(teacher, password, request=None):
             'portal_url': login_url,
         }
         
-        # Render HTML email template
-        html_message = render_to_string('teachers/emails/credentials_email.html', context)
-        plain_message = strip_tags(html_message)
-        
-        # Send email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email='info.charlesacademy@gmail.com',
-            recipient_list=[teacher.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+        # Savepoint: insert ikishindwa, transaction ya mwitaji inaendelea kufanya kazi
+        with transaction.atomic():
+            queue_email(
+                [teacher.email],
+                subject,
+                template='teachers/emails/credentials_email.html',
+                context=context,
+                from_email='info.charlesacademy@gmail.com',
+            )
         
-        print(f"✅ Credentials email sent to {teacher.email}")
+        print(f"✅ Credentials email queued for {teacher.email}")
         return True
     except Exception as e:
-        print(f"❌ Failed to send credentials email: {e}")
-        return False
\ No newline at end of file
+        print(f"❌ Failed to queue credentials email: {e}")
+        return False
@@ -6,32 +6,23 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.db.models import Q
 
 from .models import Teacher
 from .utils import send_teacher_credentials
 from accounts.decorators import role_required
 from classes.models import Subject, ClassRoom
-from dashboard.models import SchoolSettings
+from dashboard.school_settings import get_school_settings
 from students.models import Student
+from students.utils import allocate_registration_numbers, note_registration_number
 from exams.models import Exam, Result
+from exams.utils import marks_grid_from_post, save_marks_grid
 from attendance.models import StudentAttendance
 
 User = get_user_model()
 
 
-# ──────────────────────────────────────────────────────────────────
-# Helper
-# ──────────────────────────────────────────────────────────────────
-
-def _get_teacher(request):
-    """Return Teacher for the logged-in user, or None."""
-    try:
-        return Teacher.objects.get(email__iexact=request.user.email)
-    except Teacher.DoesNotExist:
-        return None
-
-
 # ──────────────────────────────────────────────────────────────────
 # ADMIN — list teachers
 # ──────────────────────────────────────────────────────────────────
@@ -39,7 +30,7 @@ def _get_teacher(request):
 @login_required
 @role_required(['ADMIN'])
 def teacher_list(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
     teachers = Teacher.objects.prefetch_related('classes', 'subjects').all()
     return render(request, 'teachers/teacher_list.html', {
         'teachers': teachers,
@@ -54,7 +45,7 @@ def teacher_list(request):
 @login_required
 @role_required(['ADMIN'])
 def add_teacher(request):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
     classes  = ClassRoom.objects.all()
     subjects = Subject.objects.select_related('classroom').all()
 
@@ -138,7 +129,7 @@ def add_teacher(request):
 @login_required
 @role_required(['ADMIN'])
 def edit_teacher(request, id):
-    settings_obj = SchoolSettings.objects.first()
+    settings_obj = get_school_settings()
     teacher  = get_object_or_404(Teacher, id=id)
     classes  = ClassRoom.objects.all()
     subjects = Subject.objects.select_related('classroom').all()
@@ -205,8 +196,8 @@ def teacher_dashboard(request):
     if request.user.role != 'TEACHER':
         return redirect('dashboard')
 
-    settings_obj = SchoolSettings.objects.first()
-    teacher = _get_teacher(request)
+    settings_obj = get_school_settings()
+    teacher = request.teacher
     if not teacher:
         messages.error(request, "Teacher profile not found. Contact admin.")
         return redirect('login')
@@ -253,7 +244,7 @@ def teacher_register_student(request):
     if request.user.role != 'TEACHER':
         return redirect('dashboard')
 
-    teacher = _get_teacher(request)
+    teacher = request.teacher
     if not teacher:
         messages.error(request, "Teacher profile not found.")
         return redirect('teacher_dashboard')
@@ -274,19 +265,26 @@ def teacher_register_student(request):
             messages.error(request, f"A student with email '{email}' already exists.")
             return redirect('teacher_register_student')
 
-        if Student.objects.filter(registration_number__iexact=reg_no).exists():
+        if reg_no and Student.objects.filter(registration_number__iexact=reg_no).exists():
             messages.error(request, f"Registration number '{reg_no}' is already in use.")
             return redirect('teacher_register_student')
 
         try:
             classroom = ClassRoom.objects.get(id=class_id)
-            student = Student.objects.create(
-                full_name=request.POST.get('full_name', '').strip(),
-                email=email,
-                registration_number=reg_no,
-                classroom=classroom,
-                admission_year=request.POST.get('admission_year', today_year()),
-            )
+            admission_year = request.POST.get('admission_year') or today_year()
+            with transaction.atomic():
+                # Namba ya registration kutoka counter (haigongani na ombi lingine)
+                if reg_no:
+                    note_registration_number(reg_no)
+                else:
+                    reg_no = allocate_registration_numbers(classroom.code, admission_year)[0]
+                student = Student.objects.create(
+                    full_name=request.POST.get('full_name', '').strip(),
+                    email=email,
+                    registration_number=reg_no,
+                    classroom=classroom,
+                    admission_year=admission_year,
+                )
             messages.success(request, f"Student '{student.full_name}' registered in {classroom.name}!")
         except Exception as e:
             messages.error(request, f"Error: {e}")
@@ -314,7 +312,7 @@ def teacher_enter_results(request):
     if request.user.role != 'TEACHER':
         return redirect('dashboard')
 
-    teacher = _get_teacher(request)
+    teacher = request.teacher
     if not teacher:
         messages.error(request, "Teacher profile not found.")
         return redirect('teacher_dashboard')
@@ -367,23 +365,17 @@ def teacher_enter_results(request):
             messages.error(request, "Subject not found.")
             return redirect('teacher_enter_results')
 
-        saved = 0
-        for student in Student.objects.filter(classroom__id=p_class):
-            marks_str = request.POST.get(f'marks_{student.id}', '').strip()
-            if marks_str:
-                try:
-                    marks = int(marks_str)
-                    if 0 <= marks <= 100:
-                        Result.objects.update_or_create(
-                            student=student,
-                            exam=p_exam,
-                            subject=p_subject,
-                            defaults={'marks': marks}
-                        )
-                        saved += 1
-                except ValueError:
-                    pass
+        grid = marks_grid_from_post(
+            request.POST,
+            Student.objects.filter(classroom__id=p_class).values_list('id', flat=True),
+            [p_subject.id],
+            key='marks_{student}',
+        )
+        report = save_marks_grid(p_exam, grid)
+        saved = report['created'] + report['updated'] + report['unchanged']
 
+        if report['errors']:
+            messages.warning(request, f"{len(report['errors'])} mark(s) skipped — must be whole numbers 0–100.")
         messages.success(request, f"Saved {saved} result(s) ✓")
         return redirect(
             f"{request.path}?class_id={p_class}&exam_id={p_exam_id}&subject_id={p_subj_id}"
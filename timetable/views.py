@@ -36,9 +36,7 @@ def _build_grid(entries):
 @login_required
 def student_timetable(request):
     try:
-        from students.models import Student
-        student   = Student.objects.get(user=request.user)
-        classroom = student.classroom
+        classroom = request.student.classroom
     except Exception:
         messages.warning(request, "No class assigned to your account yet.")
         return redirect('students:student_portal')